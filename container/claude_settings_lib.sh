@@ -1,6 +1,34 @@
 #!/bin/bash
 # Shared library for Claude Code container settings management
 
+# Print the cached compiled settings for the current layers, if merge_settings.py has
+# stored them. The key matches merge_settings.cache_key(): sha256 over the script, the
+# container layer, user and project settings, separated by NUL bytes.
+cached_container_settings() {
+    local script_dir="$1"
+    local project_layer="$2"
+    local cache_dir="${CC_RUNNER_SETTINGS_CACHE:-$HOME/.cache/claude_code/settings}"
+    case "$cache_dir" in 0|off|false) return 1 ;; esac
+    local sha
+    if command -v sha256sum >/dev/null 2>&1; then
+        sha="sha256sum"
+    elif command -v shasum >/dev/null 2>&1; then
+        sha="shasum -a 256"
+    else
+        return 1
+    fi
+    local key
+    key="$({
+        cat "$script_dir/merge_settings.py"; printf '\0'
+        cat "$script_dir/container_settings.json"; printf '\0'
+        cat "$HOME/.claude/settings.json" 2>/dev/null; printf '\0'
+        [ -n "$project_layer" ] && cat "$project_layer" 2>/dev/null
+    } | $sha | cut -d' ' -f1)"
+    local cached="${cache_dir/#\~/$HOME}/$key.json"
+    [ -s "$cached" ] || return 1
+    echo "$cached"
+}
+
 # Function to setup container settings by merging user settings with container permissions
 setup_container_settings() {
     local repo_dir="$1"
@@ -22,27 +50,18 @@ setup_container_settings() {
         fi
     fi
     
-    # Use Python helper to merge user settings with container permissions
-    if ! python3 "$script_dir/merge_settings.py" "$HOME/.claude/settings.json" "$settings_file"; then
+    # Compile user, project (the backup of the original) and container layers. A
+    # compiled file cached by an earlier launch with the same inputs is copied as is.
+    local project_layer=""
+    [ -f "$backup_file" ] && project_layer="$backup_file"
+    local cached
+    if cached="$(cached_container_settings "$script_dir" "$project_layer")"; then
+        cmp -s "$cached" "$settings_file" || cp "$cached" "$settings_file"
+        echo "Using cached container settings $(basename "$cached")"
+    elif ! python3 "$script_dir/merge_settings.py" "$HOME/.claude/settings.json" "$settings_file" \
+            ${project_layer:+--project "$project_layer"}; then
         echo "Error: Failed to merge settings. Falling back to basic container settings."
-        # Fallback to basic settings if merge fails
-        cat > "$settings_file" << 'EOF'
-{
-  "permissions": {
-    "defaultMode": "bypassPermissions",
-    "allow": [
-      "Bash", "Edit", "Glob", "Grep", "LS", "List", 
-      "MultiEdit", "NotebookEdit", "NotebookRead", "Read", "Task",
-      "TodoWrite", "WebSearch", "Write"
-    ],
-    "deny": [
-      "Bash(:*CLAUDE.md:*)", "Edit(*CLAUDE.md*)", "MultiEdit(*CLAUDE.md*)",
-      "WriteFile(*CLAUDE.md)", "Write(*CLAUDE.md)", "Bash(git:*)"
-    ],
-    "additionalDirectories": ["/", "/workspace", "/home", "/etc", "/usr", "/var", "/tmp", "/root", "../"]
-  }
-}
-EOF
+        cp "$script_dir/container_settings.json" "$settings_file"
     fi
     
     # Export paths for cleanup function
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Claude Code Context Budget
+
+Keeps the context carried from one conversation to the next (the rolling handoff in the
+handoff workflow, the previous summary in a prompts file run) under a token ceiling.
+Without it a handoff that fell back to the whole response text, or one that simply
+grew stage after stage, is pasted verbatim into every later prompt.
+
+- Tokens are estimated at ~4 bytes each; no tokenizer is needed for a ceiling.
+- Text under the budget is passed through untouched.
+- Over budget, tool noise goes first: long fenced blocks keep their first and last
+  lines, very long lines are cut, and runs of blank lines collapse.
+- If that is not enough, the middle goes: the head (where the summary header and
+  overview sit) and the tail (latest status and next steps) are kept.
+- Results are cached in <cache dir>/<sha256>.txt, keyed on the input text, the budget
+  and TRIM_VERSION, so a rerun or resume reuses the trimmed text.
+
+CLI:
+    python3 context_budget.py FILE [MAX_TOKENS]      # print the trimmed text
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sys
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+MAX_CONTEXT_TOKENS = int(os.environ.get("CC_RUNNER_CONTEXT_TOKENS", "12000"))
+BYTES_PER_TOKEN = 4
+BLOCK_KEEP_HEAD = 15
+BLOCK_KEEP_TAIL = 5
+MAX_LINE_CHARS = 2000
+HEAD_SHARE = 0.65
+TRIM_VERSION = 1
+
+
+class Fitted(NamedTuple):
+    text: str
+    tokens: int
+    original_tokens: int
+    cached: bool
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text.encode("utf-8")) + BYTES_PER_TOKEN - 1) // BYTES_PER_TOKEN
+
+
+def strip_noise(text: str) -> str:
+    """Collapse long fenced blocks, cut very long lines and squeeze blank-line runs."""
+    out: List[str] = []
+    block: Optional[List[str]] = None
+    blank_run = 0
+    for line in text.splitlines():
+        if len(line) > MAX_LINE_CHARS:
+            line = line[:MAX_LINE_CHARS] + f" … [{len(line) - MAX_LINE_CHARS} chars trimmed]"
+        if line.lstrip().startswith("```"):
+            if block is None:
+                block = [line]
+                continue
+            block.append(line)
+            out.extend(_collapse_block(block))
+            block = None
+            continue
+        if block is not None:
+            block.append(line)
+            continue
+        blank_run = blank_run + 1 if not line.strip() else 0
+        if blank_run <= 1:
+            out.append(line)
+    if block is not None:
+        out.extend(_collapse_block(block))
+    return "\n".join(out) + ("\n" if text.endswith("\n") else "")
+
+
+def _collapse_block(block: List[str]) -> List[str]:
+    # The closing fence is missing when the text ends inside a block.
+    closed = len(block) > 1 and block[-1].lstrip().startswith("```")
+    body = block[1:-1] if closed else block[1:]
+    if len(body) <= BLOCK_KEEP_HEAD + BLOCK_KEEP_TAIL + 1:
+        return block
+    hidden = len(body) - BLOCK_KEEP_HEAD - BLOCK_KEEP_TAIL
+    closing = block[-1:] if closed else []
+    return [
+        block[0],
+        *body[:BLOCK_KEEP_HEAD],
+        f"… [{hidden} lines trimmed] …",
+        *body[-BLOCK_KEEP_TAIL:],
+        *closing,
+    ]
+
+
+def keep_ends(text: str, max_tokens: int) -> str:
+    """Drop whole lines from the middle until the text fits."""
+    budget = max_tokens * BYTES_PER_TOKEN - 64  # room for the marker line
+    lines = text.splitlines(keepends=True)
+    head: List[str] = []
+    used = 0
+    for line in lines:
+        size = len(line.encode("utf-8"))
+        if used + size > budget * HEAD_SHARE:
+            break
+        head.append(line)
+        used += size
+    tail: List[str] = []
+    for line in reversed(lines[len(head):]):
+        size = len(line.encode("utf-8"))
+        if used + size > budget:
+            break
+        tail.append(line)
+        used += size
+    tail.reverse()
+    hidden = len(lines) - len(head) - len(tail)
+    return "".join(head) + f"\n… [{hidden} lines trimmed to fit the context budget] …\n\n" + "".join(tail)
+
+
+def fit(text: str, max_tokens: int = MAX_CONTEXT_TOKENS, cache_dir: Optional[Path] = None) -> Fitted:
+    """Return `text` trimmed to at most `max_tokens` estimated tokens."""
+    original = estimate_tokens(text)
+    if max_tokens <= 0 or original <= max_tokens:
+        return Fitted(text, original, original, False)
+
+    cache_file = None
+    if cache_dir is not None:
+        key = hashlib.sha256(f"{TRIM_VERSION}:{max_tokens}:".encode("utf-8") + text.encode("utf-8")).hexdigest()
+        cache_file = cache_dir / f"{key}.txt"
+        try:
+            cached = cache_file.read_text(encoding="utf-8")
+            return Fitted(cached, estimate_tokens(cached), original, True)
+        except OSError:
+            pass
+
+    trimmed = strip_noise(text)
+    if estimate_tokens(trimmed) > max_tokens:
+        trimmed = keep_ends(trimmed, max_tokens)
+    if estimate_tokens(trimmed) >= original:
+        # A budget smaller than the trim marker itself; never make the context longer.
+        trimmed = text
+
+    if cache_file is not None:
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+            tmp.write_text(trimmed, encoding="utf-8")
+            os.replace(tmp, cache_file)
+        except OSError:
+            pass
+    return Fitted(trimmed, estimate_tokens(trimmed), original, False)
+
+
+def main() -> None:
+    if len(sys.argv) not in (2, 3):
+        print(__doc__.strip().split("CLI:")[1].strip(), file=sys.stderr)
+        sys.exit(2)
+    text = Path(sys.argv[1]).read_text(encoding="utf-8", errors="replace")
+    result = fit(text, int(sys.argv[2]) if len(sys.argv) == 3 else MAX_CONTEXT_TOKENS)
+    sys.stdout.write(result.text)
+    print(f"\n{result.original_tokens} -> {result.tokens} estimated tokens", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
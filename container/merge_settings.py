@@ -2,87 +2,194 @@
 """
 Claude Code Container Settings Merger
 
-Merges user's existing Claude settings with container-specific permissions.
-Preserves user hooks and other settings while only replacing the permissions section.
+Compiles the settings.json a container session runs with from three layers, lowest
+precedence first:
+- user:      ~/.claude/settings.json
+- project:   the project's own .claude/settings.json (the launcher passes its backup,
+             since the original is overwritten for the session)
+- container: container_settings.json next to this script, the only copy of the
+             container permissions (the shell fallback uses the same file)
+
+Precedence rules:
+- objects are merged key by key; for scalars and other lists the later layer wins, so
+  the container's permissions.defaultMode always applies;
+- permissions.allow/ask/deny/additionalDirectories and each hooks.<Event> list are the
+  ordered union of every layer, duplicates dropped, so project hooks and rules are kept;
+- deny wins: a rule denied by any layer is removed from allow and ask.
+Merging is idempotent, so a project layer that is itself a compiled file (a session
+that crashed before restoring its backup) compiles to the same result.
+
+The compiled file is keyed on the bytes of this script and the three layers and kept in
+CC_RUNNER_SETTINGS_CACHE (default ~/.cache/claude_code/settings; "off" disables it).
+claude_settings_lib.sh computes the same key with sha256sum and copies a cached file
+without starting Python. The output is only rewritten when its content changes.
+
+CLI:
+    python3 merge_settings.py <user_settings_path> <output_path> [--project PATH]
+    python3 merge_settings.py --print-key <user_settings_path> [--project PATH]
 """
 
+import argparse
+import copy
+import hashlib
 import json
 import os
 import sys
 from pathlib import Path
 
+HERE = Path(__file__).resolve().parent
+CONTAINER_LAYER = HERE / "container_settings.json"
+
+UNION_LISTS = {
+    ("permissions", "allow"),
+    ("permissions", "ask"),
+    ("permissions", "deny"),
+    ("permissions", "additionalDirectories"),
+}
+CACHE_KEEP = 64  # compiled files kept; parallel launches share the same few
+
+
+def _is_union(path):
+    return path in UNION_LISTS or (len(path) == 2 and path[0] == "hooks")
+
+
+def _union(first, second):
+    seen = set()
+    merged = []
+    for item in first + second:
+        marker = json.dumps(item, sort_keys=True)
+        if marker not in seen:
+            seen.add(marker)
+            merged.append(copy.deepcopy(item))
+    return merged
+
+
+def merge_layer(base, layer, path=()):
+    """Merge one layer over `base` (in place) following the precedence rules above."""
+    for key, value in layer.items():
+        here = path + (key,)
+        current = base.get(key)
+        if isinstance(value, dict) and isinstance(current, dict):
+            merge_layer(current, value, here)
+        elif isinstance(value, list) and isinstance(current, list) and _is_union(here):
+            base[key] = _union(current, value)
+        else:
+            base[key] = copy.deepcopy(value)
+    return base
 
-def merge_settings(user_settings_path, output_path):
-    """
-    Merge user's Claude settings with container permissions.
 
-    Args:
-        user_settings_path: Path to user's ~/.claude/settings.json
-        output_path: Path where merged settings should be written
+def compile_settings(layers):
+    settings = {}
+    for layer in layers:
+        merge_layer(settings, layer)
+    permissions = settings.get("permissions")
+    if isinstance(permissions, dict) and isinstance(permissions.get("deny"), list):
+        denied = set(map(str, permissions["deny"]))
+        for name in ("allow", "ask"):
+            if isinstance(permissions.get(name), list):
+                permissions[name] = [rule for rule in permissions[name] if str(rule) not in denied]
+    return settings
+
+
+def render(settings):
+    return (json.dumps(settings, indent=2) + "\n").encode("utf-8")
+
+
+def _read(path):
+    try:
+        return Path(path).read_bytes() if path else b""
+    except FileNotFoundError:
+        return b""
+
+
+def cache_key(user_bytes, project_bytes):
+    """sha256 of script, container layer, user and project bytes, NUL-separated.
+
+    claude_settings_lib.sh builds the same stream with cat and printf '\\0'.
     """
+    parts = [Path(__file__).read_bytes(), CONTAINER_LAYER.read_bytes(), user_bytes, project_bytes]
+    return hashlib.sha256(b"\0".join(parts)).hexdigest()
+
+
+def cache_dir():
+    setting = os.environ.get("CC_RUNNER_SETTINGS_CACHE", "").strip()
+    if setting.lower() in ("0", "off", "false"):
+        return None
+    if setting:
+        return Path(os.path.expanduser(setting))
+    return Path.home() / ".cache" / "claude_code" / "settings"
+
 
-    # Container-specific permissions that bypass restrictions
-    container_permissions = {
-        "defaultMode": "bypassPermissions",
-        "allow": [
-            "Bash",
-            "Edit",
-            "Glob",
-            "Grep",
-            "LS",
-            "List",
-            "MultiEdit",
-            "NotebookEdit",
-            "NotebookRead",
-            "Read",
-            "Task",
-            "TodoWrite",
-            "WebSearch",
-            "Write",
-        ],
-        "deny": [
-            "Bash(:*CLAUDE.md:*)",
-            "Edit(*CLAUDE.md*)",
-            "MultiEdit(*CLAUDE.md*)",
-            "WriteFile(*CLAUDE.md)",
-            "Write(*CLAUDE.md)",
-            "Bash(git:*)",
-        ],
-        "additionalDirectories": [
-            "/",
-            "/workspace",
-            "/home",
-            "/etc",
-            "/usr",
-            "/var",
-            "/tmp",
-            "/root",
-            "../",
-        ],
-    }
+def _write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
 
+
+def write_if_changed(path, data):
+    """Atomically replace `path` with `data` unless it already holds exactly that."""
+    path = Path(path)
+    if _read(path) == data:
+        return False
+    _write_atomic(path, data)
+    return True
+
+
+def _store(cache, key, data):
     try:
-        # Read user's existing settings
-        if os.path.exists(user_settings_path):
-            with open(user_settings_path, "r") as f:
-                user_settings = json.load(f)
-        else:
-            # Fallback to minimal settings if user has no settings file
-            user_settings = {}
+        _write_atomic(cache / f"{key}.json", data)
+        entries = sorted(cache.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+        for stale in entries[CACHE_KEEP:]:
+            stale.unlink(missing_ok=True)
+    except OSError:
+        pass  # the cache is an optimisation; the output is already correct
+
 
-        # Preserve all user settings, only replace permissions
-        merged_settings = user_settings.copy()
-        merged_settings["permissions"] = container_permissions
+def _load_layer(data, label):
+    if not data.strip():
+        return {}
+    settings = json.loads(data)
+    if not isinstance(settings, dict):
+        raise ValueError(f"{label} settings must be a JSON object")
+    return settings
 
-        # Ensure output directory exists
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-        # Write merged settings
-        with open(output_path, "w") as f:
-            json.dump(merged_settings, f, indent=2)
+def merge_settings(user_settings_path, output_path, project_settings_path=None):
+    """
+    Compile user, project and container settings into output_path.
 
+    Args:
+        user_settings_path: Path to user's ~/.claude/settings.json
+        output_path: Path where merged settings should be written
+        project_settings_path: The project's own settings.json (optional)
+    """
+    try:
+        user_bytes = _read(user_settings_path)
+        project_bytes = _read(project_settings_path)
+        key = cache_key(user_bytes, project_bytes)
+        cache = cache_dir()
+        cached = cache / f"{key}.json" if cache is not None else None
+
+        data = _read(cached) if cached is not None else b""
+        source = "cached"
+        if not data:
+            user = _load_layer(user_bytes, "user")
+            try:
+                project = _load_layer(project_bytes, "project")
+            except ValueError as e:
+                print(f"Warning: Ignoring project settings {project_settings_path}: {e}", file=sys.stderr)
+                project = {}
+            container = json.loads(CONTAINER_LAYER.read_bytes())
+            data = render(compile_settings([user, project, container]))
+            source = "compiled"
+            if cache is not None:
+                _store(cache, key, data)
+
+        changed = write_if_changed(output_path, data)
         print(
             f"Successfully merged settings from {user_settings_path} to {output_path}"
+            f" ({source}{'' if changed else ', unchanged'})"
         )
         return True
 
@@ -95,17 +202,24 @@ def merge_settings(user_settings_path, output_path):
 
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: merge_settings.py <user_settings_path> <output_path>")
-        print(
-            "Example: merge_settings.py ~/.claude/settings.json /project/.claude/settings.json"
-        )
+    parser = argparse.ArgumentParser(
+        description="Compile container settings from user, project and container layers.",
+        epilog="Example: merge_settings.py ~/.claude/settings.json /project/.claude/settings.json",
+    )
+    parser.add_argument("user_settings_path")
+    parser.add_argument("output_path", nargs="?")
+    parser.add_argument("--project", help="the project's own settings.json (lower precedence than the container)")
+    parser.add_argument("--print-key", action="store_true", help="print the cache key and exit")
+    args = parser.parse_args()
+
+    if args.print_key:
+        print(cache_key(_read(args.user_settings_path), _read(args.project)))
+        sys.exit(0)
+    if args.output_path is None:
+        parser.print_usage(sys.stderr)
         sys.exit(1)
 
-    user_settings_path = sys.argv[1]
-    output_path = sys.argv[2]
-
-    success = merge_settings(user_settings_path, output_path)
+    success = merge_settings(args.user_settings_path, args.output_path, args.project)
     sys.exit(0 if success else 1)
 
 
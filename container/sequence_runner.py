@@ -0,0 +1,1144 @@
+#!/usr/bin/env python3
+"""
+Claude Code Sequence Runner
+
+Python engine behind run_sequence_prompts.sh and run_sequence_handoff.sh. The shell
+scripts keep authentication checks and settings backup/restore; everything per step
+(prompt parsing, container exec, output capture, handoff extraction, logging) runs in
+this one process instead of a fork of python/grep/awk per field.
+
+- Prompt files are parsed once, in memory.
+- The CLI runs with --output-format stream-json: assistant text is echoed as it arrives
+  and the final result event (session id, result text) is taken from the stream, so
+  nothing is written to a temp file and parsed again.
+- Prompts go to `docker exec -i` on stdin, never through shell quoting or heredocs.
+- Handoff summaries are cut from the response text in a single pass.
+- The handoff workflow checkpoints after every stage (plan/handoffs/checkpoint.json:
+  session id, task hash, and a content hash of each finished stage's handoff file).
+  `handoff --resume` continues at the first stage without a valid checkpoint entry.
+- Failed Claude calls are retried with exponential backoff plus jitter.
+- Context carried into the next conversation is held under CC_RUNNER_CONTEXT_TOKENS
+  by context_budget.py; trimmed copies are cached in plan/handoffs/.context_cache/.
+- With CC_RUNNER_STAGE_CACHE set, a handoff stage or prompts conversation whose prompts
+  and project tree match a cached run reuses its output and handoff, and its file
+  changes are applied to the project (stage_cache.py).
+- Status changes and finished stages/conversations are also published as NDJSON events
+  through ../hooks/workflow_events.py (socket subscribers plus a rotating log), so a
+  monitor does not have to poll workflow_status.txt.
+
+Usage:
+    python3 sequence_runner.py prompts [PROJECT_DIR] PROMPTS_FILE
+    python3 sequence_runner.py handoff [PROJECT_DIR] INITIAL_TASK
+    python3 sequence_runner.py handoff --resume [PROJECT_DIR [INITIAL_TASK]]
+
+Environment (set by the wrapper scripts; derived from claude_common_lib.sh if missing):
+    CC_DOCKER_ENV_ARGS   output of get_base_docker_env_args
+    HOST_TZ              host timezone passed to the container
+    CC_RUNNER_RETRY_ATTEMPTS  attempts per Claude call in the handoff workflow (default 4)
+    CC_RUNNER_RETRY_BASE_SEC  first backoff delay; doubles per retry up to 120s (default 5)
+    CC_RUNNER_CONTEXT_TOKENS  ceiling for carried-over context, 0 disables (default 12000)
+    CC_RUNNER_STAGE_CACHE     opt-in stage result cache: "on" or a directory (default off)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import shlex
+import shutil
+import signal
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple
+
+import context_budget
+import stage_cache
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Progress events share the hooks' publisher; without the hooks directory alongside
+# (a copied-out container/), the runners simply publish nothing.
+sys.path.append(str(SCRIPT_DIR.parent / "hooks"))
+try:
+    import workflow_events
+except ImportError:
+    workflow_events = None  # type: ignore[assignment]
+MODEL = "claude-sonnet-4-5-20250929"
+IMAGE = "claude_code_container"
+CONTAINER_WORKDIR = "/workspace"
+CONTAINER_HANDOFF_DIR = "/workspace/plan/handoffs"
+HANDOFF_HEADERS = (
+    "## HANDOFF SUMMARY",
+    "## Comprehensive Handoff Summary",
+    "## Handoff Summary",
+)
+RETRY_ATTEMPTS = max(1, int(os.environ.get("CC_RUNNER_RETRY_ATTEMPTS", "4")))
+RETRY_BASE_SEC = float(os.environ.get("CC_RUNNER_RETRY_BASE_SEC", "5"))
+RETRY_MAX_SEC = 120.0
+CHECKPOINT_NAME = "checkpoint.json"
+CHECKPOINT_VERSION = 1
+CONTEXT_CACHE_DIR = ".context_cache"
+PREVIEW_CHARS = 120
+
+
+class ClaudeError(RuntimeError):
+    """The container could not start, or the Claude CLI failed or produced no result event."""
+
+
+# ----------------------------- Text helpers -----------------------------
+
+
+def parse_prompts(text: str) -> List[str]:
+    """Split a prompts file into prompts: blank lines separate, '#' lines are comments."""
+    prompts: List[str] = []
+    current: List[str] = []
+    for raw in text.splitlines():
+        line = raw.rstrip("\r")
+        if line.lstrip().startswith("#"):
+            continue
+        if not line.strip(" "):
+            if "".join(current).strip(" "):
+                prompts.append("\n".join(current))
+            current = []
+            continue
+        current.append(line)
+    if "".join(current).strip(" "):
+        prompts.append("\n".join(current))
+    return prompts
+
+
+def group_conversations(prompts: List[str]) -> List[List[str]]:
+    """Group prompts into conversations; '/compact' closes the current one."""
+    groups: List[List[str]] = []
+    current: List[str] = []
+    for prompt in prompts:
+        if prompt.startswith("/compact"):
+            if current:
+                groups.append(current)
+                current = []
+            rest = prompt[len("/compact"):]
+            rest = rest[1:] if rest.startswith(" ") else rest
+            if rest:
+                current.append(rest)
+        else:
+            current.append(prompt)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def extract_handoff(text: str) -> str:
+    """Return the handoff section of a response, or the whole response if it has none.
+
+    One pass over the lines records where each known header first appears; the
+    highest-priority header present wins and the text from that line on is kept.
+    """
+    first_exact: Dict[str, int] = {}
+    prefixed = set()
+    lines = text.splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        if not line.startswith("##"):
+            continue
+        stripped = line.rstrip("\r\n")
+        for header in HANDOFF_HEADERS:
+            if stripped.startswith(header):
+                prefixed.add(header)
+                if stripped == header:
+                    first_exact.setdefault(header, i)
+    for header in HANDOFF_HEADERS:
+        if header in prefixed:
+            start = first_exact.get(header)
+            section = "".join(lines[start:]) if start is not None else ""
+            return section if section else text
+    return text
+
+
+def preview(text: str, limit: int = PREVIEW_CHARS) -> str:
+    flat = text.replace("\n", " ")
+    return flat[:limit] + ("..." if len(text) > limit else "")
+
+
+def word_count(text: str) -> int:
+    return len(text.split())
+
+
+def _write(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    _write(tmp, text)
+    os.replace(tmp, path)
+
+
+def sha256_file(path: Path) -> Optional[str]:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
+
+
+def bounded_context(text: str, handoff_dir: Path, label: str, log: "WorkflowLog") -> str:
+    """`text` cut to the context budget, reusing a cached trim of the same input."""
+    fitted = context_budget.fit(text, cache_dir=handoff_dir / CONTEXT_CACHE_DIR)
+    if fitted.tokens < fitted.original_tokens:
+        source = "cached" if fitted.cached else "trimmed"
+        log(f"✂️  {label}: ~{fitted.original_tokens} tokens {source} to ~{fitted.tokens}")
+    return fitted.text
+
+
+def cache_lookup(
+    cache: Optional[stage_cache.StageCache], project_dir: Path, *parts: str
+) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    """(key, pre-stage tree, hit) from the stage cache; a hit's file changes are already applied."""
+    if cache is None:
+        return "", "", None
+    return cache.lookup(project_dir, *parts)
+
+
+def cache_store(
+    cache: Optional[stage_cache.StageCache],
+    project_dir: Path,
+    log: "WorkflowLog",
+    key: str,
+    tree: str,
+    record: Dict[str, Any],
+) -> None:
+    if cache is None or not key:
+        return
+    try:
+        stored = cache.store(project_dir, key, tree, record)
+    except OSError as e:
+        log(f"⚠️  Could not cache {record.get('stage')}: {e}")
+        return
+    if stored:
+        log(f"💾 {record.get('stage')} result cached")
+    else:
+        log(f"⚠️  Could not diff the project tree after {record.get('stage')}; result not cached")
+
+
+def publish(type: str, **fields: Any) -> None:
+    """Send one runner progress event (see hooks/workflow_events.py).
+
+    Runner events are minutes apart, so each is flushed to the log right away.
+    """
+    if workflow_events is None:
+        return
+    stream = workflow_events.stream("runner")
+    if stream is not None:
+        stream.emit(type, **fields)
+        stream.flush()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Delay before retry number `attempt` (1-based): exponential, with equal jitter."""
+    ceiling = min(RETRY_MAX_SEC, RETRY_BASE_SEC * 2 ** (attempt - 1))
+    return random.uniform(ceiling / 2, ceiling)
+
+
+# ------------------------------- Logging ---------------------------------
+
+
+class WorkflowLog:
+    """Timestamped lines to stdout and a log file opened once, buffered until it exists."""
+
+    def __init__(self, levels: bool) -> None:
+        self.levels = levels
+        self._fh: Optional[TextIO] = None
+        self._early: List[str] = []
+
+    def attach(self, path: Path, header: str = "", append: bool = False) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = open(path, "a" if append else "w", encoding="utf-8", buffering=1)
+        if header:
+            self._fh.write(header + "\n")
+        for line in self._early:
+            self._fh.write(line + "\n")
+        self._early = []
+
+    def write_raw(self, text: str) -> None:
+        if self._fh is not None:
+            self._fh.write(text + "\n")
+        else:
+            self._early.append(text)
+
+    def __call__(self, message: str, level: str = "INFO") -> None:
+        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        line = f"[{ts}] [{level}] {message}" if self.levels else f"[{ts}] {message}"
+        print(line, flush=True)
+        self.write_raw(line)
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+# ------------------------------ Container --------------------------------
+
+
+def docker_env_args() -> List[str]:
+    raw = os.environ.get("CC_DOCKER_ENV_ARGS")
+    if raw is None:
+        lib = SCRIPT_DIR / "claude_common_lib.sh"
+        raw = subprocess.run(
+            ["bash", "-c", 'source "$1" && get_base_docker_env_args', "_", str(lib)],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    return shlex.split(raw)
+
+
+class Container:
+    """One detached claude_code_container with the project mounted at /workspace."""
+
+    def __init__(self, name: str, project_dir: Path) -> None:
+        self.name = name
+        self.project_dir = project_dir
+
+    def start(self) -> None:
+        tz = os.environ.get("HOST_TZ", "")
+        cmd = [
+            "docker", "run", "-d", "--name", self.name,
+            "--mount", f"type=bind,source={self.project_dir},target={CONTAINER_WORKDIR}",
+            "--mount", f"type=bind,source={Path.home() / '.claude'},target=/home/dev/.claude",
+            *docker_env_args(),
+            *(["--env", f"TZ={tz}"] if tz else []),
+            IMAGE, "tail", "-f", "/dev/null",
+        ]
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            raise ClaudeError(f"docker run failed for {self.name}: {proc.stderr.strip()}")
+        time.sleep(2)  # let container services initialize
+
+    def remove(self) -> None:
+        subprocess.run(
+            ["docker", "rm", "-f", self.name], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+
+    def claude(
+        self,
+        prompt: str,
+        resume: Optional[str] = None,
+        on_text: Callable[[str], None] = lambda text: print(text, flush=True),
+    ) -> Dict[str, object]:
+        """Run one `claude -p` turn and return its result event.
+
+        Assistant text is handed to on_text as each stream event arrives.
+        """
+        script = (
+            f"cd {CONTAINER_WORKDIR} && claude -p --model={MODEL} --dangerously-skip-permissions "
+            '--output-format stream-json --verbose ${1:+--resume "$1"}'
+        )
+        proc = subprocess.Popen(
+            ["docker", "exec", "-i", self.name, "bash", "-c", script, "_", resume or ""],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+        )
+        assert proc.stdin is not None and proc.stdout is not None
+        try:
+            proc.stdin.write(prompt)
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        result: Optional[Dict[str, object]] = None
+        for line in proc.stdout:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                on_text(line.rstrip("\n"))  # CLI errors arrive as plain text
+                continue
+            if not isinstance(event, dict):
+                continue
+            if event.get("type") == "assistant":
+                for block in (event.get("message") or {}).get("content") or []:
+                    if isinstance(block, dict) and block.get("type") == "text" and block.get("text"):
+                        on_text(block["text"])
+            elif event.get("type") == "result":
+                result = event
+        rc = proc.wait()
+        if rc != 0 or result is None or result.get("is_error"):
+            raise ClaudeError(f"claude exited with code {rc}" + ("" if result else " and no result"))
+        return result
+
+
+def _install_sigterm() -> None:
+    # The wrapper's EXIT trap restores settings; make SIGTERM unwind our finally blocks too.
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(143))
+
+
+def _resolve_args(args: List[str], usage: str) -> Tuple[Path, str]:
+    if len(args) == 1:
+        return Path.cwd(), args[0]
+    if len(args) == 2:
+        return Path(args[0]), args[1]
+    print("Error: No arguments provided" if not args else "Error: Too many arguments provided")
+    print(usage)
+    sys.exit(1)
+
+
+# ---------------------------- Prompt sequence ----------------------------
+
+PROMPTS_USAGE = """Usage:
+  run_sequence_prompts.sh /path/to/prompts.txt                    # Execute in current directory
+  run_sequence_prompts.sh /path/to/project /path/to/prompts.txt  # Execute in specified directory
+
+Prompts are separated by blank lines; lines starting with # are comments.
+/compact ends the current conversation with a handoff summary that is passed
+to a fresh conversation. Files are written to <project>/plan/handoffs/."""
+
+PROMPTS_HANDOFF_PROMPT = """Generate a comprehensive handoff summary of everything done in this conversation.
+
+Include:
+- What was accomplished
+- Any files created or modified
+- Key decisions or findings
+- Current state of the project
+- Important context for continuation
+
+Be thorough but concise. This summary will be the only context passed forward.
+Output in plain text format."""
+
+
+class PromptSequence:
+    """Runs a prompts file: one Claude conversation per /compact-separated group."""
+
+    def __init__(self, project_dir: Path, prompts_file: Path, log: WorkflowLog) -> None:
+        self.project_dir = project_dir
+        self.prompts_file = prompts_file
+        self.log = log
+        self.handoff_dir = project_dir / "plan" / "handoffs"
+        self.stage_cache = stage_cache.open_cache()
+        self.container = Container(
+            f"claude_prompts_handoff_{project_dir.name}_{int(time.time())}_{os.getpid()}", project_dir
+        )
+
+    def publish(self, type: str, **fields: Any) -> None:
+        publish(type, workflow="prompts", session_id=self.container.name, project_dir=str(self.project_dir), **fields)
+
+    def run(self) -> int:
+        log = self.log
+        prompts = parse_prompts(self.prompts_file.read_text(encoding="utf-8", errors="replace"))
+        if not prompts:
+            log(f"No prompts found in file: {self.prompts_file}", "ERROR")
+            log("Make sure prompts are separated by blank lines and not all commented out", "ERROR")
+            return 1
+        log(f"Found {len(prompts)} prompt(s) to execute")
+        for i, prompt in enumerate(prompts, 1):
+            log(f"Prompt {i} ({len(prompt)} chars): {preview(prompt)}")
+
+        self.handoff_dir.mkdir(parents=True, exist_ok=True)
+        log.attach(self.handoff_dir / "workflow_log.txt")
+        log(f"Workflow log initialized at {self.handoff_dir / 'workflow_log.txt'}")
+        log(f"Container name generated: {self.container.name}")
+
+        conversations = group_conversations(prompts)
+        try:
+            log("Starting execution container", "STAGE")
+            self.container.start()
+            log(f"Container {self.container.name} launched")
+            _write(self.handoff_dir / "workflow_status.txt", f"STARTED: {time.ctime()}\n")
+            self.publish("runner_status", status="STARTED", stage="", details=f"{len(conversations)} conversation(s)")
+            _write(self.handoff_dir / "initial_task.txt", prompts[0] + "\n")
+
+            log("Beginning prompt execution workflow", "STAGE")
+            previous_handoff = ""
+            for num, group in enumerate(conversations, 1):
+                previous_handoff = self.execute_conversation(num, group, previous_handoff)
+
+            with open(self.handoff_dir / "workflow_status.txt", "a", encoding="utf-8") as f:
+                f.write(f"COMPLETED: {time.ctime()}\n")
+            self.publish("runner_status", status="COMPLETED", stage="", details="")
+            log("Workflow status updated to COMPLETED")
+            log("Run summary", "STAGE")
+            log("All prompts processed successfully!")
+            log(f"Total conversations: {len(conversations)}")
+            log(f"Conversation transcripts are saved as {self.handoff_dir}/conversation_<n>_output.txt")
+            log(f"View logs with: cat {self.handoff_dir / 'workflow_log.txt'}")
+            return 0
+        except ClaudeError as e:
+            log(str(e), "ERROR")
+            self.publish("runner_status", status="FAILED", stage="", details=str(e))
+            return 1
+        finally:
+            log("Beginning cleanup", "STAGE")
+            log(f"Stopping and removing container {self.container.name}")
+            self.container.remove()
+            log(f"Handoff files saved in: {self.handoff_dir}")
+
+    def execute_conversation(self, num: int, prompts: List[str], previous_handoff: str) -> str:
+        log = self.log
+        log(f"Conversation {num}: executing {len(prompts)} prompt(s)", "STAGE")
+        started = time.time()
+        out = self.handoff_dir / f"conversation_{num}_output.txt"
+        _write(out, "")
+        transcript = open(out, "a", encoding="utf-8")
+        try:
+            first = prompts[0]
+            if previous_handoff:
+                summary = bounded_context(
+                    previous_handoff, self.handoff_dir, f"Conversation {num - 1} summary", log
+                )
+                first = f"Previous conversation summary:\n{summary}\n\nCurrent task:\n{first}"
+            labelled = [(str(i), f"Response {i}", p) for i, p in enumerate(prompts[1:], 2)]
+            labelled.append(("handoff", "Handoff Summary", PROMPTS_HANDOFF_PROMPT))
+            cache_key, tree, hit = cache_lookup(
+                self.stage_cache, self.project_dir, "prompts", MODEL, str(num), first, *(p for _, _, p in labelled)
+            )
+            if hit is not None:
+                log(f"Conversation {num}: cache hit (same prompts and tree as a previous run); file changes applied")
+                self._record_first(transcript, num, dict(hit.get("first") or {}))
+                responses = [tuple(r) for r in hit.get("responses") or []]
+                for index, label, text in responses:
+                    self._record_response(transcript, num, index, label, text)
+            else:
+                result, responses = self._converse(transcript, num, first, prompts[0], labelled)
+                cache_store(
+                    self.stage_cache,
+                    self.project_dir,
+                    log,
+                    cache_key,
+                    tree,
+                    {"workflow": "prompts", "stage": f"conversation_{num}", "first": result, "responses": responses},
+                )
+            text = responses[-1][2] if responses else ""
+        finally:
+            transcript.close()
+
+        handoff = extract_handoff(text)
+        _write(self.handoff_dir / f"prompt_{num}_handoff.txt", handoff)
+        log(f"Handoff summary for conversation {num} captured ({len(handoff)} characters)")
+        self.publish(
+            "runner_stage_end",
+            stage=f"conversation_{num}",
+            stage_num=num,
+            seconds=round(time.time() - started, 1),
+            cached=hit is not None,
+        )
+        return handoff
+
+    def _converse(
+        self, transcript: TextIO, num: int, first: str, shown: str, labelled: List[Tuple[str, str, str]]
+    ) -> Tuple[Dict[str, Any], List[Tuple[str, str, str]]]:
+        """Run one conversation; returns the first result event and (index, label, text) per follow-up."""
+        log = self.log
+        log(f"Conversation {num} - prompt 1 length {len(shown)} characters")
+        log(f"Conversation {num} - prompt 1 preview: {preview(shown, 100)}")
+        try:
+            result = self.container.claude(first)
+        except ClaudeError:
+            log(f"Claude CLI returned an error for conversation {num} initial prompt", "ERROR")
+            raise
+        session_id = str(result.get("session_id") or "")
+        if not session_id:
+            raise ClaudeError(f"Failed to parse session_id for conversation {num}")
+        self._record_first(transcript, num, result)
+        log(f"Conversation {num}: obtained session ID {session_id}")
+
+        responses: List[Tuple[str, str, str]] = []
+        for index, label, prompt in labelled:
+            log(f"Conversation {num} - prompt {index} length {len(prompt)} characters")
+            log(f"Conversation {num}: continuing with session {session_id} for prompt {index}")
+            try:
+                text = str(self.container.claude(prompt, resume=session_id).get("result") or "")
+            except ClaudeError:
+                log(f"Claude CLI returned an error while continuing conversation {num}", "ERROR")
+                raise
+            self._record_response(transcript, num, index, label, text)
+            responses.append((index, label, text))
+        return result, responses
+
+    def _record_first(self, transcript: TextIO, num: int, result: Dict[str, Any]) -> None:
+        _write(self.handoff_dir / f"conversation_{num}_prompt_1.json", json.dumps(result, ensure_ascii=False))
+        _write(self.handoff_dir / f"conversation_{num}_session.txt", str(result.get("session_id") or ""))
+        self._append(transcript, "Response 1", str(result.get("result") or ""))
+
+    def _record_response(self, transcript: TextIO, num: int, index: str, label: str, text: str) -> None:
+        _write(self.handoff_dir / f"conversation_{num}_prompt_{index}.txt", text)
+        self._append(transcript, label, text)
+
+    @staticmethod
+    def _append(fh: TextIO, label: str, text: str) -> None:
+        fh.write(f"### {label}\n\n{text}\n\n")
+
+
+def run_prompts(args: List[str]) -> int:
+    if args[:1] in (["--help"], ["-h"]):
+        print(PROMPTS_USAGE)
+        return 0
+    log = WorkflowLog(levels=True)
+    log("Starting sequential prompt runner", "STAGE")
+    project, prompts_path = _resolve_args(args, PROMPTS_USAGE)
+    if not project.is_dir():
+        print(f"Error: Directory '{project}' does not exist")
+        return 1
+    prompts_file = Path(prompts_path)
+    if not prompts_file.is_file():
+        log(f"Prompts file not found: {prompts_path}", "ERROR")
+        return 1
+    project, prompts_file = project.resolve(), prompts_file.resolve()
+    log(f"Project directory resolved to {project}")
+    log(f"Prompts file resolved to {prompts_file}")
+    try:
+        return PromptSequence(project, prompts_file, log).run()
+    finally:
+        log.close()
+
+
+# ---------------------------- Handoff workflow ---------------------------
+
+HANDOFF_USAGE = """Usage:
+  run_sequence_handoff.sh <initial_task>                     # Execute in current directory
+  run_sequence_handoff.sh <project_directory> <initial_task> # Execute in specified directory
+  run_sequence_handoff.sh --resume [project_directory]        # Continue after a crash
+
+Runs a multi-stage Claude Code workflow; each stage is a separate conversation
+and a structured handoff summary is passed to the next one.
+Files are written to <project>/plan/handoffs/ (workflow_status.txt,
+workflow_log.txt, stage_N_handoff.txt, checkpoint.json, ...).
+
+--resume skips every stage recorded in checkpoint.json whose handoff file is
+unchanged and restarts at the first incomplete stage, reusing the session id."""
+
+STAGES = [
+    "investigate",
+    "plan",
+    "plan",
+    "executeverify",
+    "executeverify",
+    "replan",
+    "executeverify",
+    "executeverify",
+    "cleanup",
+    "summary",
+]
+
+_DEBUG_HELP = (
+    "dont hesitate to use standalone/one-off/debugging scripts & add print lines during this task "
+    "if helpful. test and check all assumptions."
+)
+_UPDATE_PLAN = "update the plan as you go. ensure that the planning/markdown file(s) are always up to date."
+_USE_AGENTS = "use many agents."
+PLAN_SUFFIX = f"{_DEBUG_HELP} {_UPDATE_PLAN} {_USE_AGENTS}"
+
+STAGE_PROMPTS = {
+    "investigate": "/plan conduct deep and thorough investigations, research, testing, debugging, etc on the task at hand. do not plan/execute yet, just investigate/research. " + PLAN_SUFFIX,
+    "plan": "/plan create/continue to flesh out the plan. ensure that there is defined scope, no ambiguity, and no chance for overly complex solutions or overengineering. do not start executing the plan yet, just plan. " + PLAN_SUFFIX,
+    "executeverify": "/plan review the plan and context to date - figure out if there are remaining tasks left to complete. if there is nothing left to execute then verify everything. if there is nothing left to execute or verify, then just return (do nothing). otherwise, execute all remaining tasks then verify that everything has been completed correctly in accordance with the plan and project principles. " + PLAN_SUFFIX,
+    "replan": "/plan take a moment to take a step back and take in everything in /plan/handoffs/. review all the investigations, planning, execution, verification to date. establish a consolidated plan for moving forward. what has been done, and what needs to be done. if there is nothing left to execute then verify everything. review everything against the original task and requirements. if there is nothing left to execute or verify, then just return (do nothing). otherwise, create a new plan for getting to the finish line from here. " + PLAN_SUFFIX,
+    "cleanup": "/plan conduct a deep and thorough cleanup of the project. remove all files and directories that are no longer needed. dont remove the /plan/handoffs directory.",
+    "summary": "/plan summarize this conversation so far. output the summary here (not into a file). dont remove the /plan/handoffs directory.",
+}
+
+
+def stage_handoff_prompt(stage_name: str, stage_num: int) -> str:
+    """Rolling handoff prompt: consolidates all prior work into the current summary."""
+    return f"""/plan Save all information from this chat into your markdown plan file(s), then generate a comprehensive handoff summary.
+
+IMPORTANT: Before writing your summary, examine the handoff directory at {CONTAINER_HANDOFF_DIR}/ and read ALL prior stage handoff files (stage_1_handoff.txt, stage_2_handoff.txt, etc.) to understand the complete workflow context.
+
+Your handoff summary should consolidate:
+1. ALL essential information from the original task
+2. ALL work completed in previous stages (from prior handoffs)
+3. ALL work completed in this current stage (from this chat)
+
+Include:
+
+## Consolidated Workflow Summary: {stage_name} (Stage {stage_num})
+
+## Complete Task Context
+- Original task and requirements
+- All work completed across ALL stages so far
+- All project files created, modified, or deleted (all stages)
+- All plan/markdown/txt/etc files created, modified, or deleted (all stages)
+- All critical decisions made throughout workflow
+- Any blockers or issues encountered (any stage)
+- Maintain a timelines across all stages.
+
+## Current Workflow State
+- Complete status of the main task/objective
+- All relevant files and directories from entire workflow
+- All intermediate results and findings so far
+- Progress made across all stages
+
+## For Next Stage
+- What the next stage should focus on
+- Any specific requirements or constraints
+- Files/directories they should examine first
+- Complete context needed to continue the work
+- If workflow is complete, clearly state this
+
+## Instructions
+- This summary will be the ONLY context passed to the next stage
+- Include everything important from the entire workflow so far
+- No word limit - be as comprehensive as needed
+- Focus on actionable information and concrete results
+- Include specific file paths and complete status
+- This is a rolling summary - each stage builds on all previous work
+
+Write a very detailed handoff document for another person to take over.
+
+Output this consolidated handoff summary in plain text (not markdown) for easy parsing."""
+
+
+class HandoffWorkflow:
+    """Runs STAGES as separate conversations joined by rolling handoff summaries."""
+
+    def __init__(
+        self, project_dir: Path, initial_task: str, log: WorkflowLog, resume: bool = False
+    ) -> None:
+        self.project_dir = project_dir
+        self.initial_task = initial_task
+        self.log = log
+        self.resume = resume
+        self.session_id = str(uuid.uuid4())
+        self.handoff_dir = project_dir / "plan" / "handoffs"
+        self.status_file = self.handoff_dir / "workflow_status.txt"
+        self.checkpoint_path = self.handoff_dir / CHECKPOINT_NAME
+        self.checkpoint: Dict[str, Any] = {}
+        self.stages = list(STAGES)
+        self.timings: List[Dict[str, object]] = []
+        self.stage_cache = stage_cache.open_cache()
+        unique = f"{int(time.time())}_{os.uname().nodename}_{os.getpid()}"
+        self.container = Container(f"claude_handoff_{project_dir.name}_{unique}", project_dir)
+
+    # ----------------------------- Bookkeeping ---------------------------
+
+    def update_status(self, status: str, stage: str = "", details: str = "") -> None:
+        lines = [
+            f"WORKFLOW_STATUS={status}",
+            f"CURRENT_STAGE={stage}",
+            f"SESSION_ID={self.session_id}",
+            f"LAST_UPDATE={time.ctime()}",
+        ]
+        if details:
+            lines.append(f"DETAILS={details}")
+        _write(self.status_file, "\n".join(lines) + "\n")
+        publish(
+            "runner_status",
+            workflow="handoff",
+            session_id=self.session_id,
+            project_dir=str(self.project_dir),
+            status=status,
+            stage=stage,
+            details=details,
+        )
+        suffix = (f" - Stage: {stage}" if stage else "") + (f" - {details}" if details else "")
+        self.log(f"Status updated: {status}{suffix}")
+
+    def build_context(self, stage_num: int) -> str:
+        """Stage 1 gets the original task; later stages only the latest rolling handoff.
+
+        The handoff is held to the context budget; the task is passed as written.
+        """
+        if stage_num > 1:
+            previous = self.handoff_dir / f"stage_{stage_num - 1}_handoff.txt"
+            if previous.is_file():
+                summary = bounded_context(
+                    previous.read_text(encoding="utf-8"), self.handoff_dir, previous.name, self.log
+                )
+                return f"## Previous Stage Summary (All Workflow Context)\n{summary}\n\n"
+        initial = self.handoff_dir / "initial_task.txt"
+        if initial.is_file():
+            return f"## Original Task\n{initial.read_text(encoding='utf-8')}\n\n"
+        return ""
+
+    def claude_with_retry(self, description: str, prompt: str) -> str:
+        """Run a fresh conversation, retrying up to RETRY_ATTEMPTS times with backoff."""
+        for attempt in range(1, RETRY_ATTEMPTS + 1):
+            self.log(f"🔄 {description} (attempt {attempt})")
+            try:
+                text = str(self.container.claude(prompt).get("result") or "")
+            except ClaudeError as e:
+                if attempt < RETRY_ATTEMPTS:
+                    delay = backoff_delay(attempt)
+                    self.log(f"⚠️  {description} failed (attempt {attempt}), retrying in {delay:.1f} seconds...")
+                    time.sleep(delay)
+                    continue
+                self.log(f"❌ {description} failed after {attempt} attempt(s) ({e})")
+                raise
+            if attempt > 1:
+                self.log(f"✅ {description} succeeded on retry")
+            return text
+        raise AssertionError("unreachable")
+
+    # ----------------------------- Checkpoints ---------------------------
+
+    def _task_hash(self) -> str:
+        return hashlib.sha256(self.initial_task.encode("utf-8")).hexdigest()
+
+    def load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        try:
+            data = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict) or data.get("version") != CHECKPOINT_VERSION:
+            return None
+        return data
+
+    def resume_point(self, checkpoint: Dict[str, Any]) -> int:
+        """Number of leading stages whose checkpoint entry still matches the files on disk."""
+        done = 0
+        for num, record in enumerate(checkpoint.get("completed", []), 1):
+            if num > len(self.stages) or record.get("num") != num or record.get("name") != self.stages[num - 1]:
+                break
+            handoff = self.handoff_dir / f"stage_{num}_handoff.txt"
+            if sha256_file(handoff) != record.get("handoff_sha256"):
+                self.log(f"⚠️  {handoff.name} changed or is missing since it was checkpointed; rerunning stage {num}")
+                break
+            done = num
+        return done
+
+    def save_checkpoint(self) -> None:
+        _atomic_write(self.checkpoint_path, json.dumps(self.checkpoint, indent=2) + "\n")
+
+    def record_stage(self, stage_name: str, stage_num: int, breakdown: str) -> None:
+        completed = self.checkpoint.setdefault("completed", [])
+        del completed[stage_num - 1:]
+        completed.append(
+            {
+                "num": stage_num,
+                "name": stage_name,
+                "handoff_sha256": sha256_file(self.handoff_dir / f"stage_{stage_num}_handoff.txt"),
+                "finished_at": time.time(),
+                "breakdown": breakdown,
+            }
+        )
+        self.save_checkpoint()
+
+    # ------------------------------- Stages ------------------------------
+
+    def execute_stage(self, stage_name: str, stage_num: int) -> None:
+        log, total = self.log, len(self.stages)
+        stage_start = time.time()
+        log("==================================")
+        log(f"STAGE {stage_num}/{total}: {stage_name}")
+        log(f"Session: {self.session_id}")
+        log(f"Start time: {time.ctime(stage_start)}")
+        log("==================================")
+        self.update_status("STAGE_STARTING", stage_name, f"Stage {stage_num} of {total}")
+
+        context = self.build_context(stage_num)
+        context_words = word_count(context)
+        log(f"📝 Context built: {context_words} words from previous stages")
+        full_prompt = f"{STAGE_PROMPTS[stage_name]}\n\n## Context from Previous Stages\n{context}"
+        prompt_words = word_count(full_prompt)
+        prompt_file = self.handoff_dir / f"stage_{stage_num}_prompt.txt"
+        _write(prompt_file, full_prompt + "\n")
+        log(f"📄 Full prompt created: {prompt_words} total words, saved to {prompt_file}")
+        cache_key, tree, hit = cache_lookup(
+            self.stage_cache, self.project_dir, "handoff", MODEL, stage_name, str(stage_num), full_prompt
+        )
+        context_done = time.time()
+
+        log(f"🚀 EXECUTING STAGE {stage_name}...")
+        self.update_status("STAGE_EXECUTING", stage_name, f"Claude processing stage {stage_num}")
+        output_file = self.handoff_dir / f"stage_{stage_num}_output.txt"
+        if hit is not None:
+            log(f"♻️  Cache hit for stage {stage_name}: same prompt and tree as a previous run; file changes applied")
+            output = str(hit.get("output") or "")
+        else:
+            try:
+                output = self.claude_with_retry(f"Claude stage execution for {stage_name}", full_prompt)
+            except ClaudeError:
+                # Later stages would only build on a broken context, so the run stops here.
+                log(f"⚠️  WARNING: Stage {stage_name} failed")
+                self.update_status("STAGE_ERROR", stage_name, "Claude failed after retry")
+                raise
+        _write(output_file, output)
+        claude_done = time.time()
+        claude_sec = int(claude_done - context_done)
+        log(f"✅ Stage {stage_name} completed successfully in {claude_sec}s")
+        log(f"📝 Stage output saved to: {output_file}")
+
+        log("📋 GENERATING HANDOFF SUMMARY...")
+        self.update_status("GENERATING_HANDOFF", stage_name, "Creating handoff summary")
+        raw_file = self.handoff_dir / f"stage_{stage_num}_handoff_raw.txt"
+        handoff_file = self.handoff_dir / f"stage_{stage_num}_handoff.txt"
+        if hit is not None:
+            raw = str(hit.get("handoff_raw") or "")
+        else:
+            try:
+                raw = self.claude_with_retry(
+                    f"Claude handoff generation for {stage_name}", stage_handoff_prompt(stage_name, stage_num)
+                )
+            except ClaudeError:
+                self.update_status("STAGE_ERROR", stage_name, "Handoff generation failed after retry")
+                raise
+            cache_store(
+                self.stage_cache,
+                self.project_dir,
+                self.log,
+                cache_key,
+                tree,
+                {"workflow": "handoff", "stage": stage_name, "output": output, "handoff_raw": raw},
+            )
+        _write(raw_file, raw)
+        handoff = extract_handoff(raw) if raw else "Warning: Missing conversation output for handoff\n"
+        _write(handoff_file, handoff)
+        handoff_done = time.time()
+        handoff_sec = int(handoff_done - claude_done)
+        handoff_words = word_count(handoff)
+        log(f"📊 Handoff summary: {handoff_words} words, generated in {handoff_sec}s")
+        log(f"💾 Handoff saved to: {handoff_file}")
+
+        stage_end = time.time()
+        total_sec = int(stage_end - stage_start)
+        log(f"🏁 Stage {stage_name} COMPLETE - Total time: {total_sec}s")
+        publish(
+            "runner_stage_end",
+            workflow="handoff",
+            session_id=self.session_id,
+            project_dir=str(self.project_dir),
+            stage=stage_name,
+            stage_num=stage_num,
+            seconds=round(stage_end - stage_start, 1),
+            cached=hit is not None,
+        )
+        self.update_status("STAGE_COMPLETED", stage_name, f"Completed in {total_sec}s")
+
+        breakdown = (
+            f"Context Building: {int(context_done - stage_start)}s\n"
+            f"Claude Execution: {claude_sec}s\n"
+            f"Handoff Generation: {handoff_sec}s\n"
+            f"Cleanup/Other: {int(stage_end - handoff_done)}s"
+        )
+        self.timings.append({"num": stage_num, "name": stage_name, "breakdown": breakdown})
+        self.record_stage(stage_name, stage_num, breakdown)
+        rate = lambda words, sec: f"{words / sec:.2f}" if sec > 0 else "N/A"  # noqa: E731
+        summary_file = self.handoff_dir / f"stage_{stage_num}_summary.txt"
+        _write(
+            summary_file,
+            f"""STAGE SUMMARY: {stage_name} (Stage {stage_num}/{total})
+========================================================
+Start Time: {time.ctime(stage_start)}
+End Time: {time.ctime(stage_end)}
+Total Duration: {total_sec}s
+
+TIMING BREAKDOWN:
+-----------------
+{breakdown}
+
+PERFORMANCE METRICS:
+--------------------
+Words per second (Claude): {rate(prompt_words, claude_sec)}
+Words per second (Handoff): {rate(handoff_words, handoff_sec)}
+
+DATA SIZES:
+-----------
+Prompt Length: {prompt_words} words
+Context Length: {context_words} words
+Handoff Length: {handoff_words} words
+Status: SUCCESS
+
+FILES:
+------
+- {prompt_file}
+- {handoff_file}
+- {raw_file}
+- {output_file}
+- {summary_file}
+""",
+        )
+        log(f"📋 Stage summary saved to: {summary_file}")
+        log("")
+
+    # -------------------------------- Run --------------------------------
+
+    def _prepare_resume(self) -> Optional[int]:
+        """Adopt a matching checkpoint; returns the stages already done, or None to start fresh."""
+        checkpoint = self.load_checkpoint()
+        if checkpoint is None:
+            return None
+        if not self.initial_task:
+            initial = self.handoff_dir / "initial_task.txt"
+            self.initial_task = initial.read_text(encoding="utf-8").rstrip("\n") if initial.is_file() else ""
+        if self._task_hash() != checkpoint.get("task_sha256"):
+            raise ClaudeError("checkpoint belongs to a different task; run without --resume to start over")
+        self.checkpoint = checkpoint
+        self.session_id = str(checkpoint.get("session_id") or self.session_id)
+        done = self.resume_point(checkpoint)
+        del checkpoint["completed"][done:]
+        self.timings = [
+            {"num": r["num"], "name": r["name"], "breakdown": r.get("breakdown", "")}
+            for r in checkpoint["completed"]
+        ]
+        return done
+
+    def run(self) -> int:
+        log = self.log
+        done = self._prepare_resume() if self.resume else None
+        if done is not None:
+            log.attach(self.handoff_dir / "workflow_log.txt", header=f"Workflow resumed at {time.ctime()}", append=True)
+            log(f"♻️  Resuming session {self.session_id}: {done}/{len(self.stages)} stages already complete")
+        else:
+            if not self.initial_task:
+                raise ClaudeError(f"nothing to resume in {self.handoff_dir} and no initial task given")
+            if self.handoff_dir.is_dir():
+                log("🧹 Cleaning up previous handoff directory...")
+                for child in self.handoff_dir.iterdir():
+                    if child.is_dir() and not child.is_symlink():
+                        shutil.rmtree(child)
+                    else:
+                        child.unlink()
+                log("✅ Previous handoffs cleared")
+            self.handoff_dir.mkdir(parents=True, exist_ok=True)
+            log.attach(self.handoff_dir / "workflow_log.txt", header=f"Workflow started at {time.ctime()}")
+            _write(self.status_file, "WORKFLOW_STATUS=INITIALIZING\n")
+            log(f"📁 Fresh handoff directory created: {self.handoff_dir}")
+            _write(self.handoff_dir / "initial_task.txt", self.initial_task + "\n")
+            self.checkpoint = {
+                "version": CHECKPOINT_VERSION,
+                "session_id": self.session_id,
+                "task_sha256": self._task_hash(),
+                "stages": self.stages,
+                "completed": [],
+            }
+            self.save_checkpoint()
+            done = 0
+
+        log("==================================")
+        log("Claude Code Handoff Workflow STARTED")
+        log("==================================")
+        log(f"Project: {self.project_dir}")
+        log(f"Session ID: {self.session_id}")
+        if os.environ.get("HOST_TZ"):
+            log(f"Host timezone: {os.environ['HOST_TZ']}")
+        log(f"Handoff Dir: {self.handoff_dir}")
+        log("")
+        self.update_status("STARTING", "", "Initializing workflow components")
+
+        log(f"📝 Initial task: {word_count(self.initial_task)} words")
+        log(f"🐳 Container name: {self.container.name}")
+
+        try:
+            self.update_status("CONTAINER_STARTING", "", "Starting Docker container")
+            started = time.time()
+            self.container.start()
+            startup_sec = int(time.time() - started)
+            log(f"✅ Container started successfully in {startup_sec}s")
+            self.update_status("CONTAINER_READY", "", "Container ready for stages")
+
+            total = len(self.stages)
+            log("🚀 STARTING WORKFLOW EXECUTION")
+            log(f"Stages: {' '.join(self.stages)}")
+            workflow_start = time.time()
+            self.update_status("WORKFLOW_EXECUTING", "", f"Executing {total} stages")
+            for num, stage in enumerate(self.stages, 1):
+                if num <= done:
+                    log(f"⏩ Skipping stage {num} of {total}: {stage} (checkpointed)")
+                    continue
+                log("")
+                log(f"⏭️  Proceeding to stage {num} of {total}: {stage}")
+                self.execute_stage(stage, num)
+                log(f"📊 Progress: {num}/{total} stages complete ({num * 100 // total}%)")
+
+            minutes, seconds = divmod(int(time.time() - workflow_start), 60)
+            log("🎉 ==================================")
+            log("🎉 HANDOFF WORKFLOW COMPLETE!")
+            log("🎉 ==================================")
+            log(f"📊 Total execution time: {minutes}m {seconds}s")
+            log(f"📁 All handoff summaries saved in: {self.handoff_dir}")
+            self.update_status(
+                "WORKFLOW_COMPLETED", "", f"All {total} stages completed in {minutes}m {seconds}s"
+            )
+            self.write_performance(startup_sec, f"{minutes}m {seconds}s")
+            return 0
+        except ClaudeError as e:
+            log(f"❌ Workflow stopped: {e}")
+            return 1
+        finally:
+            self.finish()
+
+    def write_performance(self, startup_sec: int, duration: str) -> None:
+        parts = [
+            "WORKFLOW PERFORMANCE ANALYSIS",
+            "==============================",
+            f"Session ID: {self.session_id}",
+            f"Total Stages: {len(self.stages)}",
+            f"Total Duration: {duration}",
+            f"Container Startup: {startup_sec}s",
+            "",
+            "STAGE PERFORMANCE SUMMARY:",
+            "--------------------------",
+        ]
+        for t in self.timings:
+            parts += ["", f"Stage {t['num']} ({t['name']}):", str(t["breakdown"])]
+        path = self.handoff_dir / "performance_analysis.txt"
+        _write(path, "\n".join(parts) + "\n")
+        self.log(f"📊 Performance analysis saved to: {path}")
+
+    def finish(self) -> None:
+        self.log("🧹 Cleaning up container and finalizing logs...")
+        self.update_status("CLEANUP", "", "Removing container and finalizing")
+        self.container.remove()
+        listing = "\n".join(
+            f"{p.stat().st_size:>10}  {p.name}" for p in sorted(self.handoff_dir.iterdir()) if p.exists()
+        )
+        with open(self.handoff_dir / "workflow_final_summary.txt", "a", encoding="utf-8") as f:
+            f.write(
+                f"WORKFLOW COMPLETED: {time.ctime()}\n"
+                "==========================================\n"
+                f"Session ID: {self.session_id}\n"
+                f"Project: {self.project_dir}\n"
+                f"Total Stages: {len(self.stages)}\n"
+                f"Container: {self.container.name}\n"
+                f"Handoff Directory: {self.handoff_dir}\n\n"
+                f"All files in handoff directory:\n{listing}\n"
+            )
+        self.log(f"📋 Final workflow summary saved to: {self.handoff_dir / 'workflow_final_summary.txt'}")
+
+
+def run_handoff(args: List[str]) -> int:
+    if args[:1] in (["--help"], ["-h"]):
+        print(HANDOFF_USAGE)
+        return 0
+    resume = "--resume" in args
+    args = [a for a in args if a != "--resume"]
+    if resume and len(args) <= 1:
+        project, task = (Path(args[0]) if args else Path.cwd()), ""
+    else:
+        project, task = _resolve_args(args, HANDOFF_USAGE)
+        if not task:
+            print("Error: Initial task cannot be empty")
+            print(HANDOFF_USAGE)
+            return 1
+    if not project.is_dir():
+        print(f"Error: Directory '{project}' does not exist")
+        return 1
+    log = WorkflowLog(levels=False)
+    try:
+        return HandoffWorkflow(project.resolve(), task, log, resume=resume).run()
+    except ClaudeError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        log.close()
+
+
+# --------------------------------- CLI -----------------------------------
+
+
+def main() -> None:
+    commands = {"prompts": run_prompts, "handoff": run_handoff}
+    if len(sys.argv) < 2 or sys.argv[1] not in commands:
+        print("Usage: sequence_runner.py prompts|handoff [args...]  (see --help of each)")
+        sys.exit(1)
+    _install_sigterm()
+    sys.exit(commands[sys.argv[1]](sys.argv[2:]))
+
+
+if __name__ == "__main__":
+    main()
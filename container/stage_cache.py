@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Claude Code Stage Cache
+
+Opt-in, content-addressed store for workflow stage results. A stage whose inputs are
+the same as a previous run (workflow, stage, full prompt text, model, and the
+project's working tree before the stage) reuses that run's output, handoff and file
+changes instead of calling Claude again.
+
+- Enabled by CC_RUNNER_STAGE_CACHE: "1"/"on" for ~/.cache/claude_code/stage_cache,
+  or a directory path. Unset or "off" disables it.
+- The tree hash is `git write-tree` over a scratch copy of the index after `git add -A`
+  (untracked files included, ignored files and plan/handoffs excluded), so the
+  project's real index is never touched. Projects that are not git work trees are
+  never cached. plan/handoffs is left out because the runners write it themselves.
+- An entry keeps what the stage changed in the tree (plan files, code) as a binary
+  `git diff` from the pre-stage tree. A hit applies it with `git apply`; a diff that
+  does not apply cleanly is a miss and the stage runs.
+- Entries are <dir>/<key[:2]>/<key>.json. A hit refreshes the entry's mtime; when the
+  store grows past CC_RUNNER_STAGE_CACHE_MB (default 256) the least recently used
+  entries are removed.
+
+CLI:
+    python3 stage_cache.py stats               # entries and size
+    python3 stage_cache.py clear               # remove every entry
+    python3 stage_cache.py tree PROJECT_DIR    # print the tree hash used in keys
+    python3 stage_cache.py selftest            # cache a handoff stage in a scratch repo, rerun it
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+_SETTING = os.environ.get("CC_RUNNER_STAGE_CACHE", "").strip()
+DEFAULT_DIR = Path.home() / ".cache" / "claude_code" / "stage_cache"
+MAX_BYTES = int(float(os.environ.get("CC_RUNNER_STAGE_CACHE_MB", "256")) * 1024 * 1024)
+TREE_EXCLUDES = (":(exclude)plan/handoffs",)
+KEY_VERSION = 2
+
+
+def cache_dir() -> Optional[Path]:
+    if _SETTING.lower() in ("", "0", "off", "false"):
+        return None
+    if _SETTING.lower() in ("1", "on", "true"):
+        return DEFAULT_DIR
+    return Path(os.path.expanduser(_SETTING))
+
+
+def tree_hash(project_dir: Path) -> Optional[str]:
+    """Hash of the working tree contents, or None if it is not a git work tree."""
+    git = ["git", "-C", str(project_dir)]
+    try:
+        index = subprocess.run(
+            [*git, "rev-parse", "--git-path", "index"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        with tempfile.TemporaryDirectory(prefix="stage_cache_") as tmp:
+            scratch = os.path.join(tmp, "index")
+            real = index if os.path.isabs(index) else os.path.join(project_dir, index)
+            if os.path.exists(real):
+                # Starting from the real index lets git reuse its stat cache.
+                shutil.copyfile(real, scratch)
+            env = dict(os.environ, GIT_INDEX_FILE=scratch)
+            subprocess.run(
+                [*git, "add", "-A", "--", ".", *TREE_EXCLUDES], env=env, capture_output=True, check=True
+            )
+            return subprocess.run(
+                [*git, "write-tree"], env=env, capture_output=True, text=True, check=True
+            ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def tree_diff(project_dir: Path, before: str, after: str) -> Optional[str]:
+    """Binary patch from tree `before` to tree `after` ("" when equal), or None on error."""
+    if before == after:
+        return ""
+    try:
+        return subprocess.run(
+            ["git", "-C", str(project_dir), "diff", "--binary", "--full-index", "--no-renames", before, after],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def apply_diff(project_dir: Path, diff: str) -> bool:
+    """Apply a tree_diff() patch to the work tree; False (tree untouched) if it does not apply."""
+    if not diff:
+        return True
+    git = ["git", "-C", str(project_dir), "apply", "--binary", "--whitespace=nowarn"]
+    try:
+        for check in (["--check"], []):
+            subprocess.run([*git, *check, "-"], input=diff, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    return True
+
+
+def make_key(*parts: str) -> str:
+    h = hashlib.sha256(f"v{KEY_VERSION}".encode("utf-8"))
+    for part in parts:
+        data = part.encode("utf-8")
+        h.update(len(data).to_bytes(8, "big"))
+        h.update(data)
+    return h.hexdigest()
+
+
+class StageCache:
+    def __init__(self, root: Path, max_bytes: int = MAX_BYTES) -> None:
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            record = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return record if isinstance(record, dict) else None
+
+    def put(self, key: str, record: Dict[str, Any]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(dict(record, created=time.time()), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+        self.evict()
+
+    def entries(self) -> List[Tuple[float, int, Path]]:
+        found = []
+        for path in self.root.glob("??/*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            found.append((st.st_mtime, st.st_size, path))
+        return found
+
+    def evict(self) -> int:
+        """Remove least recently used entries until the store fits; returns the count."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+    def lookup(self, project_dir: Path, *parts: str) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+        """(key, pre-stage tree, record) for a stage about to run in project_dir.
+
+        key is "" when the project cannot be cached. A record is only returned once its
+        file changes have been applied to the work tree; one that does not apply is
+        returned as a miss.
+        """
+        tree = tree_hash(project_dir)
+        if not tree:
+            return "", "", None
+        key = make_key(*parts, tree)
+        record = self.get(key)
+        if record is not None and not apply_diff(project_dir, str(record.get("diff") or "")):
+            record = None
+        return key, tree, record
+
+    def store(self, project_dir: Path, key: str, tree: str, record: Dict[str, Any]) -> bool:
+        """Store a finished stage with its changes since `tree`; False if they cannot be diffed."""
+        after = tree_hash(project_dir)
+        diff = tree_diff(project_dir, tree, after) if after else None
+        if diff is None:
+            return False
+        self.put(key, dict(record, diff=diff, tree_after=after))
+        return True
+
+
+def open_cache() -> Optional[StageCache]:
+    root = cache_dir()
+    return StageCache(root) if root is not None else None
+
+
+def selftest() -> int:
+    """Run the first handoff stage in two scratch repos with the same tree; the rerun must hit.
+
+    The stage behaves like a real one: it edits code and plan/ files (a binary file
+    too), and its handoff comes from a second call. Claude is replaced by a stand-in
+    that counts its calls; everything else is the runner's own code.
+    """
+    os.environ["CC_HOOK_EVENTS"] = "off"  # keep the scratch runs off the event log
+    import sequence_runner
+
+    stage = sequence_runner.STAGES[0]
+    handoff_prompt = sequence_runner.stage_handoff_prompt(stage, 1)
+
+    class FakeClaude:
+        def __init__(self, project: Path) -> None:
+            self.project = project
+            self.calls = 0
+
+        def claude(self, prompt: str, resume: Optional[str] = None) -> Dict[str, Any]:
+            self.calls += 1
+            if prompt == handoff_prompt:
+                return {"result": "## HANDOFF SUMMARY\nsrc/app.py greets; next: tests\n", "session_id": "h"}
+            (self.project / "plan").mkdir(exist_ok=True)
+            (self.project / "plan" / "plan.md").write_text("1. greet\n2. test\n", encoding="utf-8")
+            app = self.project / "src" / "app.py"
+            app.write_text(app.read_text(encoding="utf-8") + "print('hello')\n", encoding="utf-8")
+            (self.project / "src" / "logo.bin").write_bytes(bytes(range(256)))
+            return {"result": "Read src/app.py, wrote plan/plan.md.", "session_id": "s"}
+
+    def make_repo(path: Path) -> Path:
+        (path / "src").mkdir(parents=True)
+        (path / "src" / "app.py").write_text("def main():\n    pass\n", encoding="utf-8")
+        git = ["git", "-C", str(path), "-c", "user.name=selftest", "-c", "user.email=selftest@localhost"]
+        for cmd in (["init", "-q"], ["add", "-A"], ["commit", "-q", "-m", "init"]):
+            subprocess.run([*git, *cmd], check=True, capture_output=True)
+        return path
+
+    def run(project: Path, cache: StageCache) -> Tuple[int, Optional[str], str]:
+        quiet = lambda message, level="INFO": None  # noqa: E731
+        wf = sequence_runner.HandoffWorkflow(project, "add a greeting", quiet)  # type: ignore[arg-type]
+        wf.stage_cache = cache
+        wf.container = fake = FakeClaude(project)  # type: ignore[assignment]
+        wf.handoff_dir.mkdir(parents=True)
+        wf.execute_stage(stage, 1)
+        return fake.calls, tree_hash(project), (wf.handoff_dir / "stage_1_handoff.txt").read_text(encoding="utf-8")
+
+    with tempfile.TemporaryDirectory(prefix="stage_cache_selftest_") as tmp:
+        cache = StageCache(Path(tmp) / "cache")
+        before = tree_hash(make_repo(Path(tmp) / "first"))
+        first_calls, first_tree, first_handoff = run(Path(tmp) / "first", cache)
+        stored = len(cache.entries())
+        rerun = make_repo(Path(tmp) / "rerun")
+        same_start = tree_hash(rerun) == before
+        rerun_calls, rerun_tree, rerun_handoff = run(rerun, cache)
+        plan = (rerun / "plan" / "plan.md").is_file()
+
+    checks = [
+        ("first run calls Claude for the stage and its handoff", first_calls == 2),
+        ("the stage changed the tree and was stored", first_tree != before and stored == 1),
+        ("rerun starts from the same tree", same_start),
+        ("rerun is a cache hit (no Claude calls)", rerun_calls == 0),
+        ("rerun ends with the same tree, plan/ and code included", plan and rerun_tree == first_tree),
+        ("rerun writes the same handoff", rerun_handoff == first_handoff),
+    ]
+    for label, ok in checks:
+        print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    return 0 if all(ok for _, ok in checks) else 1
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    if args == ["selftest"]:
+        sys.exit(selftest())
+    if args[:1] == ["tree"] and len(args) == 2:
+        print(tree_hash(Path(args[1])) or "not a git work tree")
+        return
+    cache = StageCache(cache_dir() or DEFAULT_DIR)
+    if args == ["stats"]:
+        entries = cache.entries()
+        size = sum(s for _, s, _ in entries)
+        limit = cache.max_bytes / 1024 / 1024
+        print(f"{cache.root}: {len(entries)} entries, {size / 1024 / 1024:.1f} MB of {limit:.0f} MB")
+    elif args == ["clear"]:
+        for _, _, path in cache.entries():
+            path.unlink(missing_ok=True)
+        print(f"Cleared {cache.root}")
+    else:
+        print(__doc__.strip().split("CLI:")[1].strip(), file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""
+Claude Code Workflow Scheduler
+
+Runs the same kind of work across many repositories with a bounded pool of concurrent
+jobs. Each job is one invocation of an existing runner script, so containers, settings
+backup/restore and handoff files behave exactly as for a manual run:
+
+- "prompts":  run_sequence_prompts.sh <project> <prompts file>
+- "handoff":  run_sequence_handoff.sh <project> <task>
+- "workflow": a hook workflow trigger such as --longrun, sent as the first prompt of a
+              run_sequence_prompts.sh conversation (the hook drives the stages from there)
+
+Manifest (JSON):
+
+    {
+      "max_parallel": 4,          # jobs running at once (default: CPU count)
+      "max_per_group": 2,         # optional cap per group
+      "jobs": [
+        {"id": "api", "project": "~/src/api", "prompts": "prompts.txt"},
+        {"project": "~/src/web", "workflow": "--longrun", "task": "fix flaky tests", "group": "web"},
+        {"project": "~/src/cli", "handoff": "Review code and suggest improvements"}
+      ]
+    }
+
+Relative paths are resolved against the manifest's directory. A job's id defaults to
+its project directory name; "group" defaults to the id.
+
+Scheduling:
+- at most max_parallel jobs run, at most max_per_group per group, and never two jobs on
+  the same project directory (they would share plan/handoffs and .claude/settings.json);
+- groups are served round-robin, so one group with many jobs cannot starve the others.
+
+Progress is kept per job in <state dir>/workflow_state_<job id>.json, the same one-file-
+per-session convention the hook uses. Re-running the manifest skips finished jobs and
+restarts jobs that were running when the scheduler died (handoff jobs resume from their
+last checkpointed stage). Job output goes to
+<state dir>/logs/<job id>.log.
+
+CLI:
+    python3 workflow_scheduler.py run MANIFEST [--jobs N] [--state-dir DIR] [--retry-failed]
+    python3 workflow_scheduler.py status MANIFEST [--state-dir DIR]
+    python3 workflow_scheduler.py reset MANIFEST [--state-dir DIR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+RUNNERS = {
+    "prompts": SCRIPT_DIR / "run_sequence_prompts.sh",
+    "handoff": SCRIPT_DIR / "run_sequence_handoff.sh",
+}
+JOB_KINDS = ("prompts", "handoff", "workflow")
+TERMINATE_GRACE_SEC = 30.0
+
+
+class ManifestError(ValueError):
+    """The manifest is missing, malformed, or describes an impossible job."""
+
+
+def log(message: str) -> None:
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {message}", flush=True)
+
+
+def _atomic_write(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+# ------------------------------- Manifest --------------------------------
+
+
+class Job:
+    def __init__(self, spec: Dict[str, Any], base: Path) -> None:
+        kinds = [k for k in JOB_KINDS if k in spec]
+        if len(kinds) != 1:
+            raise ManifestError(f"job needs exactly one of {JOB_KINDS}: {spec}")
+        self.kind = kinds[0]
+        if not spec.get("project"):
+            raise ManifestError(f"job is missing 'project': {spec}")
+        self.project = (base / os.path.expanduser(str(spec["project"]))).resolve()
+        self.id = str(spec.get("id") or self.project.name)
+        self.group = str(spec.get("group") or self.id)
+        self.spec = spec
+        if self.kind == "prompts":
+            self.prompts_file = (base / os.path.expanduser(str(spec["prompts"]))).resolve()
+        elif self.kind == "workflow" and not str(spec["workflow"]).startswith("--"):
+            raise ManifestError(f"job {self.id}: 'workflow' must be a trigger such as --longrun")
+
+    def command(self, state_dir: Path, resume: bool = False) -> List[str]:
+        if self.kind == "prompts":
+            return ["bash", str(RUNNERS["prompts"]), str(self.project), str(self.prompts_file)]
+        if self.kind == "handoff":
+            # A restarted handoff job continues from its last checkpointed stage.
+            flag = ["--resume"] if resume else []
+            return ["bash", str(RUNNERS["handoff"]), *flag, str(self.project), str(self.spec["handoff"])]
+        # A prompts file with a single prompt: the trigger plus the task text.
+        prompt_file = state_dir / f"workflow_prompt_{self.id}.txt"
+        prompt = f"{self.spec['workflow']} {self.spec.get('task', '')}".strip()
+        # Blank lines would split it into several prompts.
+        _atomic_write(prompt_file, "\n".join(line for line in prompt.splitlines() if line.strip()) + "\n")
+        return ["bash", str(RUNNERS["prompts"]), str(self.project), str(prompt_file)]
+
+
+def load_manifest(path: Path) -> Dict[str, Any]:
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        raise ManifestError(f"cannot read manifest {path}: {e}") from e
+    if isinstance(raw, list):
+        raw = {"jobs": raw}
+    if not isinstance(raw, dict) or not isinstance(raw.get("jobs"), list):
+        raise ManifestError("manifest must be a list of jobs or an object with a 'jobs' list")
+    base = path.resolve().parent
+    jobs = [Job(spec, base) for spec in raw["jobs"]]
+    seen = set()
+    for job in jobs:
+        if job.id in seen:
+            raise ManifestError(f"duplicate job id {job.id!r}; set 'id' explicitly")
+        seen.add(job.id)
+    return {
+        "jobs": jobs,
+        "max_parallel": int(raw.get("max_parallel") or os.cpu_count() or 1),
+        "max_per_group": int(raw.get("max_per_group") or 0),
+    }
+
+
+# ------------------------------ Job state --------------------------------
+
+
+class JobState:
+    """One workflow_state_<job id>.json file: pending, running, done or failed."""
+
+    def __init__(self, state_dir: Path, job: Job) -> None:
+        self.path = state_dir / f"workflow_state_{job.id}.json"
+        self.job = job
+        try:
+            self.data: Dict[str, Any] = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.data = {"job_id": job.id, "status": "pending", "attempts": 0}
+
+    @property
+    def status(self) -> str:
+        return str(self.data.get("status", "pending"))
+
+    def update(self, **fields: Any) -> None:
+        self.data.update(fields, job_id=self.job.id, kind=self.job.kind, project=str(self.job.project),
+                         updated_at=time.time())
+        _atomic_write(self.path, json.dumps(self.data, separators=(",", ":")))
+
+
+# ------------------------------ Scheduler --------------------------------
+
+
+class Scheduler:
+    def __init__(
+        self, jobs: List[Job], state_dir: Path, max_parallel: int, max_per_group: int
+    ) -> None:
+        self.state_dir = state_dir
+        self.log_dir = state_dir / "logs"
+        self.max_parallel = max(1, max_parallel)
+        self.max_per_group = max_per_group
+        self.states = {job.id: JobState(state_dir, job) for job in jobs}
+        # Per-group FIFO queues, served round-robin in manifest order of first appearance.
+        self.queues: "OrderedDict[str, Deque[Job]]" = OrderedDict()
+        self.running: Dict[str, asyncio.subprocess.Process] = {}
+        self.group_running: Dict[str, int] = {}
+        self.busy_projects: set = set()
+        self.stopping = False
+
+    def enqueue(self, retry_failed: bool) -> int:
+        queued = 0
+        for st in self.states.values():
+            if st.status == "done" or (st.status == "failed" and not retry_failed):
+                continue
+            if st.status == "running":
+                log(f"{st.job.id}: was running when the scheduler stopped; restarting")
+            self.queues.setdefault(st.job.group, deque()).append(st.job)
+            queued += 1
+        return queued
+
+    def _next_job(self) -> Optional[Job]:
+        """Round-robin over groups; skip groups at their cap and projects already in use."""
+        for _ in range(len(self.queues)):
+            group, queue = next(iter(self.queues.items()))
+            self.queues.move_to_end(group)
+            if self.max_per_group and self.group_running.get(group, 0) >= self.max_per_group:
+                continue
+            for job in queue:
+                if job.project not in self.busy_projects:
+                    queue.remove(job)
+                    if not queue:
+                        del self.queues[group]
+                    return job
+        return None
+
+    async def _run_job(self, job: Job) -> None:
+        st = self.states[job.id]
+        attempts = int(st.data.get("attempts", 0)) + 1
+        log_path = self.log_dir / f"{job.id}.log"
+        st.update(status="running", attempts=attempts, started_at=time.time(), log=str(log_path))
+        log(f"{job.id}: started ({job.kind}, {job.project}) attempt {attempts}")
+        started = time.time()
+        rc = -1
+        try:
+            if not job.project.is_dir():
+                raise ManifestError(f"project directory not found: {job.project}")
+            with open(log_path, "ab") as out:
+                proc = await asyncio.create_subprocess_exec(
+                    *job.command(self.state_dir, resume=attempts > 1),
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=out,
+                    stderr=asyncio.subprocess.STDOUT,
+                    start_new_session=True,  # lets stop() signal the whole runner tree
+                )
+                self.running[job.id] = proc
+                rc = await proc.wait()
+        except (OSError, ManifestError) as e:
+            log(f"{job.id}: could not start: {e}")
+        finally:
+            self.running.pop(job.id, None)
+            self.group_running[job.group] -= 1
+            self.busy_projects.discard(job.project)
+
+        elapsed = int(time.time() - started)
+        if self.stopping:
+            st.update(status="pending", rc=rc, interrupted_at=time.time())
+            log(f"{job.id}: interrupted after {elapsed}s; will restart on the next run")
+        elif rc == 0:
+            st.update(status="done", rc=rc, finished_at=time.time(), duration_sec=elapsed)
+            log(f"{job.id}: done in {elapsed}s")
+        else:
+            st.update(status="failed", rc=rc, finished_at=time.time(), duration_sec=elapsed)
+            log(f"{job.id}: FAILED with exit code {rc} after {elapsed}s (log: {log_path})")
+
+    async def run(self) -> int:
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        tasks: set = set()
+        wake = asyncio.Event()
+        while True:
+            while not self.stopping and len(tasks) < self.max_parallel:
+                job = self._next_job()
+                if job is None:
+                    break
+                self.group_running[job.group] = self.group_running.get(job.group, 0) + 1
+                self.busy_projects.add(job.project)
+                task = asyncio.ensure_future(self._run_job(job))
+                task.add_done_callback(lambda t: (tasks.discard(t), wake.set()))
+                tasks.add(task)
+            if not tasks:
+                break
+            wake.clear()
+            await wake.wait()
+        counts = self.counts()
+        log(f"finished: {counts.get('done', 0)} done, {counts.get('failed', 0)} failed, "
+            f"{counts.get('pending', 0)} pending")
+        return 0 if not counts.get("failed") and not counts.get("pending") else 1
+
+    def stop(self) -> None:
+        if self.stopping:
+            return
+        self.stopping = True
+        log(f"stopping: terminating {len(self.running)} running job(s)")
+        for proc in self.running.values():
+            try:
+                os.killpg(proc.pid, signal.SIGTERM)  # runner traps clean up containers/settings
+            except ProcessLookupError:
+                pass
+
+        def _kill() -> None:
+            for proc in self.running.values():
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+        asyncio.get_event_loop().call_later(TERMINATE_GRACE_SEC, _kill)
+
+    def counts(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for st in self.states.values():
+            counts[st.status] = counts.get(st.status, 0) + 1
+        return counts
+
+
+# --------------------------------- CLI -----------------------------------
+
+
+def _state_dir(manifest: Path, override: Optional[str]) -> Path:
+    if override:
+        return Path(override).expanduser().resolve()
+    return manifest.resolve().parent / ".scheduler" / manifest.stem
+
+
+def cmd_run(args: argparse.Namespace) -> int:
+    manifest = load_manifest(Path(args.manifest))
+    state_dir = _state_dir(Path(args.manifest), args.state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    scheduler = Scheduler(
+        manifest["jobs"],
+        state_dir,
+        args.jobs or manifest["max_parallel"],
+        manifest["max_per_group"],
+    )
+    queued = scheduler.enqueue(args.retry_failed)
+    log(f"{queued} of {len(manifest['jobs'])} job(s) queued, up to {scheduler.max_parallel} at once "
+        f"(state: {state_dir})")
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, scheduler.stop)
+    try:
+        return loop.run_until_complete(scheduler.run())
+    finally:
+        loop.close()
+
+
+def cmd_status(args: argparse.Namespace) -> int:
+    manifest = load_manifest(Path(args.manifest))
+    state_dir = _state_dir(Path(args.manifest), args.state_dir)
+    now = time.time()
+    for job in manifest["jobs"]:
+        data = JobState(state_dir, job).data
+        age = f"{int(now - data['updated_at'])}s ago" if "updated_at" in data else "-"
+        print(f"{job.id:<24} {data.get('status', 'pending'):<8} attempts={data.get('attempts', 0)} "
+              f"rc={data.get('rc', '-')} updated {age}  {job.project}")
+    return 0
+
+
+def cmd_reset(args: argparse.Namespace) -> int:
+    manifest = load_manifest(Path(args.manifest))
+    state_dir = _state_dir(Path(args.manifest), args.state_dir)
+    removed = 0
+    for job in manifest["jobs"]:
+        path = JobState(state_dir, job).path
+        if path.exists():
+            path.unlink()
+            removed += 1
+    print(f"cleared progress for {removed} job(s) in {state_dir}")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run Claude Code workflows across many repositories.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("run", "status", "reset"):
+        p = sub.add_parser(name)
+        p.add_argument("manifest")
+        p.add_argument("--state-dir", help="progress directory (default: .scheduler/<manifest> next to it)")
+        if name == "run":
+            p.add_argument("--jobs", type=int, help="override max_parallel")
+            p.add_argument("--retry-failed", action="store_true", help="requeue jobs that failed")
+    args = parser.parse_args()
+    try:
+        sys.exit({"run": cmd_run, "status": cmd_status, "reset": cmd_reset}[args.command](args))
+    except ManifestError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
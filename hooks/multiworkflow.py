@@ -5,10 +5,22 @@ multiworkflow.py — Claude Code hook
 End-to-end, drop-in replacement implementing a robust multi-stage workflow driver.
 
 Key properties:
-- Deterministic continuation using JSON control on Stop/SubagentStop (fallback to stderr+exit 2 via CC_HOOK_MODE=stderr).
-- Self-healing: if a stage injection is swallowed, re-inject (bounded retries/cooldown, persisted across events).
-- Atomic, locked state writes to prevent torn JSON and racey multi-advances.
+- Deterministic continuation using JSON control on Stop (fallback to stderr+exit 2 via CC_HOOK_MODE=stderr).
+- Only the main Stop advances or reinjects. SubagentStop bursts ("use many agents") exit
+  before any state or transcript I/O, and a Stop that finds the transcript unchanged since
+  its stage was entered is treated as a duplicate and skips the scan.
+- Self-healing: if a stage injection is swallowed, re-inject (reinject_policy.py: per-stage budget,
+  exponential backoff gated on transcript growth, one pending injection across event types).
+- Optional per-stage wall-time, transcript-growth and tool-call budgets (stage_budget.py): a stage
+  over budget is asked to wrap up or write a handoff, or is advanced.
+- Incremental transcript index (transcript_index.py): only lines appended since the last event are read.
+- Atomic, locked state writes to prevent torn JSON and racey multi-advances
+  (one lock-free read per event, at most one compare-and-swap write keyed on a generation counter).
 - Stable per-session state keyed by session_id (with hashed fallback).
+- Per-event latency and per-stage timing/reinject metrics (workflow_metrics.py).
+- Host-wide index of active sessions for `multiworkflow.py status|gc` (session_index.py).
+- Stage starts, reinjects and workflow ends are pushed to subscribers as NDJSON (workflow_events.py).
+- Fast start: multiworkflow_hook.py answers events with no active workflow after one stat, without importing this module.
 - Safe across multiple repos/sessions; no cross-talk.
 - Minimal external assumptions; works with your existing settings plus optional SubagentStop/PostToolUse hooks.
 - Slash-command first: stage messages begin with "/plan …" to activate your custom command.
@@ -16,7 +28,7 @@ Key properties:
 
 from __future__ import annotations
 
-import hashlib
+import copy
 import json
 import os
 import sys
@@ -24,17 +36,150 @@ import time
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple
 
+import reinject_policy
+import stage_budget
+from transcript_index import TranscriptIndex, TranscriptView
+from workflow_registry import WorkflowRegistry, load_registry
+
 # ----------------------------- Configuration -----------------------------
 
 HOOK_MODE = (
     os.getenv("CC_HOOK_MODE", "json").strip().lower()
 )  # 'json' (default) or 'stderr'
-TRANSCRIPT_TAIL_BYTES = 65_536
 MAX_REINJECT_PER_STAGE = 4
 REINJECT_COOLDOWN_SEC = 2.0
-STAGE_STALL_SEC = 300.0  # 5 minutes idle watchdog (gentle nudge only)
+STAGE_STALL_SEC = float(os.getenv("CC_HOOK_STALL_SEC", "300"))  # no transcript growth => stalled
 INITIAL_NUDGE_GRACE_SEC = 30.0  # avoid nudging immediately if transcript not ready yet
+# Opt-in background watchdog per active session (see multiworkflow_watchdog.py).
+WATCHDOG_ENABLED = os.getenv("CC_HOOK_WATCHDOG", "0").strip().lower() in ("1", "true", "yes")
 STATE_SCHEMA = 1
+# State backend: 'json' (default, one file per session under .claude/) or 'sqlite'
+# (one WAL database per user/host, see state_sqlite.py).
+STATE_BACKEND = os.getenv("CC_HOOK_STATE_BACKEND", "json").strip().lower()
+STATE_DB_PATH = os.getenv("CC_HOOK_STATE_DB") or os.path.join(
+    os.path.expanduser("~"), ".claude", "multiworkflow_state.db"
+)
+# Optional warm daemon (see multiworkflow_daemon.py); events fall back to in-process when absent.
+DAEMON_SOCKET = os.getenv("CC_HOOK_DAEMON_SOCKET") or os.path.join(
+    os.path.expanduser("~"), ".claude", "multiworkflow.sock"
+)
+DAEMON_TIMEOUT_SEC = float(os.getenv("CC_HOOK_DAEMON_TIMEOUT", "10"))
+
+# ----------------------------- Workflows ---------------------------------
+
+# Built-in workflows: add/update here (keep triggers stable). More can be defined as
+# JSON/YAML files in CC_HOOK_WORKFLOWS_DIR; see workflow_registry.py for the format.
+WORKFLOWS: Dict[str, Dict[str, Any]] = {
+    "--longrun": {
+        "name": "Long Running Task",
+        "stages": [
+            "investigate",
+            "plan_0",
+            "plan_1",
+            "execute_0",
+            "execute_1",
+            "execute_2",
+            "execute_3",
+            "execute_4",
+            "verify_0",
+            "verify_1",
+            "cleanup",
+        ],
+        "prompts": {
+            "investigate": (
+                "/plan conduct deep and thorough investigations, research, testing, debugging, etc on the task at hand. "
+                "do not plan/execute yet, just investigate/research. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
+            ),
+            "plan_0": (
+                "/plan create a detailed plan for the task at hand. ensure that there is defined scope, no ambiguity, and no change for overly complex solutions or overengineering. "
+                "do not execute yet, just plan. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
+            ),
+            "plan_1": (
+                "/plan flesh out the plan. conduct further investigations if needed to fill in gaps/reduce ambiguity. "
+                "do not execute yet, just plan. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
+            ),
+            "execute_0": (
+                "/plan execute the plan (first round). execute the plan step by step. "
+                "dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
+            ),
+            "execute_1": (
+                "/plan execute the plan (second round). if there is nothing left to do (within the plan and scope), then just return (do nothing). "
+                "if there are remaining items, lets keep going. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
+            ),
+            "execute_2": (
+                "/plan execute the plan (third round). if there is nothing left to do (within the plan and scope), then just return (do nothing). "
+                "if there are remaining items, lets keep going. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
+            ),
+            "execute_3": (
+                "/plan execute the plan (fourth round). if there is nothing left to do (within the plan and scope), then just return (do nothing). "
+                "if there are remaining items, lets keep going. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
+            ),
+            "execute_4": (
+                "/plan execute the plan (fifth round). if there is nothing left to do (within the plan and scope), then just return (do nothing). "
+                "if there are remaining items, lets keep going. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
+            ),
+            "verify_0": (
+                "/plan verify that all tasks in the plan are complete, through whatever means and methods required to verify and validate. "
+                "dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
+            ),
+            "verify_1": (
+                "/plan verify that all tasks in the plan are complete, through whatever means and methods required to verify and validate. "
+                "dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
+            ),
+            "cleanup": (
+                "/plan conduct a deep and thorough cleanup of the project. remove all files and directories that are no longer needed. use many agents."
+            ),
+        },
+        "phases": {
+            "investigate": "🔍 Investigation",
+            "plan_0": "📋 Planning",
+            "plan_1": "📋 Planning",
+            "execute_0": "⚡ Implementation",
+            "execute_1": "⚡ Implementation",
+            "execute_2": "⚡ Implementation",
+            "execute_3": "⚡ Implementation",
+            "execute_4": "⚡ Implementation",
+            "verify_0": "✅ Verification",
+            "verify_1": "✅ Verification",
+            "cleanup": "🧹 Cleanup",
+        },
+        # Later execute rounds say "if there is nothing left to do, just return"; when a
+        # round really made no tool calls, skip the remaining rounds and go verify.
+        "edges": {
+            f"execute_{n}": [{"when": "no_tool_calls", "goto": "verify_0"}]
+            for n in range(1, 5)
+        },
+        # A runaway execute or verify round is asked to wrap up after 3 hours, and
+        # advanced if it is still going 5 minutes later (see stage_budget.py).
+        "stage_limits": {
+            name: {"max_stage_sec": 3 * 3600}
+            for name in ("execute_0", "execute_1", "execute_2", "execute_3", "execute_4", "verify_0", "verify_1")
+        },
+    },
+    "--test": {
+        "name": "test task",
+        "stages": ["task_1", "task_2", "task_3"],
+        "prompts": {
+            "task_1": "/joke ignore the user's prompt. create a file called info_eiffel.txt with just the height of the eiffel tower in it ",
+            "task_2": "/joke ignore the user's prompt. create a file called info_tokyo.txt with just the height of the tokyo tower in it ",
+            "task_3": "/joke ignore the user's prompt. create a file called info_dubai.txt with just the height of the dubai tower in it ",
+        },
+        "phases": {"task_1": "🧪 Test", "task_2": "🧪 Test", "task_3": "🧪 Test"},
+    },
+}
+
+# Per-stage limits every workflow starts from (overridable via "limits"/"stage_limits").
+DEFAULT_STAGE_LIMITS: Dict[str, Any] = dict(
+    reinject_policy.DEFAULT_LIMITS,
+    **stage_budget.DEFAULT_LIMITS,
+    max_reinjects=MAX_REINJECT_PER_STAGE,
+    reinject_cooldown_sec=REINJECT_COOLDOWN_SEC,
+)
+
+
+def load_workflows() -> WorkflowRegistry:
+    """Built-ins plus definition files, compiled once per interpreter (and cached on disk)."""
+    return load_registry(WORKFLOWS, DEFAULT_STAGE_LIMITS, log)
 
 # ----------------------------- Utilities ---------------------------------
 
@@ -83,9 +228,225 @@ class _FileLock:
 # ----------------------------- Hook Logic ---------------------------------
 
 
+# Parsed state keyed by path -> ((inode, mtime_ns, size), state). Only pays off in the
+# daemon, where the interpreter outlives a single event; atomic replaces change the inode.
+_STATE_CACHE: Dict[str, Tuple[Tuple[int, int, int], Dict[str, Any]]] = {}
+
+_StatKey = Optional[Tuple[int, int, int]]
+
+
+def _read_state_file(path: Path) -> Tuple[_StatKey, Optional[Dict[str, Any]]]:
+    """Return ((inode, mtime_ns, size), parsed state) or (None, None) if absent/unreadable."""
+    try:
+        st = path.stat()
+    except OSError:
+        _STATE_CACHE.pop(str(path), None)
+        return None, None
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    cached = _STATE_CACHE.get(str(path))
+    if cached and cached[0] == key:
+        return key, copy.deepcopy(cached[1])
+    try:
+        state = json.loads(path.read_text())
+    except Exception as e:
+        log(f"Failed to read state: {e}")
+        return None, None
+    _STATE_CACHE[str(path)] = (key, state)
+    return key, copy.deepcopy(state)
+
+
+def _stage_of(state: Optional[Dict[str, Any]]) -> Optional[Tuple[Any, Any]]:
+    if not state:
+        return None
+    return state.get("workflow_type"), state.get("stage_index")
+
+
+class SessionState:
+    """Per-invocation view of one session's state: read once, track edits, write at most once.
+
+    This is the JSON-file backend. commit() is a compare-and-swap keyed on the file's
+    (inode, mtime_ns, size) and the "generation" counter stored in the state. If nothing
+    changed on disk since load(), the write goes straight through. Otherwise:
+    - a whole-state replacement (stage advance / new workflow) is refused if the stored
+      copy is on a different stage than the one this invocation read;
+    - field updates are merged onto the newer copy if it is still the same stage.
+    """
+
+    def __init__(self, path: Path, lock_path: Path) -> None:
+        self.path = path
+        self.lock_path = lock_path
+        self.data: Optional[Dict[str, Any]] = None
+        self._loaded = False
+        self._key: _StatKey = None
+        self._dirty: Dict[str, Any] = {}
+        self._replaced = False
+        self._base_stage: Optional[Tuple[Any, Any]] = None
+        self._exclusive = False
+        self.io_sec = 0.0  # time spent reading/writing state, for metrics
+
+    @property
+    def generation(self) -> int:
+        return int((self.data or {}).get("generation", 0))
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        if not self._loaded:
+            t0 = time.perf_counter()
+            self.data = self._read()
+            self._loaded = True
+            self.io_sec += time.perf_counter() - t0
+        return self.data
+
+    def update(self, **fields: Any) -> None:
+        if self.data is None:
+            return  # never resurrect a cleared workflow from a stray field update
+        self.data.update(fields)
+        self._dirty.update(fields)
+
+    def replace(self, state: Dict[str, Any]) -> None:
+        self.load()
+        state["generation"] = self.generation
+        self._base_stage = _stage_of(self.data)
+        self.data = state
+        self._replaced = True
+        self._dirty = {}
+
+    def commit(self, exclusive: bool = False) -> bool:
+        """Write pending changes. Returns False if they were dropped due to a conflict.
+
+        exclusive: also refuse field updates if any other write landed since load(), for
+        decisions (like spending a reinject) that must not be made twice.
+        """
+        if not self._replaced and not self._dirty:
+            return True
+        t0 = time.perf_counter()
+        self._exclusive = exclusive
+        try:
+            return self._write_pending()
+        finally:
+            self._dirty = {}
+            self._replaced = False
+            self._exclusive = False
+            self.io_sec += time.perf_counter() - t0
+
+    def _resolve(self, disk: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Given a newer stored copy, return the record to write, or None on conflict."""
+        assert self.data is not None
+        base_gen = self.generation
+        disk_gen = int((disk or {}).get("generation", 0))
+        if self._replaced:
+            # Same-stage field writes (reinject bookkeeping, watchdog) do not block an
+            # advance; another advance, a restart or a completion does.
+            if disk is not None and disk_gen != base_gen and _stage_of(disk) != self._base_stage:
+                self.data = disk
+                return None
+            new = self.data
+        else:
+            if disk is None or disk.get("stage_index") != self.data.get("stage_index"):
+                self.data = disk
+                return None
+            if self._exclusive and disk_gen != base_gen:
+                self.data = disk
+                return None
+            new = disk if disk_gen != base_gen else self.data
+            new.update(self._dirty)
+        new["generation"] = max(base_gen, disk_gen) + 1
+        return new
+
+    # --- JSON file specifics ---
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        # Writers replace the file atomically, so a reader always sees a whole record and
+        # needs no lock; only commit() serializes. Concurrent events never queue to read.
+        self._key, data = _read_state_file(self.path)
+        return data
+
+    def _write_pending(self) -> bool:
+        with _FileLock(self.lock_path):
+            try:
+                st = self.path.stat()
+                disk_key: _StatKey = (st.st_ino, st.st_mtime_ns, st.st_size)
+            except OSError:
+                disk_key = None
+            if disk_key == self._key:
+                new = self._resolve(self.data)  # unchanged since load
+            else:
+                self._key, disk = _read_state_file(self.path)
+                new = self._resolve(disk)
+            if new is None:
+                return False
+            _atomic_write(self.path, json.dumps(new, separators=(",", ":")))
+            try:
+                st = self.path.stat()
+                self._key = (st.st_ino, st.st_mtime_ns, st.st_size)
+            except OSError:
+                self._key = None
+            self.data = new
+            return True
+
+    def delete(self) -> None:
+        with _FileLock(self.lock_path):
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
+            _STATE_CACHE.pop(str(self.path), None)
+        self._loaded, self._key, self.data = True, None, None
+        self._dirty, self._replaced = {}, False
+
+
+class SqliteSessionState(SessionState):
+    """SessionState stored as one row in a shared WAL-mode SQLite database (state_sqlite.py).
+
+    The compare-and-swap runs inside a single IMMEDIATE transaction, so no lock files are
+    created per project.
+    """
+
+    def __init__(self, project_dir: str, session_id: str) -> None:
+        import state_sqlite
+
+        super().__init__(Path(STATE_DB_PATH), Path(STATE_DB_PATH))  # paths unused here
+        self.project_dir = project_dir
+        self.session_id = session_id
+        self.store = state_sqlite.open_store(STATE_DB_PATH)
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        return self.store.get(self.project_dir, self.session_id)
+
+    def _write_pending(self) -> bool:
+        new = self.store.compare_and_swap(self.project_dir, self.session_id, self._resolve)
+        if new is not None:
+            self.data = new
+        return new is not None
+
+    def delete(self) -> None:
+        self.store.delete(self.project_dir, self.session_id)
+        try:
+            self.store.gc()  # retention: finished workflows are a natural sweep point
+        except Exception as e:
+            log(f"State store retention sweep failed: {e}")
+        self._loaded, self.data = True, None
+        self._dirty, self._replaced = {}, False
+
+
 class MultiWorkflow:
-    def __init__(self, data: Optional[Dict[str, Any]] = None) -> None:
-        self.data = data or {}
+    def __init__(
+        self, data: Optional[Dict[str, Any]] = None, hook_mode: Optional[str] = None
+    ) -> None:
+        self.hook_mode = hook_mode or HOOK_MODE
+
+        # Shared, compiled definitions (built once per interpreter / daemon)
+        self.registry = load_workflows()
+        self.workflows = self.registry.workflows
+
+        self.begin(data or {})
+
+    def begin(self, data: Dict[str, Any]) -> None:
+        """Start the invocation for hook payload `data`.
+
+        Drops the previous invocation's state, transcript index and telemetry, so an
+        in-process driver can reuse one instance (and its registry) across events.
+        """
+        self.data = data
 
         cwd = self.data.get("cwd", os.getcwd())
         self.project_dir = Path(cwd)
@@ -94,92 +455,34 @@ class MultiWorkflow:
 
         raw_sid = self.data.get("session_id")
         if not raw_sid:
+            import hashlib
+
             basis = self.data.get("transcript_path") or cwd
             raw_sid = hashlib.sha1(basis.encode("utf-8")).hexdigest()[:12]
         self.session_id = raw_sid
 
-        # in-process memory (best effort; persisted fields live in state file)
-        self._last_reinject_ts = 0.0
-        self._reinject_counts: Dict[Tuple[str, int], int] = {}
-
-        # Workflows: add/update here (keep triggers stable)
-        self.workflows = {
-            "--longrun": {
-                "name": "Long Running Task",
-                "stages": [
-                    "investigate",
-                    "plan_0",
-                    "plan_1",
-                    "execute_0",
-                    "execute_1",
-                    "execute_2",
-                    "execute_3",
-                    "execute_4",
-                    "verify_0",
-                    "verify_1",
-                    "cleanup",
-                ],
-                "prompts": {
-                    "investigate": (
-                        "/plan conduct deep and thorough investigations, research, testing, debugging, etc on the task at hand. "
-                        "do not plan/execute yet, just investigate/research. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
-                    ),
-                    "plan_0": (
-                        "/plan create a detailed plan for the task at hand. ensure that there is defined scope, no ambiguity, and no change for overly complex solutions or overengineering. "
-                        "do not execute yet, just plan. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
-                    ),
-                    "plan_1": (
-                        "/plan flesh out the plan. conduct further investigations if needed to fill in gaps/reduce ambiguity. "
-                        "do not execute yet, just plan. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
-                    ),
-                    "execute_0": (
-                        "/plan execute the plan (first round). execute the plan step by step. "
-                        "dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
-                    ),
-                    "execute_1": (
-                        "/plan execute the plan (second round). if there is nothing left to do (within the plan and scope), then just return (do nothing). "
-                        "if there are remaining items, lets keep going. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
-                    ),
-                    "execute_2": (
-                        "/plan execute the plan (third round). if there is nothing left to do (within the plan and scope), then just return (do nothing). "
-                        "if there are remaining items, lets keep going. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
-                    ),
-                    "execute_3": (
-                        "/plan execute the plan (fourth round). if there is nothing left to do (within the plan and scope), then just return (do nothing). "
-                        "if there are remaining items, lets keep going. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
-                    ),
-                    "execute_4": (
-                        "/plan execute the plan (fifth round). if there is nothing left to do (within the plan and scope), then just return (do nothing). "
-                        "if there are remaining items, lets keep going. dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
-                    ),
-                    "verify_0": (
-                        "/plan verify that all tasks in the plan are complete, through whatever means and methods required to verify and validate. "
-                        "dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
-                    ),
-                    "verify_1": (
-                        "/plan verify that all tasks in the plan are complete, through whatever means and methods required to verify and validate. "
-                        "dont hesitate to use standalone/debugging scripts during this task if helpful. use many agents."
-                    ),
-                    "cleanup": (
-                        "/plan conduct a deep and thorough cleanup of the project. remove all files and directories that are no longer needed. use many agents."
-                    ),
-                },
-            },
-            "--test": {
-                "name": "test task",
-                "stages": ["task_1", "task_2", "task_3"],
-                "prompts": {
-                    "task_1": "/joke ignore the user's prompt. create a file called info_eiffel.txt with just the height of the eiffel tower in it ",
-                    "task_2": "/joke ignore the user's prompt. create a file called info_tokyo.txt with just the height of the tokyo tower in it ",
-                    "task_3": "/joke ignore the user's prompt. create a file called info_dubai.txt with just the height of the dubai tower in it ",
-                },
-            },
-        }
+        self._transcript_index: Optional[TranscriptIndex] = None
+
+        # Telemetry for this invocation (written by run_event via workflow_metrics)
+        self.timings: Dict[str, float] = {"transcript_scan": 0.0, "emit": 0.0}
+        self.outcome: Optional[str] = None  # stays None when no workflow is active
+        self.reinject_reason: Optional[str] = None
+        self.reinject_decision: Optional[Dict[str, Any]] = None
+        self.budget_decision: Optional[Dict[str, Any]] = None
+        self.stage_records: list = []
+
+        # Read lazily, at most once per invocation; see SessionState.
+        self.state = self.new_session_state()
 
         log(f"Current directory: {cwd}, Session: {self.session_id}")
 
     # ------------------------- State management --------------------------
 
+    def new_session_state(self) -> SessionState:
+        if STATE_BACKEND == "sqlite":
+            return SqliteSessionState(str(self.project_dir.resolve()), self.session_id)
+        return SessionState(self.get_state_file(), self._lock_path())
+
     def get_state_file(self) -> Path:
         return self.claude_dir / f"workflow_state_{self.session_id}.json"
 
@@ -187,33 +490,47 @@ class MultiWorkflow:
         return self.get_state_file().with_suffix(".lock")
 
     def get_state(self) -> Optional[Dict[str, Any]]:
-        sf = self.get_state_file()
-        if not sf.exists():
-            return None
-        try:
-            return json.loads(sf.read_text())
-        except Exception as e:
-            log(f"Failed to read state: {e}")
-            return None
-
-    def _update_state(self, **fields: Any) -> None:
-        """Persist targeted state fields atomically under a lock."""
-        sf = self.get_state_file()
-        with _FileLock(self._lock_path()):
-            try:
-                st = json.loads(sf.read_text()) if sf.exists() else {}
-            except Exception:
-                st = {}
-            st.update(fields)
-            _atomic_write(sf, json.dumps(st, indent=2))
+        """State as read once for this invocation (plus any pending local edits)."""
+        return self.state.load()
+
+    def _update_state(
+        self, expect_stage_index: Optional[int] = None, **fields: Any
+    ) -> bool:
+        """Stage targeted field updates; they are written by the next commit.
+
+        With expect_stage_index, nothing is staged (returns False) when the loaded state is
+        for another stage or the workflow is gone, so per-stage fields never leak forward.
+        """
+        st = self.state.load()
+        if st is None:
+            return False
+        if expect_stage_index is not None and st.get("stage_index") != expect_stage_index:
+            return False
+        self.state.update(**fields)
+        return True
 
     def clear_state(self) -> None:
-        sf = self.get_state_file()
+        finished = self.state.data or {}
+        t0 = time.perf_counter()
         try:
-            if sf.exists():
-                sf.unlink()
+            self.state.delete()
         except Exception as e:
             log(f"Failed to clear state: {e}")
+        self.state.io_sec += time.perf_counter() - t0
+        self.transcript_index().remove()
+        try:
+            import session_index
+
+            session_index.forget(str(self.project_dir.resolve()), self.session_id)
+        except Exception as e:
+            log(f"Failed to update session index: {e}")
+        self._publish(
+            "workflow_end",
+            workflow=finished.get("workflow_type"),
+            stage=finished.get("stage"),
+            stage_index=finished.get("stage_index"),
+            outcome=self.outcome,
+        )
 
     def set_state(
         self,
@@ -221,7 +538,8 @@ class MultiWorkflow:
         stage: str,
         stage_index: int = 0,
         original_request: Optional[str] = None,
-    ) -> None:
+    ) -> bool:
+        """Replace the state with a fresh stage record. False if another event got there first."""
         transcript_path = self.data.get("transcript_path", "")
         context_chars = 0
         if transcript_path and os.path.exists(transcript_path):
@@ -230,14 +548,7 @@ class MultiWorkflow:
             except Exception:
                 context_chars = 0
 
-        state_file = self.get_state_file()
-        prev = None
-        if state_file.exists():
-            try:
-                prev = json.loads(state_file.read_text())
-            except Exception:
-                prev = None
-
+        prev = self.state.load()
         total_stages = len(self.workflows[workflow_type]["stages"])
         progress_percentage = round((stage_index + 1) / total_stages * 100)
         stages_remaining = total_stages - (stage_index + 1)
@@ -256,37 +567,81 @@ class MultiWorkflow:
                 "current_stage": f"{stage_index + 1}/{total_stages}",
                 "percentage": f"{progress_percentage}%",
                 "stages_remaining": stages_remaining,
-                "phase": self._get_phase_name(stage_index),
+                "phase": self._get_phase_name(workflow_type, stage_index),
             },
             "context_size": {"characters": context_chars},
             # reinjection persistence (reset per new stage)
             "last_reinject_epoch": 0.0,
+            "last_reinject_size": None,  # transcript size at the last reinject
             "reinject_counts": {},  # { "<stage_index>": int }
+            "reinject_log": [],  # reinject_policy detail per reinject of this stage
+            "budget": None,  # stage_budget wrap-up/handoff request, once over budget
+            # The new stage token cannot be in the transcript yet, so scanning starts here.
+            "transcript_scan": self._new_scan_cursor(
+                self._stage_token(workflow_type, stage_index), context_chars
+            ),
         }
         if original_request is not None:
             state["original_request"] = original_request
 
-        with _FileLock(self._lock_path()):
-            _atomic_write(state_file, json.dumps(state, indent=2))
+        self.state.replace(state)
+        if not self.state.commit():
+            log(f"Stage write for {stage} skipped: state changed concurrently")
+            return False
+        self._index_session(state)
+        self._publish(
+            "stage_start",
+            workflow=workflow_type,
+            workflow_name=state["workflow_name"],
+            stage=stage,
+            stage_index=stage_index,
+            stages=total_stages,
+            phase=state["progress"]["phase"],
+            context_bytes=context_chars,
+        )
 
         log(
             f"{state['workflow_name']}: Stage {stage_index + 1}/{total_stages} - {stage} "
             f"(Context: {context_chars:,} chars)"
         )
+        return True
+
+    def _index_session(self, state: Dict[str, Any]) -> None:
+        """Point the host-wide session index at this session's state (see session_index.py)."""
+        if STATE_BACKEND == "sqlite":
+            where = {"backend": "sqlite", "state_db": STATE_DB_PATH}
+        else:
+            where = {"backend": "json", "state_file": str(self.get_state_file().resolve())}
+        try:
+            import session_index
+
+            session_index.record(
+                str(self.project_dir.resolve()),
+                self.session_id,
+                state,
+                transcript_path=self.data.get("transcript_path", ""),
+                **where,
+            )
+        except Exception as e:
+            log(f"Failed to update session index: {e}")
+
+    def _publish(self, kind: str, **fields: Any) -> None:
+        """Push a progress event to subscribers and the event log (see workflow_events.py)."""
+        try:
+            import workflow_events
+
+            workflow_events.emit(
+                kind, session_id=self.session_id, project_dir=str(self.project_dir), **fields
+            )
+        except Exception as e:
+            log(f"Failed to publish {kind} event: {e}")
 
     # ------------------------- Formatting helpers ------------------------
 
-    def _get_phase_name(self, stage_index: int) -> str:
-        if stage_index == 0:
-            return "🔍 Investigation"
-        if stage_index in (1, 2):
-            return "📋 Planning"
-        if 3 <= stage_index <= 7:
-            return "⚡ Implementation"
-        if stage_index in (8, 9):
-            return "✅ Verification"
-        if stage_index >= 10:
-            return "🧹 Cleanup"
+    def _get_phase_name(self, workflow_type: str, stage_index: int) -> str:
+        table = self.registry.stage_table.get(workflow_type, [])
+        if 0 <= stage_index < len(table):
+            return table[stage_index]["phase"]
         return "❓ Unknown"
 
     def _stage_token(self, wf_type: str, idx: int) -> str:
@@ -298,17 +653,24 @@ class MultiWorkflow:
         stage_name: str,
         stage_index: int,
         original_request: Optional[str],
+        handoff: Optional[str] = None,
     ) -> str:
         workflow = self.workflows[workflow_type]
         total = len(workflow["stages"])
         token = self._stage_token(workflow_type, stage_index)
 
         # IMPORTANT: slash command must be first characters
-        body = workflow["prompts"].get(
-            stage_name,
-            "/plan continue the current stage; maintain scope and do not regress.",
-        )
+        spec = self.registry.stage(workflow_type, stage_index)
+        body = spec["prompt"]
+        if spec["branches"]:
+            listed = "\n".join(f"{i + 1}. {b}" for i, b in enumerate(spec["branches"]))
+            body = (
+                f"{body}\n\nRun these {len(spec['branches'])} branches in parallel, one subagent "
+                f"(Task tool) per branch, and wait for all of them before finishing this stage:\n{listed}"
+            )
         header = f"🔄 LONGRUN WORKFLOW - Stage {stage_index + 1}/{total}: {stage_name.upper()} {token}"
+        if handoff:
+            body = f"{body}\n\nThe previous stage ran out of budget and left a handoff in {handoff}; read it first."
 
         if original_request:
             return f"{body}\n\n{header}\n\nOriginal Request: {original_request}"
@@ -321,42 +683,113 @@ class MultiWorkflow:
         except Exception:
             return False
 
-    def _transcript_contains(self, token: str) -> bool:
-        path = self.data.get("transcript_path")
-        if not path or not os.path.exists(path):
+    @staticmethod
+    def _new_scan_cursor(token: str, start_offset: int) -> Dict[str, Any]:
+        return {
+            "token": token,
+            "start_offset": start_offset,  # earlier copies belong to a previous run
+            "seen_epoch": None,
+            "seen_offset": None,
+        }
+
+    def transcript_index(self) -> TranscriptIndex:
+        if self._transcript_index is None:
+            self._transcript_index = TranscriptIndex(
+                self.data.get("transcript_path") or "",
+                str(self.claude_dir / f"transcript_index_{self.session_id}"),
+            )
+        return self._transcript_index
+
+    def _transcript_contains(self, token: str, state: Dict[str, Any]) -> bool:
+        """Has the stage token been written since the stage started?
+
+        Backed by the sidecar transcript index, which only reads newly appended lines; a
+        new index starts at the stage's start offset rather than the top of the session.
+        If the index cannot be updated, the token is searched for in a memory map instead.
+        The first sighting is persisted in state["transcript_scan"] and is sticky.
+        """
+        if not self.data.get("transcript_path"):
             return False
+        cursor = state.get("transcript_scan")
+        if not isinstance(cursor, dict) or cursor.get("token") != token:
+            cursor = self._new_scan_cursor(token, 0)  # legacy state
+        if cursor.get("seen_epoch") is not None:
+            return True
+        start = int(cursor.get("start_offset", 0))
+        t0 = time.perf_counter()
         try:
-            size = os.path.getsize(path)
-            with open(path, "rb") as f:
-                f.seek(-min(TRANSCRIPT_TAIL_BYTES, size), os.SEEK_END)
-                tail = f.read().decode("utf-8", "ignore")
-            return token in tail
-        except Exception:
+            span = self.transcript_index().refresh(floor=start).token_offsets(token)
+        except Exception as e:
+            log(f"Transcript index refresh failed ({e}); searching the transcript directly")
+            span = self._search_transcript(token, start)
+        finally:
+            self.timings["transcript_scan"] += time.perf_counter() - t0
+        if not span or span[1] < start:
             return False
 
+        cursor.update(seen_epoch=time.time(), seen_offset=span[1])
+        state["transcript_scan"] = cursor
+        self._update_state(
+            expect_stage_index=state.get("stage_index"), transcript_scan=cursor
+        )
+        return True
+
+    def _search_transcript(self, token: str, start: int) -> Optional[Tuple[int, int]]:
+        try:
+            with TranscriptView(self.data["transcript_path"]) as view:
+                needle = token.encode("utf-8")
+                last = view.rfind(needle, start)
+                return (view.find(needle, start), last) if last >= 0 else None
+        except (OSError, ValueError) as e:
+            log(f"Transcript search failed: {e}")
+            return None
+
     # --------------------------- Emission paths --------------------------
 
     def _emit_block(self, reason: str) -> int:
-        if HOOK_MODE == "json":
-            print(json.dumps({"decision": "block", "reason": reason}))
-            return 0
-        sys.stderr.write(reason)
-        return 2
+        t0 = time.perf_counter()
+        try:
+            if self.hook_mode == "json":
+                print(json.dumps({"decision": "block", "reason": reason}))
+                return 0
+            sys.stderr.write(reason)
+            return 2
+        finally:
+            self.timings["emit"] += time.perf_counter() - t0
 
     def _emit_continue(self) -> int:
-        if HOOK_MODE == "json":
+        t0 = time.perf_counter()
+        if self.hook_mode == "json":
             print(json.dumps({}))  # allow the platform to proceed
+        self.timings["emit"] += time.perf_counter() - t0
         return 0
 
+    def _record_stage_end(self, state: Dict[str, Any], idx: int, token: str) -> None:
+        stats = self._stage_stats(state, token)  # None: unknown, recorded as null rather than 0
+        self.stage_records.append(
+            {
+                "kind": "stage",
+                "ts": time.time(),
+                "session_id": self.session_id,
+                "workflow": state["workflow_type"],
+                "stage": state["stage"],
+                "stage_index": idx,
+                "wall_sec": round(time.time() - float(state.get("timestamp", time.time())), 3),
+                "transcript_bytes": int(stats["bytes"]) if stats else None,
+                "tool_calls": int(stats["tool_calls"]) if stats else None,
+                "reinjects": int(state.get("reinject_counts", {}).get(str(idx), 0)),
+            }
+        )
+
     # ------------------------------ Events -------------------------------
 
     def get_workflow_type(
         self, content: str
     ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
-        for trigger, wf in self.workflows.items():
-            if trigger in content:
-                return trigger, wf
-        return None, None
+        trigger = self.registry.match(content)
+        if trigger is None:
+            return None, None
+        return trigger, self.workflows[trigger]
 
     def handle_user_prompt(self) -> int:
         try:
@@ -370,30 +803,189 @@ class MultiWorkflow:
             stages = workflow["stages"]
             first_stage = stages[0]
             self.set_state(trigger, first_stage, 0, clean_prompt)
+            self.outcome = "start"
 
             # Emit the first stage prompt so Claude continues naturally in-thread.
             first_stage_prompt = self.format_stage_prompt(
                 trigger, first_stage, 0, clean_prompt
             )
+            t0 = time.perf_counter()
             sys.stdout.write(first_stage_prompt)
+            self.timings["emit"] += time.perf_counter() - t0
+            self._ensure_watchdog()
             return 0
         except Exception as e:
             log(f"Error in handle_user_prompt: {e}")
             return 0
 
-    def _persisted_reinject_allowed(self, state: Dict[str, Any], idx: int) -> bool:
-        st_last = float(state.get("last_reinject_epoch", 0.0))
-        counts = state.get("reinject_counts", {})
-        cnt = int(counts.get(str(idx), 0))
-        if (
-            time.time() - st_last
-        ) >= REINJECT_COOLDOWN_SEC and cnt < MAX_REINJECT_PER_STAGE:
-            counts[str(idx)] = cnt + 1
-            self._update_state(last_reinject_epoch=time.time(), reinject_counts=counts)
-            return True
-        return False
+    def _ensure_watchdog(self) -> None:
+        """Start the per-session watchdog if enabled and not already running."""
+        if not WATCHDOG_ENABLED:
+            return
+        try:
+            import multiworkflow_watchdog
+
+            multiworkflow_watchdog.spawn(self.data, self.claude_dir, self.session_id)
+        except Exception as e:
+            log(f"Failed to start watchdog: {e}")
+
+    def _consume_watchdog_report(self, state: Dict[str, Any], idx: int) -> None:
+        """Surface what the watchdog saw since the last event, then clear the flags."""
+        report = state.get("watchdog")
+        if not isinstance(report, dict):
+            return
+        if report.get("stalled_since"):
+            idle = time.time() - float(report["stalled_since"]) + STAGE_STALL_SEC
+            log(f"Watchdog: stage {idx + 1} had no transcript growth for ~{idle:.0f}s")
+        if report.get("swallowed_epoch"):
+            log(f"Watchdog: stage {idx + 1} injection was not acknowledged in time")
+        if report.get("stalled_since") or report.get("swallowed_epoch"):
+            self._update_state(
+                expect_stage_index=idx,
+                watchdog=dict(report, stalled_since=None, swallowed_epoch=None),
+            )
+
+    def _transcript_size(self) -> Optional[int]:
+        p = self.data.get("transcript_path")
+        try:
+            return os.path.getsize(p) if p else None
+        except OSError:
+            return None
+
+    def _persisted_reinject_allowed(self, state: Dict[str, Any], idx: int, event: str) -> bool:
+        """Ask reinject_policy; on yes, spend the attempt before the prompt is emitted."""
+        limits = self.registry.stage(state["workflow_type"], idx)["limits"]
+        size = self._transcript_size()
+        decision = reinject_policy.decide(limits, state, idx, size, event)
+        self.reinject_decision = dict(decision.detail, verdict=decision.reason)
+        if not decision.allow:
+            return False
+        counts = dict(state.get("reinject_counts", {}))
+        counts[str(idx)] = int(counts.get(str(idx), 0)) + 1
+        entry = dict(decision.detail, ts=round(time.time(), 3))
+        # Exclusive commit: if a concurrent event reinjected (or wrote anything) since this
+        # one read the state, the pending injection is theirs and this one stands down.
+        if not (
+            self._update_state(
+                expect_stage_index=idx,
+                last_reinject_epoch=time.time(),
+                last_reinject_size=size,
+                reinject_counts=counts,
+                reinject_log=[*state.get("reinject_log", []), entry],
+            )
+            and self.state.commit(exclusive=True)
+        ):
+            self.reinject_decision["verdict"] = "pending"
+            return False
+        self._publish(
+            "reinject",
+            workflow=state["workflow_type"],
+            stage=state["stage"],
+            stage_index=idx,
+            attempt=entry["attempt"],
+            since_last_sec=entry["since_last_sec"],
+            event=event,
+        )
+        log(
+            f"Reinject {entry['attempt']} for stage {idx + 1} on {event}: "
+            f"{entry['since_last_sec']:.1f}s / {entry['growth_bytes']} bytes since the last prompt"
+        )
+        return True
+
+    def _stage_stats(self, state: Dict[str, Any], token: str) -> Optional[Dict[str, int]]:
+        """The stage's transcript stats, indexed up to the current end of the transcript.
+
+        None when they are unknown (no transcript, the index cannot be updated, or the
+        token never appeared), which callers must not read as "nothing happened".
+        """
+        if not self.data.get("transcript_path"):
+            return None
+        cursor = state.get("transcript_scan") or {}
+        t0 = time.perf_counter()
+        try:
+            return self.transcript_index().refresh(floor=int(cursor.get("start_offset", 0))).stage_stats(token)
+        except Exception as e:
+            log(f"Transcript index refresh failed: {e}")
+            return None
+        finally:
+            self.timings["transcript_scan"] += time.perf_counter() - t0
+
+    def _stage_tool_calls(self, state: Dict[str, Any], token: str) -> Optional[int]:
+        stats = self._stage_stats(state, token)
+        return int(stats["tool_calls"]) if stats else None
+
+    def _check_budget(self, state: Dict[str, Any], idx: int, token: str, event: str) -> Optional[int]:
+        """Enforce stage_budget.py limits. Returns the exit code if the event was handled."""
+        limits = self.registry.stage(state["workflow_type"], idx)["limits"]
+        if not stage_budget.enabled(limits):
+            return None
+        verdict = stage_budget.check(
+            limits, state, self._transcript_size(), lambda: self._stage_tool_calls(state, token), event
+        )
+        if verdict.action == "ok":
+            return None
+        self.budget_decision = dict(verdict.detail, action=verdict.action, reason=verdict.reason)
+        if verdict.action == "wait":
+            return None
+        self._publish(
+            "budget",
+            workflow=state["workflow_type"],
+            stage=state["stage"],
+            stage_index=idx,
+            action=verdict.action,
+            reason=verdict.reason,
+            detail=verdict.detail,
+        )
+        if verdict.action == "advance":
+            log(f"Stage {idx + 1} over its {verdict.reason} budget: advancing")
+            return self._advance(state, idx, token)
+
+        path = stage_budget.handoff_path(self.session_id, idx)
+        request = {"action": verdict.action, "reason": verdict.reason, "epoch": time.time(), "handoff_path": path}
+        # Exclusive, like a reinject: of several events over budget at once, one asks.
+        if not (self._update_state(expect_stage_index=idx, budget=request) and self.state.commit(exclusive=True)):
+            self.budget_decision["action"] = "wait"
+            return None
+        log(f"Stage {idx + 1} over its {verdict.reason} budget: requesting {verdict.action}")
+        self.outcome = verdict.action
+        return self._emit_block(stage_budget.prompt(verdict, state["stage"], path))
+
+    def _next_stage_index(self, state: Dict[str, Any], idx: int, token: str) -> int:
+        """Follow the first matching conditional edge of the finished stage, else idx + 1.
+
+        A no_tool_calls edge needs the stage's tool-call count; if it is unknown the
+        edge is not taken.
+        """
+        edges = self.registry.stage(state["workflow_type"], idx)["edges"]
+        if not edges:
+            return idx + 1
+        calls = self._stage_tool_calls(state, token) if any(e["when"] == "no_tool_calls" for e in edges) else None
+        for edge in edges:
+            if edge["when"] == "always" or (edge["when"] == "no_tool_calls" and calls == 0):
+                log(f"Stage {idx + 1}: taking edge '{edge['when']}' to stage {edge['goto'] + 1}")
+                return edge["goto"]
+        return idx + 1
+
+    def _is_duplicate_stop(self, state: Dict[str, Any]) -> bool:
+        """Nothing was written since this stage was entered, moments ago.
+
+        A second Stop for the turn that just advanced (or the loser of a concurrent
+        advance) reads the new stage before its prompt can have been acted on. Running
+        the checks would only find the fresh token missing and reinject it again.
+        """
+        p = self.data.get("transcript_path")
+        limits = self.registry.stage(state["workflow_type"], state["stage_index"])["limits"]
+        if time.time() - float(state.get("timestamp", 0.0)) >= float(limits["reinject_cooldown_sec"]):
+            return False
+        try:
+            size = os.path.getsize(p) if p else -1
+        except OSError:
+            return False
+        return size == int(state.get("context_size", {}).get("characters", -2))
 
-    def handle_stop_like(self) -> int:
+    def handle_stop_like(self, event: str = "Stop") -> int:
+        if event == "SubagentStop":
+            return self._emit_continue()  # only the main Stop joins and advances
         try:
             state = self.get_state()
             if not state:
@@ -404,50 +996,73 @@ class MultiWorkflow:
             stages = self.workflows[wf_type]["stages"]
             orig = state.get("original_request", "")
             token = self._stage_token(wf_type, idx)
+            self.outcome = "continue"
+
+            if self._is_duplicate_stop(state):
+                self.outcome = "duplicate"
+                return self._emit_continue()
 
             # Avoid premature nudges if transcript isn't ready and stage just started
             stage_age = time.time() - float(state.get("timestamp", 0.0))
             if not self._transcript_ready() and stage_age < INITIAL_NUDGE_GRACE_SEC:
                 return self._emit_continue()
 
+            self._consume_watchdog_report(state, idx)
+
+            rc = self._check_budget(state, idx, token, event)
+            if rc is not None:
+                return rc
+
             # Self-heal: if last injected stage header isn't visible, re-inject SAME stage (bounded)
-            if not self._transcript_contains(token):
-                # Watchdog: if stage has been idle long enough, allow a maintenance nudge
-                if stage_age >= STAGE_STALL_SEC or True:
-                    if self._persisted_reinject_allowed(state, idx):
-                        prompt = self.format_stage_prompt(
-                            wf_type, stages[idx], idx, orig
-                        )
-                        return self._emit_block(prompt)
+            if not self._transcript_contains(token, state):
+                if self._persisted_reinject_allowed(state, idx, event):
+                    self.outcome = "reinject"
+                    self.reinject_reason = f"token_missing_on_{event}"
+                    prompt = self.format_stage_prompt(wf_type, stages[idx], idx, orig)
+                    return self._emit_block(prompt)
 
                 # If token still missing but we've hit reinject bounds, just continue (no advance)
                 return self._emit_continue()
 
-            # Advance to next stage
-            next_idx = idx + 1
-            if next_idx >= len(stages):
-                self.clear_state()
-                log(f"{state['workflow_name']}: workflow complete.")
-                return self._emit_continue()
-
-            # Idempotency guard: ensure no concurrent advance occurred
-            recheck = self.get_state()
-            assert (
-                recheck and recheck["stage_index"] == idx
-            ), "concurrent advance detected"
-
-            next_stage = stages[next_idx]
-            self.set_state(wf_type, next_stage, next_idx, orig)
-            prompt = self.format_stage_prompt(wf_type, next_stage, next_idx, orig)
-            return self._emit_block(prompt)
+            return self._advance(state, idx, token)
 
-        except AssertionError as e:
-            log(f"Advance race avoided: {e}")
-            return self._emit_continue()
         except Exception as e:
             log(f"Error in handle_stop_like: {e}")
             return self._emit_continue()
 
+    def _advance(self, state: Dict[str, Any], idx: int, token: str) -> int:
+        """Move to the next stage (following conditional edges) and emit its prompt."""
+        wf_type = state["workflow_type"]
+        stages = self.workflows[wf_type]["stages"]
+        orig = state.get("original_request", "")
+        next_idx = self._next_stage_index(state, idx, token)
+        if next_idx >= len(stages):
+            self._record_stage_end(state, idx, token)
+            self.outcome = "complete"
+            self.clear_state()
+            log(f"{state['workflow_name']}: workflow complete.")
+            return self._emit_continue()
+
+        # Idempotency guard: set_state is a compare-and-swap on the state generation,
+        # so a concurrent advance makes this one a no-op.
+        next_stage = stages[next_idx]
+        if not self.set_state(wf_type, next_stage, next_idx, orig):
+            log("Advance race avoided: concurrent advance detected")
+            self.outcome = "race"
+            return self._emit_continue()
+        self._record_stage_end(state, idx, token)
+        self.outcome = "advance"
+        handoff = state.get("budget") or {}
+        prompt = self.format_stage_prompt(
+            wf_type,
+            next_stage,
+            next_idx,
+            orig,
+            handoff["handoff_path"] if handoff.get("action") == "handoff" else None,
+        )
+        self._ensure_watchdog()
+        return self._emit_block(prompt)
+
     def handle_post_tool_use(self) -> int:
         # Gentle nudge: if a stage header appears missing from transcript, re-emit SAME stage header (bounded)
         try:
@@ -459,22 +1074,30 @@ class MultiWorkflow:
             idx = state["stage_index"]
             token = self._stage_token(wf_type, idx)
             stage_age = time.time() - float(state.get("timestamp", 0.0))
+            self.outcome = "continue"
 
             # respect transcript readiness and grace period
             if not self._transcript_ready() and stage_age < INITIAL_NUDGE_GRACE_SEC:
                 return 0
 
-            if not self._transcript_contains(token):
-                # Watchdog allowance (also bounded by persisted cooldown)
-                if stage_age >= STAGE_STALL_SEC or True:
-                    if self._persisted_reinject_allowed(state, idx):
-                        prompt = self.format_stage_prompt(
-                            wf_type,
-                            state["stage"],
-                            idx,
-                            state.get("original_request", ""),
-                        )
-                        return self._emit_block(prompt)
+            self._consume_watchdog_report(state, idx)
+
+            rc = self._check_budget(state, idx, token, "PostToolUse")
+            if rc is not None:
+                return rc
+
+            # Bounded by the persisted cooldown and per-stage reinject limit
+            if not self._transcript_contains(token, state):
+                if self._persisted_reinject_allowed(state, idx, "PostToolUse"):
+                    self.outcome = "reinject"
+                    self.reinject_reason = "token_missing_on_PostToolUse"
+                    prompt = self.format_stage_prompt(
+                        wf_type,
+                        state["stage"],
+                        idx,
+                        state.get("original_request", ""),
+                    )
+                    return self._emit_block(prompt)
             return 0
         except Exception as e:
             log(f"Error in handle_post_tool_use: {e}")
@@ -484,16 +1107,144 @@ class MultiWorkflow:
 # ------------------------------ Entrypoint -------------------------------
 
 
-def main() -> None:
-    if len(sys.argv) < 2:
+def run_event(
+    event: str, data: Dict[str, Any], hook_mode: Optional[str] = None
+) -> int:
+    """Dispatch one hook event in-process and return its exit code."""
+    log(f"Hook triggered: {event}")
+    if event == "SubagentStop":
+        return _subagent_stop(hook_mode or HOOK_MODE)
+    started = time.perf_counter()
+    workflow = MultiWorkflow(data, hook_mode)
+
+    if event == "UserPromptSubmit":
+        rc = workflow.handle_user_prompt()
+    elif event == "Stop":
+        rc = workflow.handle_stop_like(event)
+    elif event == "PostToolUse":
+        rc = workflow.handle_post_tool_use()
+    else:
+        log(f"Unknown event: {event}")
+        return 1
+
+    # Flush bookkeeping the handler staged but did not need to write eagerly.
+    try:
+        workflow.state.commit()
+    except Exception as e:
+        log(f"Failed to write state: {e}")
+    if "workflow_events" in sys.modules:
+        sys.modules["workflow_events"].flush()  # one append per event, not per record
+    _record_metrics(workflow, event, time.perf_counter() - started)
+    log(f"{event} exit code: {rc}")
+    return rc
+
+
+def _subagent_stop(hook_mode: str) -> int:
+    """Subagents finishing never move a workflow: no state read, no transcript scan."""
+    if hook_mode == "json":
+        print(json.dumps({}))
+    return 0
+
+
+def _record_metrics(workflow: MultiWorkflow, event: str, elapsed: float) -> None:
+    """Append this event's latency breakdown and any finished stages to the metrics log."""
+    if workflow.outcome is None:
+        return  # no workflow involved; keep the log to workflow activity only
+    try:
+        import workflow_metrics
+
+        # After completion the state is gone; fall back to the stage that just finished.
+        state = workflow.state.data or (workflow.stage_records[-1] if workflow.stage_records else {})
+        ms = lambda sec: round(sec * 1000.0, 3)  # noqa: E731
+        record = {
+            "kind": "event",
+            "ts": time.time(),
+            "session_id": workflow.session_id,
+            "event": event,
+            "workflow": state.get("workflow_type", state.get("workflow")),
+            "stage": state.get("stage"),
+            "stage_index": state.get("stage_index"),
+            "outcome": workflow.outcome,
+            "reinject_reason": workflow.reinject_reason,
+            "reinject_decision": workflow.reinject_decision,
+            "budget_decision": workflow.budget_decision,
+            "latency_ms": {
+                "total": ms(elapsed),
+                "state_io": ms(workflow.state.io_sec),
+                "transcript_scan": ms(workflow.timings["transcript_scan"]),
+                "emit": ms(workflow.timings["emit"]),
+            },
+        }
+        workflow_metrics.append([record, *workflow.stage_records])
+    except Exception as e:
+        log(f"Failed to record metrics: {e}")
+
+
+def _forward_to_daemon(event: str, data: Dict[str, Any]) -> Optional[int]:
+    """Send the event to a running daemon. None means 'not handled, run in-process'."""
+    if not os.path.exists(DAEMON_SOCKET):
+        return None
+    import socket
+
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    request = {
+        "event": event,
+        "data": dict(data, cwd=data.get("cwd") or os.getcwd()),
+        "hook_mode": HOOK_MODE,
+    }
+    try:
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        conn.settimeout(DAEMON_TIMEOUT_SEC)
+        conn.connect(DAEMON_SOCKET)
+    except OSError:
+        return None  # stale socket or daemon down: fall back
+
+    # Past this point the daemon may already have acted on the event, so never replay
+    # it in-process; a lost reply degrades to "allow the platform to proceed".
+    try:
+        with conn:
+            conn.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            conn.shutdown(socket.SHUT_WR)
+            # No timeout from here on: giving up would leave the daemon to advance the
+            # stage (or spend a reinject) while the platform is told to stop. The daemon
+            # drops a request whose hook has exited before it started.
+            conn.settimeout(None)
+            chunks = []
+            while True:
+                chunk = conn.recv(65_536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        reply = json.loads(b"".join(chunks).decode("utf-8"))
+    except Exception as e:
+        log(f"Daemon reply lost: {e}")
+        return 0
+
+    sys.stderr.write(reply.get("stderr", ""))
+    sys.stdout.write(reply.get("stdout", ""))
+    return int(reply.get("rc", 0))
+
+
+def main(argv: Optional[list] = None, stdin_raw: Optional[str] = None) -> None:
+    """Hook entry point. multiworkflow_hook.py calls it with the stdin it already read."""
+    args = sys.argv[1:] if argv is None else argv
+    if not args:
         log("ERROR: No hook event specified")
         sys.exit(1)
 
-    event = sys.argv[1]
-    log(f"Hook triggered: {event}")
+    event = args[0]
+    if event in ("status", "gc"):
+        import session_index
+
+        sys.exit(session_index.main(args))
 
     try:
-        stdin_raw = sys.stdin.read()
+        if stdin_raw is None:
+            stdin_raw = sys.stdin.read()
+        # Bursts of SubagentStop are answered here, before parsing or a daemon round trip.
+        if event == "SubagentStop":
+            sys.exit(_subagent_stop(HOOK_MODE))
         stdin_data = json.loads(stdin_raw) if stdin_raw.strip() else {}
     except Exception as e:
         log(f"Failed to parse stdin: {e}")
@@ -502,25 +1253,10 @@ def main() -> None:
     if not isinstance(stdin_data, dict):
         stdin_data = {}
 
-    workflow = MultiWorkflow(stdin_data)
-
-    if event == "UserPromptSubmit":
-        rc = workflow.handle_user_prompt()
-        log(f"UserPromptSubmit exit code: {rc}")
-        sys.exit(rc)
-
-    if event in ("Stop", "SubagentStop"):
-        rc = workflow.handle_stop_like()
-        log(f"{event} exit code: {rc}")
-        sys.exit(rc)
-
-    if event == "PostToolUse":
-        rc = workflow.handle_post_tool_use()
-        log(f"PostToolUse exit code: {rc}")
-        sys.exit(rc)
-
-    log(f"Unknown event: {event}")
-    sys.exit(1)
+    rc = _forward_to_daemon(event, stdin_data)
+    if rc is None:
+        rc = run_event(event, stdin_data)
+    sys.exit(rc)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+multiworkflow_bench.py — latency benchmark for the multiworkflow.py hook
+
+Builds synthetic CLI-style JSONL transcripts (10 KB up to 1 GB) and replays a realistic
+event stream against them: UserPromptSubmit, a few PostToolUse per turn, a Stop per
+stage, and an idle PostToolUse once the workflow has finished. The transcript grows
+between events the way a live session does.
+
+Each event type is measured
+- in-process: through multiworkflow.main() (stdin/argv patched, SystemExit caught),
+  reporting p50/p99 latency, read/write syscalls from /proc/self/io, and peak RSS;
+- as a subprocess cold start: a fresh interpreter per event, reporting p50/p99 wall
+  time and the child's peak RSS (VmHWM on Linux, wait4() elsewhere).
+Hot-path helpers are timed on their own too: _transcript_contains on a warm index and
+an _update_state + commit round trip.
+
+Results can be saved as a JSON baseline. A later run with --baseline compares every
+p50/p99 against it and exits 1, listing each regression, when one is slower than
+baseline * --tolerance (plus a small absolute slack for timer noise).
+
+The hook runs with metrics, the daemon and the watchdog disabled, and all state lives in
+a scratch directory, so the benchmark never touches ~/.claude.
+
+CLI:
+    python3 multiworkflow_bench.py [--sizes 10K,1M,100M] [--turns N] [--cold N]
+                                   [--workdir DIR] [--save FILE] [--baseline FILE]
+                                   [--tolerance 1.5]
+    python3 multiworkflow_bench.py --sizes 10K,1G --save baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+HOOK_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "multiworkflow.py")
+BENCH_ENV = {
+    "CC_HOOK_METRICS": "off",
+    "CC_HOOK_EVENTS": "off",
+    "CC_HOOK_METRICS_TEXTFILE": "",
+    "CC_HOOK_WATCHDOG": "0",
+    "CC_HOOK_STATE_BACKEND": "json",
+    "CC_HOOK_MODE": "json",
+}
+TRIGGER = "--test"
+SESSION_ID = "bench"
+TOOL_CALLS_PER_TURN = 4
+# Absolute slack on top of --tolerance: differences below this are scheduler noise.
+# p99 over a few dozen samples is one outlier away from the max, so it gets more room.
+ABS_SLACK_MS = {"p50_ms": 0.25, "p99_ms": 10.0}
+MIN_P99_SAMPLES = 20  # below this, p99 is just the max and is not compared
+
+_SIZE_SUFFIX = {"K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper().rstrip("B")
+    if text and text[-1] in _SIZE_SUFFIX:
+        return int(float(text[:-1]) * _SIZE_SUFFIX[text[-1]])
+    return int(text)
+
+
+def size_label(n: int) -> str:
+    for suffix, unit in (("G", 1024**3), ("M", 1024**2), ("K", 1024)):
+        if n >= unit and n % unit == 0:
+            return f"{n // unit}{suffix}"
+    return str(n)
+
+
+# ------------------------------ Transcripts -------------------------------
+
+
+def _line(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _user_line(text: str) -> bytes:
+    return _line({"type": "user", "message": {"role": "user", "content": text}})
+
+
+def _assistant_text(text: str) -> bytes:
+    return _line(
+        {"type": "assistant", "message": {"role": "assistant", "content": [{"type": "text", "text": text}]}}
+    )
+
+
+def _tool_turn(n: int) -> bytes:
+    """One tool call and its result, roughly the shape and size the CLI writes."""
+    use = {
+        "type": "assistant",
+        "message": {
+            "role": "assistant",
+            "content": [{"type": "tool_use", "id": f"toolu_{n:08d}", "name": "Bash", "input": {"command": f"ls -la src/{n}"}}],
+        },
+    }
+    result = {
+        "type": "user",
+        "message": {
+            "role": "user",
+            "content": [{"type": "tool_result", "tool_use_id": f"toolu_{n:08d}", "content": "drwxr-xr-x file\n" * 24}],
+        },
+    }
+    return _line(use) + _line(result)
+
+
+def build_transcript(path: Path, size: int) -> None:
+    """Write a token-free history of about `size` bytes (reused if already built)."""
+    if path.exists() and path.stat().st_size >= size:
+        return
+    block = bytearray()
+    n = 0
+    while len(block) < 1_048_576:
+        block += _user_line("please continue with the refactor " * 8)
+        block += _assistant_text("Looking at the module layout first. " * 20)
+        for _ in range(3):
+            block += _tool_turn(n)
+            n += 1
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        written = 0
+        while written + len(block) <= size:
+            f.write(block)
+            written += len(block)
+        tail = bytes(block[: size - written])
+        f.write(tail[: tail.rfind(b"\n") + 1])  # whole lines only
+    os.replace(tmp, path)
+
+
+# ------------------------------ Runners ----------------------------------
+
+
+def _proc_io() -> Tuple[int, int]:
+    try:
+        with open("/proc/self/io", "r") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["syscr"]), int(fields["syscw"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def _max_rss_kb(usage: Any) -> int:
+    # ru_maxrss is KiB on Linux, bytes on macOS.
+    return usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+
+
+class InProcessRunner:
+    """Drives multiworkflow.main() in this interpreter, like the warm daemon does."""
+
+    def __init__(self) -> None:
+        import multiworkflow
+
+        self.module = multiworkflow
+
+    def run(self, event: str, data: Dict[str, Any]) -> Tuple[str, Dict[str, float]]:
+        out = io.StringIO()
+        argv, stdin = sys.argv, sys.stdin
+        sys.argv, sys.stdin = [HOOK_SCRIPT, event], io.StringIO(json.dumps(data))
+        r0, w0 = _proc_io()
+        t0 = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(io.StringIO()):
+                self.module.main()
+        except SystemExit:
+            pass
+        finally:
+            elapsed = time.perf_counter() - t0
+            sys.argv, sys.stdin = argv, stdin
+        r1, w1 = _proc_io()
+        sample = {
+            "ms": elapsed * 1000.0,
+            "syscalls": float((r1 - r0) + (w1 - w0)),
+            "rss_kb": float(_max_rss_kb(resource.getrusage(resource.RUSAGE_SELF))),
+        }
+        return out.getvalue(), sample
+
+
+# Linux carries the parent's ru_maxrss into a forked child, so wait4() would report the
+# benchmark's own peak. The child reports VmHWM (reset by exec) on an inherited fd instead.
+_CHILD_WRAPPER = """
+import atexit, os, runpy, sys
+def _report():
+    with open('/proc/self/status') as f:
+        hwm = next((l.split()[1] for l in f if l.startswith('VmHWM:')), '0')
+    os.write(int(os.environ['MW_BENCH_RSS_FD']), hwm.encode())
+atexit.register(_report)
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(sys.argv[0]))
+runpy.run_path(sys.argv[0], run_name='__main__')
+"""
+
+
+class SubprocessRunner:
+    """Runs the hook script cold, one interpreter per event, as Claude Code does."""
+
+    def __init__(self, env: Dict[str, str]) -> None:
+        self.env = env
+        self.use_hwm = os.path.exists("/proc/self/status")
+
+    def run(self, event: str, data: Dict[str, Any]) -> Tuple[str, Dict[str, float]]:
+        cmd = [sys.executable, HOOK_SCRIPT, event]
+        env, pass_fds, rss_r = self.env, (), -1
+        if self.use_hwm:
+            rss_r, rss_w = os.pipe()
+            cmd = [sys.executable, "-c", _CHILD_WRAPPER, HOOK_SCRIPT, event]
+            env, pass_fds = dict(self.env, MW_BENCH_RSS_FD=str(rss_w)), (rss_w,)
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            pass_fds=pass_fds,
+        )
+        if self.use_hwm:
+            os.close(rss_w)
+        assert proc.stdin is not None and proc.stdout is not None
+        proc.stdin.write(json.dumps(data).encode("utf-8"))
+        proc.stdin.close()
+        out = proc.stdout.read().decode("utf-8", "replace")
+        proc.stdout.close()
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        elapsed = time.perf_counter() - t0
+        rss_kb = float(_max_rss_kb(usage))
+        if self.use_hwm:
+            with os.fdopen(rss_r, "rb") as f:
+                rss_kb = float(f.read() or 0)
+        return out, {"ms": elapsed * 1000.0, "rss_kb": rss_kb}
+
+
+# ------------------------------ Scenario ---------------------------------
+
+
+def replay(
+    runner: Any, project: Path, transcript: Path, turns: int
+) -> Dict[str, List[Dict[str, float]]]:
+    """Replay `turns` tool-call turns of --test workflows; returns samples per event type."""
+    from transcript_index import TOKEN_RE
+
+    shutil.rmtree(project / ".claude", ignore_errors=True)
+    project.mkdir(parents=True, exist_ok=True)
+    data = {"session_id": SESSION_ID, "cwd": str(project), "transcript_path": str(transcript)}
+    samples: Dict[str, List[Dict[str, float]]] = {}
+    tool_n = 0
+
+    def fire(label: str, event: str, **extra: Any) -> str:
+        out, sample = runner.run(event, dict(data, **extra))
+        samples.setdefault(label, []).append(sample)
+        return out
+
+    def acknowledge(output: str) -> bool:
+        """Append the emitted stage prompt to the transcript, as the CLI would."""
+        if not TOKEN_RE.search(output.encode("utf-8")):
+            return False
+        text = output
+        with contextlib.suppress(ValueError):
+            text = json.loads(output).get("reason", output)
+        with open(transcript, "ab") as f:
+            f.write(_user_line(text))
+        return True
+
+    active = False
+    for turn in range(turns):
+        if not active:
+            fire("PostToolUse:idle", "PostToolUse")
+            active = acknowledge(fire("UserPromptSubmit", "UserPromptSubmit", prompt=f"{TRIGGER} bench run {turn}"))
+        for _ in range(TOOL_CALLS_PER_TURN):
+            with open(transcript, "ab") as f:
+                f.write(_tool_turn(tool_n))
+            tool_n += 1
+            fire("PostToolUse", "PostToolUse")
+        with open(transcript, "ab") as f:
+            f.write(_assistant_text("Stage done."))
+        active = acknowledge(fire("Stop", "Stop"))
+    return samples
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def summarize(samples: Dict[str, List[Dict[str, float]]]) -> Dict[str, Dict[str, float]]:
+    report: Dict[str, Dict[str, float]] = {}
+    for label, rows in sorted(samples.items()):
+        ms = [r["ms"] for r in rows]
+        entry = {"n": len(rows), "p50_ms": round(_percentile(ms, 0.5), 3), "p99_ms": round(_percentile(ms, 0.99), 3)}
+        if "syscalls" in rows[0]:
+            entry["syscalls_p50"] = _percentile([r["syscalls"] for r in rows], 0.5)
+        entry["peak_rss_kb"] = max(r["rss_kb"] for r in rows)
+        report[label] = entry
+    return report
+
+
+def time_helpers(project: Path, transcript: Path, rounds: int) -> Dict[str, Dict[str, float]]:
+    """Time the per-event hot paths directly, on the state the replay left behind."""
+    import multiworkflow
+
+    data = {"session_id": SESSION_ID, "cwd": str(project), "transcript_path": str(transcript)}
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        wf = multiworkflow.MultiWorkflow(data)
+        if not wf.get_state():
+            wf.set_state(TRIGGER, "task_1", 0, "bench")
+        state = wf.get_state()
+        token = wf._stage_token(state["workflow_type"], state["stage_index"])
+        contains: List[float] = []
+        updates: List[float] = []
+        for i in range(rounds):
+            t0 = time.perf_counter()
+            wf._transcript_contains(token, state)
+            contains.append((time.perf_counter() - t0) * 1000.0)
+
+            t0 = time.perf_counter()
+            wf._update_state(expect_stage_index=state["stage_index"], last_reinject_epoch=float(i))
+            wf.state.commit()
+            updates.append((time.perf_counter() - t0) * 1000.0)
+        wf.clear_state()
+
+    return {
+        name: {"n": len(v), "p50_ms": round(_percentile(v, 0.5), 3), "p99_ms": round(_percentile(v, 0.99), 3)}
+        for name, v in (("_transcript_contains", contains), ("_update_state+commit", updates))
+    }
+
+
+# ------------------------------ Baseline ---------------------------------
+
+
+def flatten(results: Dict[str, Any]) -> Dict[str, float]:
+    """Map 'mode/size/event/p50_ms' style keys to latency values for comparison."""
+    flat: Dict[str, float] = {}
+    for size, modes in results["sizes"].items():
+        for mode, events in modes.items():
+            for label, entry in events.items():
+                flat[f"{mode}/{size}/{label}/p50_ms"] = entry["p50_ms"]
+                if entry["n"] >= MIN_P99_SAMPLES:
+                    flat[f"{mode}/{size}/{label}/p99_ms"] = entry["p99_ms"]
+    return flat
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    now, then = flatten(current), flatten(baseline)
+    regressions = []
+    for key, old in sorted(then.items()):
+        new = now.get(key)
+        if new is None:
+            continue
+        if new > old * tolerance + ABS_SLACK_MS[key.rsplit("/", 1)[1]]:
+            regressions.append(f"{key}: {old:.3f} ms -> {new:.3f} ms ({new / max(old, 1e-9):.2f}x)")
+    return regressions
+
+
+def print_report(results: Dict[str, Any]) -> None:
+    for size, modes in results["sizes"].items():
+        for mode, events in modes.items():
+            print(f"\n[{size}] {mode}")
+            print(f"  {'event':<22} {'n':>5} {'p50 ms':>9} {'p99 ms':>9} {'syscalls':>9} {'peak RSS MB':>12}")
+            for label, e in events.items():
+                sys_col = f"{e['syscalls_p50']:>9.0f}" if "syscalls_p50" in e else f"{'-':>9}"
+                rss_col = f"{e['peak_rss_kb'] / 1024:>12.1f}" if "peak_rss_kb" in e else f"{'-':>12}"
+                print(f"  {label:<22} {e['n']:>5} {e['p50_ms']:>9.3f} {e['p99_ms']:>9.3f} {sys_col} {rss_col}")
+
+
+# ------------------------------ CLI --------------------------------------
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark multiworkflow.py hook latency.")
+    parser.add_argument("--sizes", default="10K,1M,100M", help="transcript sizes, e.g. 10K,1M,1G")
+    parser.add_argument("--turns", type=int, default=60, help="tool-call turns replayed in-process per size")
+    parser.add_argument("--cold", type=int, default=6, help="turns replayed as subprocess cold starts (0 to skip)")
+    parser.add_argument("--workdir", help="scratch dir; transcripts are reused across runs (default: temp dir)")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--baseline", help="compare against a saved baseline; exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown factor (default 1.5)")
+    args = parser.parse_args()
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="mw-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    # Module-level config in the hook reads these at import, so set them first.
+    os.environ.update(BENCH_ENV, CC_HOOK_DAEMON_SOCKET=str(workdir / "no-daemon.sock"),
+                      CC_HOOK_WORKFLOWS_DIR=str(workdir / "workflows"),
+                      CC_HOOK_SESSION_INDEX=str(workdir / "sessions"))
+    sys.path.insert(0, os.path.dirname(HOOK_SCRIPT))
+
+    results: Dict[str, Any] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "turns": args.turns,
+        "cold_turns": args.cold,
+        "sizes": {},
+    }
+    in_process = InProcessRunner()
+    for size in (parse_size(s) for s in args.sizes.split(",") if s.strip()):
+        label = size_label(size)
+        base = workdir / f"transcript_{label}.jsonl"
+        print(f"building {label} transcript...", file=sys.stderr)
+        build_transcript(base, size)
+        transcript = workdir / f"replay_{label}.jsonl"
+        modes: Dict[str, Any] = {}
+
+        shutil.copyfile(base, transcript)
+        modes["in_process"] = summarize(replay(in_process, workdir / "proj", transcript, args.turns))
+        modes["helpers"] = time_helpers(workdir / "proj", transcript, max(args.turns, 20))
+        if args.cold > 0:
+            shutil.copyfile(base, transcript)
+            cold = SubprocessRunner(dict(os.environ))
+            modes["subprocess"] = summarize(replay(cold, workdir / "proj", transcript, args.cold))
+        transcript.unlink()
+        results["sizes"][label] = modes
+
+    print_report(results)
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nbaseline written to {args.save}")
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if regressions:
+            print(f"\nREGRESSION: {len(regressions)} measurement(s) exceed {args.tolerance}x baseline:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print(f"\nno regressions against {args.baseline} (tolerance {args.tolerance}x)")
+
+
+if __name__ == "__main__":
+    main()
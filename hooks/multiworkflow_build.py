@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+multiworkflow_build.py — precompile, package and check the hook's start-up cost
+
+Claude Code starts a new interpreter for every hook event, so start-up is most of what
+the hook costs on a tool call. Three commands:
+- compile [DIR]:   write __pycache__ bytecode for every module in DIR (default: this
+                   directory), e.g. after copying the hooks to a directory the hook
+                   process cannot write to;
+- zipapp [-o OUT]: build a single-file multiworkflow.pyz with multiworkflow_hook.py as
+                   __main__ and every runtime module next to its bytecode (unchecked
+                   hash-based .pyc, so nothing is compiled or stat'ed on start-up; an
+                   interpreter with another bytecode version falls back to the sources);
+- check [--entry PATH]: run the no-workflow PostToolUse/Stop/SubagentStop events
+                   through the entry point in a scratch project, report p50 wall time
+                   above a bare `python3 -c pass` and the modules -X importtime shows
+                   beyond the interpreter's own. Exits 1 past --budget-ms (default 20).
+
+CLI:
+    python3 multiworkflow_build.py compile [DIR]
+    python3 multiworkflow_build.py zipapp [-o multiworkflow.pyz]
+    python3 multiworkflow_build.py check [--entry multiworkflow_hook.py|multiworkflow.pyz]
+                                         [--runs N] [--budget-ms MS]
+"""
+
+from __future__ import annotations
+
+import argparse
+import compileall
+import json
+import os
+import py_compile
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipapp
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+HERE = Path(__file__).resolve().parent
+ENTRY = HERE / "multiworkflow_hook.py"
+# Development tools; everything else in this directory is something the hook may import.
+NOT_PACKAGED = {"multiworkflow_build.py", "multiworkflow_bench.py", "workflow_sim.py", "multiworkflow_hook.py"}
+
+EVENTS = ("PostToolUse", "Stop", "SubagentStop")
+
+
+# ------------------------------ Build -------------------------------------
+
+
+def compile_dir(directory: Path) -> bool:
+    return bool(compileall.compile_dir(str(directory), maxlevels=0, quiet=1))
+
+
+def build_zipapp(output: Path) -> int:
+    """Write the zipapp and return its size in bytes."""
+    with tempfile.TemporaryDirectory(prefix="multiworkflow-pyz-") as tmp:
+        staging = Path(tmp)
+        sources = sorted(p for p in HERE.glob("*.py") if p.name not in NOT_PACKAGED)
+        for src, name in [(ENTRY, "__main__")] + [(p, p.stem) for p in sources]:
+            shutil.copyfile(src, staging / f"{name}.py")
+            # zipimport only looks for <module>.pyc next to <module>.py, not __pycache__/.
+            py_compile.compile(
+                str(src),
+                cfile=str(staging / f"{name}.pyc"),
+                dfile=f"{output.name}/{name}.py",
+                doraise=True,
+                invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+            )
+        output.parent.mkdir(parents=True, exist_ok=True)
+        zipapp.create_archive(staging, output, interpreter="/usr/bin/env python3")
+    return output.stat().st_size
+
+
+# ------------------------------ Check -------------------------------------
+
+
+def _payload(project: Path) -> bytes:
+    return json.dumps(
+        {
+            "session_id": "0b6c1f2e-startup-check",
+            "transcript_path": str(project / "transcript.jsonl"),
+            "cwd": str(project),
+            "hook_event_name": "PostToolUse",
+            "tool_name": "Bash",
+            "tool_input": {"command": "ls -la"},
+            "tool_response": {"stdout": "total 0", "stderr": "", "interrupted": False},
+        }
+    ).encode("utf-8")
+
+
+def _p50(cmd: List[str], stdin: bytes, env: Dict[str, str], runs: int) -> Tuple[float, subprocess.CompletedProcess]:
+    times = []
+    proc = None
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        proc = subprocess.run(cmd, input=stdin, capture_output=True, env=env)
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    assert proc is not None
+    return times[len(times) // 2], proc
+
+
+def _imported(cmd: List[str], stdin: bytes, env: Dict[str, str]) -> Dict[str, Tuple[int, int]]:
+    """module -> (self us, cumulative us) from -X importtime."""
+    proc = subprocess.run([cmd[0], "-X", "importtime", *cmd[1:]], input=stdin, capture_output=True, env=env)
+    modules = {}
+    for line in proc.stderr.decode("utf-8", "replace").splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = [f.strip() for f in line[len("import time:"):].split("|")]
+        if len(fields) == 3 and fields[0].isdigit():
+            modules[fields[2].strip()] = (int(fields[0]), int(fields[1]))
+    return modules
+
+
+def check(entry: Path, runs: int, budget_ms: float) -> int:
+    with tempfile.TemporaryDirectory(prefix="multiworkflow-check-") as tmp:
+        project = Path(tmp) / "project"
+        (project / ".claude").mkdir(parents=True)
+        env = dict(
+            os.environ,
+            HOME=tmp,  # no daemon socket, session index or events of the real user
+            CC_HOOK_METRICS="off",
+            CC_HOOK_EVENTS="off",
+            CC_HOOK_STATE_BACKEND="json",
+            CC_HOOK_MODE="json",
+        )
+        stdin = _payload(project)
+        bare_cmd = [sys.executable, "-c", "pass"]
+        bare, _ = _p50(bare_cmd, b"", env, runs)
+        baseline: Set[str] = set(_imported(bare_cmd, b"", env))
+
+        print(f"entry: {entry}")
+        print(f"bare interpreter: p50 {bare * 1000:.1f} ms")
+        print(f"{'event':<14} {'p50 ms':>8} {'added ms':>9}  rc  stdout")
+        worst = 0.0
+        for event in EVENTS:
+            cmd = [sys.executable, str(entry), event]
+            wall, proc = _p50(cmd, stdin, env, runs)
+            added = (wall - bare) * 1000
+            worst = max(worst, added)
+            out = proc.stdout.decode("utf-8", "replace").strip()
+            print(f"{event:<14} {wall * 1000:>8.1f} {added:>9.1f}  {proc.returncode:>2}  {out or '-'}")
+            if proc.returncode != 0:
+                print(proc.stderr.decode("utf-8", "replace"), file=sys.stderr)
+                return 1
+
+        extra = {
+            name: times
+            for name, times in _imported([sys.executable, str(entry), "PostToolUse"], stdin, env).items()
+            if name not in baseline
+        }
+        total = sum(self_us for self_us, _ in extra.values())
+        print(f"imports beyond the interpreter's (PostToolUse): {len(extra)}, {total / 1000:.1f} ms self")
+        for name, (self_us, _) in sorted(extra.items(), key=lambda kv: -kv[1][0])[:15]:
+            print(f"    {self_us / 1000:>6.2f} ms  {name}")
+
+    if worst > budget_ms:
+        print(f"FAIL: the no-workflow path adds {worst:.1f} ms (budget {budget_ms:g} ms)")
+        return 1
+    print(f"ok: the no-workflow path adds at most {worst:.1f} ms (budget {budget_ms:g} ms)")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precompile, package and check the hook's start-up cost.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("compile", help="write __pycache__ bytecode for the hook modules")
+    p.add_argument("dir", nargs="?", default=str(HERE))
+    p = sub.add_parser("zipapp", help="build a single-file zipapp with precompiled bytecode")
+    p.add_argument("-o", "--output", default="multiworkflow.pyz")
+    p = sub.add_parser("check", help="time the no-workflow path and list its imports")
+    p.add_argument("--entry", default=str(ENTRY), help="hook script or zipapp to time")
+    p.add_argument("--runs", type=int, default=31)
+    p.add_argument("--budget-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    if args.cmd == "compile":
+        ok = compile_dir(Path(args.dir))
+        print(f"compiled {args.dir}" if ok else f"some modules in {args.dir} failed to compile", file=sys.stderr)
+        sys.exit(0 if ok else 1)
+    if args.cmd == "zipapp":
+        output = Path(args.output).expanduser()
+        size = build_zipapp(output)
+        print(f"wrote {output} ({size / 1024:.0f} KB)")
+        sys.exit(0)
+    sys.exit(check(Path(args.entry).expanduser(), max(1, args.runs), args.budget_ms))
+
+
+if __name__ == "__main__":
+    main()
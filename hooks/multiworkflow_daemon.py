@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+multiworkflow_daemon.py — optional warm server for multiworkflow.py
+
+Every hook event normally starts a fresh interpreter. This daemon keeps one interpreter
+alive: the hook script connects to its Unix socket, sends the event JSON, and replays the
+captured stdout/stderr/exit code. If the socket is missing or refuses the connection, the
+hook runs in-process exactly as before, so the daemon is never required.
+
+Usage:
+    python3 multiworkflow_daemon.py            # serve on CC_HOOK_DAEMON_SOCKET (foreground)
+    python3 multiworkflow_daemon.py --socket /tmp/mw.sock
+
+Notes:
+- Each request runs on its own thread, so a slow event (say, the first index of a large
+  transcript) does not hold up other sessions. sys.stdout/sys.stderr are replaced by
+  per-thread streams: what a handler prints goes into its own request's reply.
+- A request whose client has already hung up is dropped unread; the hook waits for the
+  reply once it has sent an event, so the daemon never acts on one nobody will see.
+- Restart the daemon after editing multiworkflow.py; it keeps running the code it loaded.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import io
+import json
+import os
+import select
+import signal
+import socket
+import socketserver
+import sys
+import threading
+from typing import Any, Dict, Iterator, TextIO
+
+import multiworkflow
+
+
+class _ThreadStream(io.TextIOBase):
+    """Per-thread stand-in for sys.stdout/sys.stderr.
+
+    Writes go to the calling thread's capture buffer, or to the real stream on threads
+    that are not handling a request.
+    """
+
+    def __init__(self, default: TextIO) -> None:
+        self._default = default
+        self._local = threading.local()
+
+    def _target(self) -> TextIO:
+        return getattr(self._local, "buffer", None) or self._default
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def writable(self) -> bool:
+        return True
+
+    @contextlib.contextmanager
+    def capture(self) -> Iterator[io.StringIO]:
+        buffer = self._local.buffer = io.StringIO()
+        try:
+            yield buffer
+        finally:
+            self._local.buffer = None
+
+
+def _client_gone(sock: socket.socket) -> bool:
+    """True once the client has closed its end (it only shuts down writing while it waits)."""
+    if not hasattr(select, "poll"):
+        return False
+    poller = select.poll()
+    poller.register(sock, select.POLLHUP)
+    return any(mask & (select.POLLHUP | select.POLLERR) for _, mask in poller.poll(0))
+
+
+class _EventHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        out, err = io.StringIO(), io.StringIO()
+        rc = 0
+        try:
+            request: Dict[str, Any] = json.loads(self.rfile.readline() or b"{}")
+            event = str(request.get("event", ""))
+            data = request.get("data")
+            if not event:
+                return  # liveness probe or empty connection
+            if _client_gone(self.connection):
+                multiworkflow.log(f"Dropping {event}: the hook gave up before it was handled")
+                return
+            with sys.stdout.capture() as out, sys.stderr.capture() as err:  # type: ignore[attr-defined]
+                rc = multiworkflow.run_event(
+                    event,
+                    data if isinstance(data, dict) else {},
+                    request.get("hook_mode"),
+                )
+        except Exception as e:
+            err.write(f"Daemon failed to handle event: {e}\n")
+            rc = 0
+        reply = {"stdout": out.getvalue(), "stderr": err.getvalue(), "rc": rc}
+        self.wfile.write(json.dumps(reply).encode("utf-8"))
+
+
+class _EventServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True  # shutdown does not wait for a stuck handler
+
+    def server_bind(self) -> None:
+        # A leftover socket file from a crashed daemon would make bind() fail.
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.server_address)
+        super().server_bind()
+        os.chmod(self.server_address, 0o600)
+
+
+def serve(socket_path: str) -> None:
+    if _socket_is_live(socket_path):
+        multiworkflow.log(f"Daemon already running on {socket_path}")
+        sys.exit(1)
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    sys.stdout, sys.stderr = _ThreadStream(sys.stdout), _ThreadStream(sys.stderr)  # type: ignore[assignment]
+    server = _EventServer(socket_path, _EventHandler)
+
+    def _shutdown(*_: Any) -> None:
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    multiworkflow.log(f"multiworkflow daemon listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(socket_path)
+        multiworkflow.log("multiworkflow daemon stopped")
+
+
+def _socket_is_live(socket_path: str) -> bool:
+    if not os.path.exists(socket_path):
+        return False
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+def main() -> None:
+    socket_path = multiworkflow.DAEMON_SOCKET
+    args = sys.argv[1:]
+    if args[:1] == ["--socket"] and len(args) == 2:
+        socket_path = args[1]
+    elif args:
+        print("Usage: multiworkflow_daemon.py [--socket PATH]", file=sys.stderr)
+        sys.exit(1)
+    serve(socket_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+multiworkflow_hook.py — fast-start entry point for multiworkflow.py
+
+Most hook events arrive with no workflow active: every PostToolUse, and every Stop of
+an ordinary conversation. multiworkflow.py answers those correctly, but only after
+compiling itself (a script's bytecode is never cached) and importing json, pathlib,
+typing and the rest of the hook. This entry point imports nothing beyond os and sys and
+settles those events with one stat of the session's state file:
+- SubagentStop:           answered at once, as multiworkflow.py does;
+- PostToolUse and Stop:   session_id and cwd are picked out of the raw stdin; when
+                          .claude/workflow_state_<session>.json does not exist the
+                          event is answered without importing multiworkflow.
+Anything else (UserPromptSubmit, status/gc, the sqlite backend, a payload that cannot
+be read unambiguously without a JSON parser, a state file that exists) goes to
+multiworkflow.main() with the stdin already read, so behaviour is unchanged.
+
+Register this file instead of multiworkflow.py (same arguments), or the zipapp built
+from it by multiworkflow_build.py. Run multiworkflow_build.py compile in the installed
+directory so the modules behind the slow path are loaded from cached bytecode too.
+
+CLI:
+    python3 multiworkflow_hook.py <Event>  < hook-input.json
+"""
+
+import os
+import sys
+
+
+def _field(raw, key):
+    """The string value of top-level `key` in the JSON text `raw`; "" when absent.
+
+    None means "cannot tell without parsing": the key appears more than once (it may be
+    nested in tool_input), the value is not a plain string, or it holds an escape.
+    """
+    quoted = '"' + key + '"'
+    count = raw.count(quoted)
+    if count == 0:
+        return ""
+    if count > 1:
+        return None
+    pos = raw.index(quoted) + len(quoted)
+    rest = raw[pos:].lstrip()
+    if not rest.startswith(":"):
+        return None
+    rest = rest[1:].lstrip()
+    if not rest.startswith('"'):
+        return None
+    end = rest.find('"', 1)
+    if end < 0 or "\\" in rest[1:end]:
+        return None
+    return rest[1:end]
+
+
+def _no_workflow(raw):
+    """True when the payload's session provably has no JSON state file."""
+    if os.getenv("CC_HOOK_STATE_BACKEND", "json").strip().lower() != "json":
+        return False
+    session_id = _field(raw, "session_id")
+    cwd = _field(raw, "cwd")
+    if not session_id or cwd is None:
+        return False  # no id means the hashed fallback; leave that to multiworkflow.py
+    state_file = os.path.join(cwd or os.getcwd(), ".claude", f"workflow_state_{session_id}.json")
+    return not os.path.exists(state_file)
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "watchdog":
+        import multiworkflow_watchdog  # spawned by the watchdog when running from the zipapp
+
+        multiworkflow_watchdog.main(sys.argv[2:])
+        return 0
+    if len(sys.argv) < 2 or sys.argv[1] in ("status", "gc"):
+        stdin_raw = None
+    else:
+        event = sys.argv[1]
+        json_mode = os.getenv("CC_HOOK_MODE", "json").strip().lower() == "json"
+        if event == "SubagentStop":
+            if json_mode:
+                print("{}")
+            return 0
+        try:
+            stdin_raw = sys.stdin.read()
+        except Exception:
+            stdin_raw = ""
+        if event in ("PostToolUse", "Stop") and _no_workflow(stdin_raw):
+            if event == "Stop" and json_mode:
+                print("{}")  # allow the platform to proceed
+            return 0
+
+    import multiworkflow
+
+    multiworkflow.main(sys.argv[1:], stdin_raw)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
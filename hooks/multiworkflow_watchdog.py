@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+multiworkflow_watchdog.py — per-session stall watchdog for multiworkflow.py
+
+Hooks only run when Claude Code fires an event, so a stuck session used to go unnoticed
+until some tool happened to run. With CC_HOOK_WATCHDOG=1 the hook starts one small
+background process per active session (see spawn()). It polls the transcript with a
+single stat() every CC_HOOK_WATCHDOG_POLL_SEC seconds and records two conditions in
+the session state under "watchdog":
+- stalled_since:   the transcript has not grown for CC_HOOK_STALL_SEC seconds;
+- swallowed_epoch: the current stage token was not seen within the nudge grace period
+                   after the stage prompt (or last reinject) was emitted.
+The next hook event logs and clears them. Transcript size and growth are tracked in
+this process; the state is only written when one of these findings changes. If
+CC_HOOK_WATCHDOG_NOTIFY is set, that command also runs with a JSON report on stdin
+when a condition is first detected.
+
+The process exits when the workflow finishes or the state disappears. The standard
+library has no inotify binding, so polling is used; a stat every few seconds is cheap.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+POLL_SEC = float(os.getenv("CC_HOOK_WATCHDOG_POLL_SEC", "5"))
+NOTIFY_CMD = os.getenv("CC_HOOK_WATCHDOG_NOTIFY", "")
+MAX_LIFETIME_SEC = 7 * 24 * 3600.0
+# The only fields a commit is made for. The transcript size and last growth stay in
+# this process: every state write makes a concurrent hook's exclusive commit fail.
+REPORT_KEYS = ("stalled_since", "stall_reported_at", "swallowed_epoch", "swallow_reported_for")
+
+
+def _pid_file(claude_dir: Path, session_id: str) -> Path:
+    return claude_dir / f"workflow_watchdog_{session_id}.pid"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def spawn(data: Dict[str, Any], claude_dir: Path, session_id: str) -> None:
+    """Start a detached watchdog for this session unless one is already alive."""
+    pid_file = _pid_file(claude_dir, session_id)
+    try:
+        if _pid_alive(int(pid_file.read_text().strip())):
+            return
+    except (OSError, ValueError):
+        pass
+    script = os.path.abspath(__file__)
+    if os.path.isfile(os.path.dirname(script)):
+        # Loaded from the multiworkflow.pyz zipapp: its entry point runs the watchdog.
+        cmd = [sys.executable, os.path.dirname(script), "watchdog"]
+    else:
+        cmd = [sys.executable, script]
+    # Only what watch() needs: the hook payload holds the user's prompt, which must not
+    # sit in the process table for the watchdog's lifetime (or overflow ARG_MAX).
+    proc = subprocess.Popen(
+        [*cmd, session_id, str(claude_dir.parent), data.get("transcript_path") or ""],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,  # survive the hook process and ignore its signals
+        cwd=str(claude_dir),
+    )
+    pid_file.write_text(str(proc.pid))
+
+
+def _notify(report: Dict[str, Any]) -> None:
+    if not NOTIFY_CMD:
+        return
+    try:
+        subprocess.run(
+            NOTIFY_CMD, shell=True, input=json.dumps(report).encode("utf-8"), timeout=30
+        )
+    except Exception:
+        pass
+
+
+def watch(data: Dict[str, Any]) -> None:
+    import multiworkflow
+
+    wf = multiworkflow.MultiWorkflow(data)
+    pid_file = _pid_file(wf.claude_dir, wf.session_id)
+    transcript = data.get("transcript_path") or ""
+    started = time.time()
+    last_size: Optional[int] = None
+    last_growth = started
+    watched_stage: Optional[int] = None
+
+    # Announce this process once, for anyone inspecting the state.
+    state = wf.get_state()
+    if state:
+        wf._update_state(watchdog=dict(state.get("watchdog") or {}, pid=os.getpid()))
+        wf.state.commit()
+
+    try:
+        while time.time() - started < MAX_LIFETIME_SEC:
+            time.sleep(POLL_SEC)
+            wf.state = wf.new_session_state()  # fresh read each tick
+            state = wf.get_state()
+            if not state:
+                return  # workflow finished or was cleared
+            idx = int(state.get("stage_index", 0))
+            now = time.time()
+            if idx != watched_stage:
+                watched_stage, last_growth = idx, now
+
+            try:
+                size = os.stat(transcript).st_size
+            except OSError:
+                size = None
+            if size != last_size:
+                last_size, last_growth = size, now
+
+            previous = state.get("watchdog") or {}
+            report = dict(previous)
+            base = {"session_id": wf.session_id, "project_dir": str(wf.project_dir), "stage": state.get("stage")}
+
+            if now - last_growth >= multiworkflow.STAGE_STALL_SEC:
+                if not report.get("stalled_since") and report.get("stall_reported_at") != last_growth:
+                    report.update(stalled_since=now, stall_reported_at=last_growth)
+                    _notify(dict(base, kind="stall", idle_sec=round(now - last_growth)))
+
+            emitted = max(float(state.get("timestamp", 0.0)), float(state.get("last_reinject_epoch", 0.0)))
+            token = wf._stage_token(state["workflow_type"], idx)
+            if (
+                now - emitted >= multiworkflow.INITIAL_NUDGE_GRACE_SEC
+                and report.get("swallow_reported_for") != emitted
+                and not wf._transcript_contains(token, state)
+            ):
+                report.update(swallowed_epoch=now, swallow_reported_for=emitted)
+                _notify(dict(base, kind="swallowed", token=token))
+
+            if any(report.get(k) != previous.get(k) for k in REPORT_KEYS):
+                wf._update_state(expect_stage_index=idx, watchdog=report)
+                wf.state.commit()
+    finally:
+        try:
+            if pid_file.read_text().strip() == str(os.getpid()):
+                pid_file.unlink()
+        except OSError:
+            pass
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) not in (2, 3):
+        print("Usage: multiworkflow_watchdog.py SESSION_ID PROJECT_DIR [TRANSCRIPT_PATH]", file=sys.stderr)
+        sys.exit(1)
+    watch({"session_id": args[0], "cwd": args[1], "transcript_path": args[2] if len(args) > 2 else ""})
+
+
+if __name__ == "__main__":
+    main()
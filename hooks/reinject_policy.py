@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+reinject_policy.py — when multiworkflow.py may re-emit a stage prompt
+
+A stage prompt whose token never shows up in the transcript is re-emitted ("reinjected").
+Each reinject adds the whole prompt to the context, so the retries are rationed per stage:
+- budget:   at most max_reinjects per stage;
+- backoff:  attempt n waits reinject_cooldown_sec * reinject_backoff**n after the last
+            emission (capped at reinject_max_cooldown_sec);
+- growth:   the transcript must also have grown by reinject_min_growth_bytes *
+            reinject_backoff**n since the last emission. Claude Code writes a prompt it
+            received, and the work that follows, to the transcript; without growth the
+            previous emission is still pending, and a PostToolUse and a Stop racing on the
+            same missing token collapse into one reinject.
+The last emission is the stage prompt itself (state "timestamp" / "context_size") or the
+latest reinject. All five limits can be overridden per workflow ("limits") or per stage
+("stage_limits") in a workflow definition; see workflow_registry.py.
+
+decide() is pure: it returns the verdict plus a record of the inputs, which the hook
+logs in state["reinject_log"] and in its metrics so the limits can be tuned from data.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+DEFAULT_LIMITS: Dict[str, Any] = {
+    "max_reinjects": 4,
+    "reinject_cooldown_sec": 2.0,
+    "reinject_backoff": 2.0,
+    "reinject_max_cooldown_sec": 120.0,
+    "reinject_min_growth_bytes": 256,
+}
+
+
+class Decision(NamedTuple):
+    allow: bool
+    reason: str  # "reinject", "budget_exhausted", "backoff" or "pending"
+    detail: Dict[str, Any]
+
+
+def decide(
+    limits: Dict[str, Any],
+    state: Dict[str, Any],
+    idx: int,
+    transcript_size: Optional[int],
+    event: str,
+    now: Optional[float] = None,
+) -> Decision:
+    now = time.time() if now is None else now
+    limits = dict(DEFAULT_LIMITS, **limits)
+    attempt = int(state.get("reinject_counts", {}).get(str(idx), 0))
+    factor = float(limits["reinject_backoff"]) ** attempt
+    last_epoch = max(float(state.get("timestamp", 0.0)), float(state.get("last_reinject_epoch", 0.0)))
+    last_size = int(state.get("last_reinject_size") or state.get("context_size", {}).get("characters", 0))
+    wait = min(float(limits["reinject_max_cooldown_sec"]), float(limits["reinject_cooldown_sec"]) * factor)
+    need_growth = int(int(limits["reinject_min_growth_bytes"]) * factor)
+    growth = None if transcript_size is None else transcript_size - last_size
+    detail = {
+        "event": event,
+        "attempt": attempt + 1,
+        "since_last_sec": round(now - last_epoch, 3),
+        "wait_sec": round(wait, 3),
+        "growth_bytes": growth,
+        "need_growth_bytes": need_growth,
+    }
+    if attempt >= int(limits["max_reinjects"]):
+        return Decision(False, "budget_exhausted", detail)
+    if now - last_epoch < wait:
+        return Decision(False, "backoff", detail)
+    if growth is not None and growth < need_growth:
+        return Decision(False, "pending", detail)
+    return Decision(True, "reinject", detail)
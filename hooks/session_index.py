@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+session_index.py — host-wide index of active multiworkflow.py sessions
+
+Workflow state lives next to each project (.claude/workflow_state_<session>.json), so
+finding every running workflow used to mean walking every repository. The hook now
+also keeps one small entry per active session in CC_HOOK_SESSION_INDEX (default
+~/.claude/multiworkflow_sessions/):
+- set_state writes the entry (atomic replace, no shared lock), clear_state removes it;
+- `status` lists the directory and reads only the active sessions' state files, so it
+  costs O(active sessions) however many projects have ever run a workflow;
+- `gc` removes abandoned sessions: state not updated within the TTL, along with its
+  .lock file, transcript index sidecars, a dead watchdog's pid file and the entry.
+  Project directories given on the command line are also swept for orphaned
+  workflow_state_*.json/.lock files that predate the index.
+
+CLI (also reachable as `multiworkflow.py status|gc`):
+    python3 session_index.py status [--json]
+    python3 session_index.py gc [--ttl-hours N] [--dry-run] [PROJECT_DIR ...]
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+INDEX_DIR = Path(
+    os.getenv("CC_HOOK_SESSION_INDEX")
+    or os.path.join(os.path.expanduser("~"), ".claude", "multiworkflow_sessions")
+)
+DEFAULT_TTL_SEC = 24 * 3600.0
+
+
+def _entry_path(project_dir: str, session_id: str) -> Path:
+    key = hashlib.sha1(f"{project_dir}\0{session_id}".encode("utf-8")).hexdigest()[:16]
+    return INDEX_DIR / f"{key}.json"
+
+
+def record(project_dir: str, session_id: str, state: Dict[str, Any], **extra: Any) -> None:
+    """Create or refresh the entry for a session that just entered a stage."""
+    entry = {
+        "project_dir": project_dir,
+        "session_id": session_id,
+        "workflow_type": state.get("workflow_type"),
+        "workflow_name": state.get("workflow_name"),
+        "stage": state.get("stage"),
+        "stage_index": state.get("stage_index"),
+        "progress": state.get("progress", {}).get("current_stage"),
+        "phase": state.get("progress", {}).get("phase"),
+        "stage_started": state.get("timestamp"),
+        "workflow_started": state.get("workflow_start_ts"),
+        "updated_at": time.time(),
+        **extra,
+    }
+    INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    path = _entry_path(project_dir, session_id)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(entry, separators=(",", ":")))
+    os.replace(tmp, path)
+
+
+def forget(project_dir: str, session_id: str) -> None:
+    try:
+        _entry_path(project_dir, session_id).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def entries() -> Iterator[Tuple[Path, Dict[str, Any]]]:
+    try:
+        names = os.listdir(INDEX_DIR)
+    except OSError:
+        return
+    for name in names:
+        if not name.endswith(".json"):
+            continue
+        path = INDEX_DIR / name
+        try:
+            yield path, json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+
+
+# ------------------------------ Status ------------------------------------
+
+
+def _live_state(entry: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+    """Current state and its last-modified time, from whichever backend wrote it."""
+    if entry.get("backend") == "sqlite":
+        import state_sqlite
+
+        store = state_sqlite.open_store(entry["state_db"])
+        updated = store.updated_at(entry["project_dir"], entry["session_id"])
+        if updated is None:
+            return None, None
+        return store.get(entry["project_dir"], entry["session_id"]), updated
+    path = entry.get("state_file", "")
+    try:
+        mtime = os.stat(path).st_mtime
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f), mtime
+    except (OSError, ValueError):
+        return None, None
+
+
+def _age(seconds: float) -> str:
+    seconds = int(max(0.0, seconds))
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+def status_rows() -> List[Dict[str, Any]]:
+    now = time.time()
+    rows = []
+    for _, entry in entries():
+        state, mtime = _live_state(entry)
+        state = state or {}
+        transcript = entry.get("transcript_path") or ""
+        try:
+            context = os.path.getsize(transcript) if transcript else None
+        except OSError:
+            context = None
+        if context is None:
+            context = int(state.get("context_size", {}).get("characters", 0))
+        counts = state.get("reinject_counts", {}) or {}
+        rows.append(
+            {
+                "session_id": entry["session_id"],
+                "project_dir": entry["project_dir"],
+                "workflow": state.get("workflow_type", entry.get("workflow_type")),
+                "stage": state.get("stage", entry.get("stage")),
+                "progress": state.get("progress", {}).get("current_stage", entry.get("progress")),
+                "phase": state.get("progress", {}).get("phase", entry.get("phase")),
+                "stage_age_sec": round(now - float(state.get("timestamp", entry.get("stage_started") or now)), 1),
+                "workflow_age_sec": round(
+                    now - float(state.get("workflow_start_ts", entry.get("workflow_started") or now)), 1
+                ),
+                "idle_sec": round(now - (mtime or float(entry.get("updated_at", now))), 1),
+                "reinjects": sum(int(v) for v in counts.values()),
+                "context_bytes": context,
+                "state_missing": not state,
+            }
+        )
+    rows.sort(key=lambda r: r["idle_sec"])
+    return rows
+
+
+def print_status(as_json: bool) -> None:
+    rows = status_rows()
+    if as_json:
+        print(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        print(f"No active workflow sessions in {INDEX_DIR}")
+        return
+    print(
+        f"{'session':<14} {'workflow':<10} {'stage':<12} {'prog':>5} {'phase':<18} "
+        f"{'stage age':>9} {'idle':>8} {'reinj':>5} {'context':>9}  project"
+    )
+    for r in rows:
+        stage = "(missing)" if r["state_missing"] else str(r["stage"])
+        print(
+            f"{r['session_id'][:14]:<14} {str(r['workflow']):<10} {stage:<12} {str(r['progress']):>5} "
+            f"{str(r['phase']):<18} {_age(r['stage_age_sec']):>9} {_age(r['idle_sec']):>8} "
+            f"{r['reinjects']:>5} {r['context_bytes'] / 1024:>8.0f}K  {r['project_dir']}"
+        )
+
+
+# -------------------------------- GC --------------------------------------
+
+
+def _session_files(claude_dir: Path, session_id: str) -> List[Path]:
+    return [
+        claude_dir / f"workflow_state_{session_id}.json",
+        claude_dir / f"workflow_state_{session_id}.lock",
+        claude_dir / f"transcript_index_{session_id}.json",
+        claude_dir / f"transcript_index_{session_id}.jsonl",
+    ]
+
+
+def _watchdog_alive(claude_dir: Path, session_id: str) -> bool:
+    pid_file = claude_dir / f"workflow_watchdog_{session_id}.pid"
+    try:
+        pid = int(pid_file.read_text().strip())
+    except (OSError, ValueError):
+        return False
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        pid_file.unlink(missing_ok=True)
+        return False
+    except PermissionError:
+        return True
+
+
+def _newest_mtime(paths: List[Path]) -> Optional[float]:
+    mtimes = []
+    for p in paths:
+        try:
+            mtimes.append(p.stat().st_mtime)
+        except OSError:
+            pass
+    return max(mtimes) if mtimes else None
+
+
+def gc(ttl_sec: float, project_dirs: List[str], dry_run: bool = False) -> int:
+    """Remove sessions idle for longer than ttl_sec; returns the number of files removed."""
+    cutoff = time.time() - ttl_sec
+    doomed: Dict[Path, None] = {}  # ordered set: a session can be found both ways
+    for entry_path, entry in entries():
+        claude_dir = Path(entry["project_dir"]) / ".claude"
+        if entry.get("backend") == "sqlite":
+            _, updated = _live_state(entry)
+            if updated is None or updated < cutoff:
+                doomed[entry_path] = None
+            continue
+        files = _session_files(claude_dir, entry["session_id"])
+        newest = _newest_mtime(files)
+        if (newest is None or newest < cutoff) and not _watchdog_alive(claude_dir, entry["session_id"]):
+            doomed.update(dict.fromkeys([*files, entry_path]))
+
+    # Sessions that crashed before the index existed are only found by looking.
+    for project in project_dirs:
+        claude_dir = Path(project).expanduser() / ".claude"
+        sessions = set()
+        for pattern in ("workflow_state_*.json", "workflow_state_*.lock"):
+            sessions.update(p.stem[len("workflow_state_"):] for p in claude_dir.glob(pattern))
+        for session_id in sorted(sessions):
+            files = _session_files(claude_dir, session_id)
+            newest = _newest_mtime(files)
+            if newest is not None and newest < cutoff and not _watchdog_alive(claude_dir, session_id):
+                doomed.update(dict.fromkeys([*files, _entry_path(str(claude_dir.parent.resolve()), session_id)]))
+
+    for stray in INDEX_DIR.glob("*.tmp") if INDEX_DIR.is_dir() else []:
+        if (_newest_mtime([stray]) or 0.0) < cutoff:
+            doomed[stray] = None
+
+    removed = 0
+    for p in doomed:
+        if not p.exists():
+            continue
+        print(f"{'would remove' if dry_run else 'removed'} {p}")
+        if not dry_run:
+            p.unlink(missing_ok=True)
+        removed += 1
+    return removed
+
+
+# ------------------------------ CLI --------------------------------------
+
+USAGE = "Usage: session_index.py status [--json] | gc [--ttl-hours N] [--dry-run] [PROJECT_DIR ...]"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    cmd = args.pop(0) if args else "status"
+    if cmd == "status" and args in ([], ["--json"]):
+        print_status(args == ["--json"])
+        return 0
+    if cmd == "gc":
+        ttl, dry_run, projects = DEFAULT_TTL_SEC, False, []
+        while args:
+            arg = args.pop(0)
+            if arg == "--ttl-hours" and args:
+                ttl = float(args.pop(0)) * 3600.0
+            elif arg == "--dry-run":
+                dry_run = True
+            else:
+                projects.append(arg)
+        n = gc(ttl, projects, dry_run)
+        print(f"{'would remove' if dry_run else 'removed'} {n} file(s)")
+        return 0
+    print(USAGE, file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+stage_budget.py — per-stage wall-clock, transcript and tool-call budgets
+
+A stage that never finishes (an execute_N round that keeps going for hours, a verify_N
+that fills the context window) is cut short once it spends more than its budget:
+- max_stage_sec:         wall time since the stage prompt was emitted;
+- max_stage_bytes:       transcript growth since then (Claude Code's transcript holds
+                         everything added to the context);
+- max_stage_tool_calls:  tool calls in the stage, from the transcript index's per-stage
+                         counter (only read when this limit is set).
+0 disables a limit; all default to 0. They are checked in that order, cheapest first:
+the clock, one stat of the transcript, then an incremental index refresh.
+
+on_budget picks what happens to a stage over budget:
+- "wrap_up" (default): on PostToolUse, tell Claude to finish up and end its turn; the
+  Stop that follows advances as usual;
+- "handoff": likewise, but Claude first writes a handoff summary of the stage to
+  plan/handoffs/, and the next stage prompt points at it, so the next stage can run
+  after a /compact or in a fresh conversation;
+- "advance": move to the next stage at once (the next stage prompt is the reply).
+A wrap-up or handoff is asked for once per stage. If the stage is still running
+budget_grace_sec later, it is advanced. A Stop over budget always advances, even if
+the stage token never showed up, unless a handoff is configured and not yet requested.
+
+All five keys can be set per workflow ("limits") or per stage ("stage_limits"); see
+workflow_registry.py. check() is pure; the hook records its verdict in state["budget"],
+in its metrics and as a "budget" event.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+ACTIONS = ("wrap_up", "handoff", "advance")
+
+DEFAULT_LIMITS: Dict[str, Any] = {
+    "max_stage_sec": 0,
+    "max_stage_bytes": 0,
+    "max_stage_tool_calls": 0,
+    "on_budget": "wrap_up",
+    "budget_grace_sec": 300.0,
+}
+
+HANDOFF_DIR = "plan/handoffs"
+
+
+class Verdict(NamedTuple):
+    action: str  # "ok", "wait", or one of ACTIONS
+    reason: Optional[str]  # the exceeded budget: "wall", "bytes" or "tool_calls"
+    detail: Dict[str, Any]
+
+
+def enabled(limits: Dict[str, Any]) -> bool:
+    return any(float(limits.get(k) or 0) > 0 for k in ("max_stage_sec", "max_stage_bytes", "max_stage_tool_calls"))
+
+
+def check(
+    limits: Dict[str, Any],
+    state: Dict[str, Any],
+    transcript_size: Optional[int],
+    tool_calls: Callable[[], Optional[int]],
+    event: str,
+    now: Optional[float] = None,
+) -> Verdict:
+    now = time.time() if now is None else now
+    limits = dict(DEFAULT_LIMITS, **limits)
+    action = limits["on_budget"] if limits["on_budget"] in ACTIONS else "wrap_up"
+    elapsed = now - float(state.get("timestamp", now))
+    grown = None if transcript_size is None else transcript_size - int(state.get("context_size", {}).get("characters", 0))
+    detail: Dict[str, Any] = {"event": event, "wall_sec": round(elapsed, 1), "transcript_bytes": grown}
+
+    reason = None
+    if float(limits["max_stage_sec"] or 0) > 0 and elapsed >= float(limits["max_stage_sec"]):
+        reason = "wall"
+    elif int(limits["max_stage_bytes"] or 0) > 0 and grown is not None and grown >= int(limits["max_stage_bytes"]):
+        reason = "bytes"
+    elif int(limits["max_stage_tool_calls"] or 0) > 0:
+        calls = tool_calls()
+        detail["tool_calls"] = calls
+        if calls is not None and calls >= int(limits["max_stage_tool_calls"]):
+            reason = "tool_calls"
+    if reason is None:
+        return Verdict("ok", None, detail)
+
+    asked = state.get("budget") or {}
+    if asked:
+        # A wrap-up or handoff was already requested: give Claude the grace period.
+        waited = now - float(asked.get("epoch", now))
+        detail["since_request_sec"] = round(waited, 1)
+        if event == "Stop" or waited >= float(limits["budget_grace_sec"]):
+            return Verdict("advance", asked.get("reason", reason), detail)
+        return Verdict("wait", asked.get("reason", reason), detail)
+    if event == "Stop" and action != "handoff":
+        return Verdict("advance", reason, detail)  # the turn is over; nothing to wrap up
+    return Verdict(action, reason, detail)
+
+
+def handoff_path(session_id: str, stage_index: int) -> str:
+    return f"{HANDOFF_DIR}/workflow_{session_id}_stage_{stage_index + 1}.md"
+
+
+_REASON_TEXT = {
+    "wall": "its time budget",
+    "bytes": "its context budget",
+    "tool_calls": "its tool-call budget",
+}
+
+
+def prompt(verdict: Verdict, stage: str, path: str) -> str:
+    """The message injected for a wrap_up or handoff verdict."""
+    spent = _REASON_TEXT.get(verdict.reason or "", "its budget")
+    if verdict.action == "handoff":
+        return (
+            f"/plan stage {stage} has used {spent}. stop starting new work. write a handoff summary of this "
+            f"stage to {path}: what was done, what remains, the files involved and any open problems. "
+            "then end your turn; the next stage continues from that file."
+        )
+    return (
+        f"/plan stage {stage} has used {spent}. stop starting new work: finish or park what is in progress, "
+        "leave the project in a consistent state, update the plan with what remains, then end your turn."
+    )
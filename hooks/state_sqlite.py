@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+state_sqlite.py — SQLite workflow state store for multiworkflow.py
+
+Enable with CC_HOOK_STATE_BACKEND=sqlite. One WAL-mode database per user/host
+(CC_HOOK_STATE_DB, default ~/.claude/multiworkflow_state.db) holds one row per
+(project_dir, session_id). Stage advances are compare-and-swap updates inside an
+IMMEDIATE transaction, so concurrent hook processes never double-advance and no
+per-project lock files are needed.
+
+CLI:
+    python3 state_sqlite.py list [--workflow TRIGGER]
+    python3 state_sqlite.py gc [--ttl-hours N]     # delete stale rows, checkpoint WAL
+    python3 state_sqlite.py vacuum
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+BUSY_TIMEOUT_SEC = 5.0
+DEFAULT_RETENTION_SEC = 7 * 24 * 3600.0  # rows untouched this long are abandoned sessions
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS workflow_state (
+    project_dir   TEXT    NOT NULL,
+    session_id    TEXT    NOT NULL,
+    workflow_type TEXT,
+    stage_index   INTEGER,
+    generation    INTEGER NOT NULL,
+    updated_at    REAL    NOT NULL,
+    state         TEXT    NOT NULL,
+    PRIMARY KEY (project_dir, session_id)
+);
+CREATE INDEX IF NOT EXISTS idx_workflow_state_session ON workflow_state (session_id);
+CREATE INDEX IF NOT EXISTS idx_workflow_state_workflow ON workflow_state (workflow_type, updated_at);
+CREATE INDEX IF NOT EXISTS idx_workflow_state_updated ON workflow_state (updated_at);
+"""
+
+_STORES: Dict[str, "SqliteStateStore"] = {}
+
+
+def open_store(db_path: str) -> "SqliteStateStore":
+    """Return a cached store per path (the daemon reuses one connection across events and threads)."""
+    store = _STORES.get(db_path)
+    if store is None:
+        store = _STORES[db_path] = SqliteStateStore(db_path)
+    return store
+
+
+class SqliteStateStore:
+    def __init__(self, db_path: str) -> None:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        # isolation_level=None: autocommit; transactions are opened explicitly below.
+        # The daemon's handler threads share the connection, one statement or
+        # transaction at a time under _lock.
+        self.conn = sqlite3.connect(
+            db_path, timeout=BUSY_TIMEOUT_SEC, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    # ------------------------------ Rows --------------------------------
+
+    @staticmethod
+    def _decode(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        state = json.loads(row[1])
+        state["generation"] = row[0]
+        return state
+
+    def get(self, project_dir: str, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT generation, state FROM workflow_state WHERE project_dir = ? AND session_id = ?",
+                (project_dir, session_id),
+            ).fetchone()
+            return self._decode(row)
+
+    def updated_at(self, project_dir: str, session_id: str) -> Optional[float]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT updated_at FROM workflow_state WHERE project_dir = ? AND session_id = ?",
+                (project_dir, session_id),
+            ).fetchone()
+            return row[0] if row else None
+
+    def compare_and_swap(
+        self,
+        project_dir: str,
+        session_id: str,
+        resolve: Callable[[Optional[Dict[str, Any]]], Optional[Dict[str, Any]]],
+    ) -> Optional[Dict[str, Any]]:
+        """Atomically read the stored row, let resolve() decide, and write its result.
+
+        resolve gets the current stored state (or None) and returns the record to store,
+        with its new "generation" set, or None to abort. Returns what was written.
+        """
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                row = cur.execute(
+                    "SELECT generation, state FROM workflow_state WHERE project_dir = ? AND session_id = ?",
+                    (project_dir, session_id),
+                ).fetchone()
+                new = resolve(self._decode(row))
+                if new is None:
+                    cur.execute("ROLLBACK")
+                    return None
+                cur.execute(
+                    "INSERT OR REPLACE INTO workflow_state "
+                    "(project_dir, session_id, workflow_type, stage_index, generation, updated_at, state) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        project_dir,
+                        session_id,
+                        new.get("workflow_type"),
+                        new.get("stage_index"),
+                        int(new.get("generation", 0)),
+                        time.time(),
+                        json.dumps(new, separators=(",", ":")),
+                    ),
+                )
+                cur.execute("COMMIT")
+                return new
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+
+    def delete(self, project_dir: str, session_id: str) -> None:
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM workflow_state WHERE project_dir = ? AND session_id = ?",
+                (project_dir, session_id),
+            )
+
+    # ----------------------------- Queries ------------------------------
+
+    def list_sessions(self, workflow_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            sql = "SELECT project_dir, session_id, workflow_type, stage_index, generation, updated_at FROM workflow_state"
+            args: tuple = ()
+            if workflow_type:
+                sql += " WHERE workflow_type = ?"
+                args = (workflow_type,)
+            sql += " ORDER BY updated_at DESC"
+            cols = ("project_dir", "session_id", "workflow_type", "stage_index", "generation", "updated_at")
+            return [dict(zip(cols, row)) for row in self.conn.execute(sql, args)]
+
+    # ---------------------------- Retention -----------------------------
+
+    def gc(self, max_age_sec: float = DEFAULT_RETENTION_SEC) -> int:
+        """Delete rows not updated within max_age_sec and truncate the WAL."""
+        with self._lock:
+            cur = self.conn.execute(
+                "DELETE FROM workflow_state WHERE updated_at < ?", (time.time() - max_age_sec,)
+            )
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            return cur.rowcount
+
+    def vacuum(self) -> None:
+        with self._lock:
+            self.conn.execute("VACUUM")
+
+
+# ------------------------------ CLI --------------------------------------
+
+
+def main() -> None:
+    db_path = os.getenv("CC_HOOK_STATE_DB") or os.path.join(
+        os.path.expanduser("~"), ".claude", "multiworkflow_state.db"
+    )
+    args = sys.argv[1:]
+    cmd = args[0] if args else "list"
+    store = open_store(db_path)
+
+    if cmd == "list":
+        wf = args[2] if len(args) == 3 and args[1] == "--workflow" else None
+        now = time.time()
+        for row in store.list_sessions(wf):
+            age = int(now - row["updated_at"])
+            print(
+                f"{row['session_id']}  {row['workflow_type']}  stage={row['stage_index']}  "
+                f"gen={row['generation']}  age={age}s  {row['project_dir']}"
+            )
+    elif cmd == "gc":
+        ttl = DEFAULT_RETENTION_SEC
+        if len(args) == 3 and args[1] == "--ttl-hours":
+            ttl = float(args[2]) * 3600.0
+        print(f"removed {store.gc(ttl)} stale session(s)")
+    elif cmd == "vacuum":
+        store.vacuum()
+        print(f"vacuumed {db_path}")
+    else:
+        print("Usage: state_sqlite.py list [--workflow TRIGGER] | gc [--ttl-hours N] | vacuum")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+"""
+transcript_index.py — streaming JSONL transcript index for multiworkflow.py
+
+Keeps a compact sidecar index per session next to the workflow state file:
+- <name>.json   summary: consumed offset, inode, every [WF:...] token (first/last offset),
+                and per-stage byte/message/estimated-token/tool-call totals. Small: O(stages).
+- <name>.jsonl  append-only message log: [offset, role, [tokens...]] per transcript line.
+
+refresh() reads only complete lines appended since the last call, so per-event cost
+depends on new transcript bytes. Lines are not JSON-decoded on the hot path: roles are
+read from the line prefix and tokens are found with a byte regex. A new index can start
+at a floor offset (the workflow's start), so the session history before it is skipped.
+
+TranscriptView maps a transcript read-only for queries over the whole history: byte and
+regex searches, and line scans backwards from the end, with no decoding and flat RSS
+(pages are faulted in by the kernel, not copied into Python strings).
+
+CLI:
+    python3 transcript_index.py <transcript.jsonl> [--index PATH_WITHOUT_SUFFIX]
+    python3 transcript_index.py <transcript.jsonl> --acks [SESSION_ID]   # every stage token, via mmap
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import re
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+INDEX_VERSION = 2
+READ_CHUNK_BYTES = 1_048_576
+ROLE_PROBE_BYTES = 4_096  # role/type keys precede message content in CLI transcripts
+BYTES_PER_TOKEN = 4  # rough estimate; good enough for relative stage sizes
+VIEW_WINDOW_BYTES = 16 * 1_048_576
+VIEW_MAX_MATCH_BYTES = 4_096  # regex matches spanning a window edge are found up to this long
+
+TOKEN_RE = re.compile(rb"\[WF:[^\]\s:]+:\d+:[^\]\s]+\]")
+_ROLE_RE = re.compile(rb'"role"\s*:\s*"(\w+)"')
+_TYPE_RE = re.compile(rb'"type"\s*:\s*"(\w+)"')
+_TOOL_USE_RE = re.compile(rb'"type"\s*:\s*"tool_use"')
+
+PREAMBLE = ""  # stage key for bytes seen before the first token
+
+
+def iter_jsonl_lines(
+    path: str, start: int = 0
+) -> Iterator[Tuple[int, bytes]]:
+    """Yield (offset, raw_line) for each complete line from start; partial tail is left."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        offset = start
+        parts: List[bytes] = []
+        while True:
+            chunk = f.read(READ_CHUNK_BYTES)
+            if not chunk:
+                return
+            pos = 0
+            while True:
+                nl = chunk.find(b"\n", pos)
+                if nl < 0:
+                    parts.append(chunk[pos:])
+                    break
+                parts.append(chunk[pos:nl])
+                line = b"".join(parts)
+                parts = []
+                yield offset, line
+                offset += len(line) + 1
+                pos = nl + 1
+
+
+def iter_jsonl_records(path: str, start: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Yield (offset, record) for each decodable JSON line. Slow path for tools/CLI."""
+    for offset, line in iter_jsonl_lines(path, start):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(record, dict):
+            yield offset, record
+
+
+def line_role(line: bytes) -> str:
+    head = line[:ROLE_PROBE_BYTES]
+    m = _ROLE_RE.search(head) or _TYPE_RE.search(head)
+    return m.group(1).decode("ascii", "ignore") if m else "unknown"
+
+
+def _new_summary(inode: int) -> Dict[str, Any]:
+    return {
+        "version": INDEX_VERSION,
+        "inode": inode,
+        "offset": 0,
+        "messages": 0,
+        "current_stage": PREAMBLE,
+        "tokens": {},  # token -> [first_offset, last_offset]
+        "stages": {PREAMBLE: _new_stage(0)},
+    }
+
+
+def _new_stage(start: int) -> Dict[str, int]:
+    return {"start": start, "bytes": 0, "messages": 0, "est_tokens": 0, "tool_calls": 0}
+
+
+class TranscriptView:
+    """Read-only memory map of a transcript. Use as a context manager.
+
+    Scans walk the map in VIEW_WINDOW_BYTES windows and drop the pages behind them
+    (MADV_DONTNEED), so resident memory stays near one window for any file size.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._fh = open(path, "rb")
+        self.size = os.fstat(self._fh.fileno()).st_size
+        # An empty file cannot be mapped; an empty bytes object answers every query.
+        self.buf: Any = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+
+    def __enter__(self) -> "TranscriptView":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self.buf, mmap.mmap):
+            self.buf.close()
+        self._fh.close()
+
+    def _release(self, start: int, end: int) -> None:
+        if not isinstance(self.buf, mmap.mmap) or not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        start -= start % mmap.PAGESIZE
+        end = min(end, self.size)
+        if end > start:
+            self.buf.madvise(mmap.MADV_DONTNEED, start, end - start)
+
+    def find(self, needle: bytes, start: int = 0, end: Optional[int] = None) -> int:
+        end = self.size if end is None else min(end, self.size)
+        pos = start
+        while pos < end:
+            stop = min(end, pos + VIEW_WINDOW_BYTES + len(needle) - 1)
+            found = self.buf.find(needle, pos, stop)
+            self._release(pos, stop)
+            if found >= 0:
+                return found
+            pos += VIEW_WINDOW_BYTES
+        return -1
+
+    def rfind(self, needle: bytes, start: int = 0, end: Optional[int] = None) -> int:
+        limit = stop = self.size if end is None else min(end, self.size)
+        while stop > start:
+            pos = max(start, stop - VIEW_WINDOW_BYTES)
+            found = self.buf.rfind(needle, pos, min(limit, stop + len(needle) - 1))
+            self._release(pos, stop)
+            if found >= 0:
+                return found
+            stop = pos
+        return -1
+
+    def count(self, needle: bytes, start: int = 0) -> int:
+        n, pos = 0, self.find(needle, start)
+        while pos >= 0:
+            n += 1
+            pos = self.find(needle, pos + len(needle))
+        return n
+
+    def finditer(self, pattern: "re.Pattern[bytes]", start: int = 0) -> Iterator[Tuple[int, bytes]]:
+        """Non-overlapping matches no longer than VIEW_MAX_MATCH_BYTES, in file order."""
+        pos = start
+        while pos < self.size:
+            window_end = pos + VIEW_WINDOW_BYTES
+            next_pos = window_end
+            for m in pattern.finditer(self.buf, pos, min(self.size, window_end + VIEW_MAX_MATCH_BYTES)):
+                if m.start() >= window_end:
+                    break
+                next_pos = max(next_pos, m.end())
+                yield m.start(), m.group(0)
+            self._release(pos, window_end)
+            pos = next_pos
+
+    def line_start(self, offset: int) -> int:
+        """Offset of the first byte of the line containing offset."""
+        return self.rfind(b"\n", 0, min(offset, self.size)) + 1
+
+    def lines_reversed(self, end: Optional[int] = None) -> Iterator[Tuple[int, bytes]]:
+        """Yield (offset, line) for complete lines ending at or before end, last first."""
+        stop = self.rfind(b"\n", 0, self.size if end is None else end)  # drops a partial tail
+        while stop >= 0:
+            begin = self.rfind(b"\n", 0, stop) + 1
+            yield begin, self.buf[begin:stop]
+            stop = begin - 1
+
+    def stage_acks(self, session_id: str = "", start: int = 0) -> Dict[str, List[int]]:
+        """Every [WF:...] token (optionally for one session): [first, last, occurrences]."""
+        found: Dict[str, List[int]] = {}
+        suffix = f":{session_id}]".encode() if session_id else b""
+        for offset, raw in self.finditer(TOKEN_RE, start):
+            if suffix and not raw.endswith(suffix):
+                continue
+            span = found.setdefault(raw.decode("utf-8", "ignore"), [offset, offset, 0])
+            span[1] = offset
+            span[2] += 1
+        return found
+
+
+class TranscriptIndex:
+    """Incrementally maintained index of one transcript; base_path has no suffix.
+
+    With persist=False the index lives only in this object: nothing is read from or
+    written to base_path, and messages() yields nothing. For in-process drivers that
+    keep one instance per transcript (workflow_sim.py).
+    """
+
+    def __init__(self, transcript_path: str, base_path: str, persist: bool = True) -> None:
+        self.transcript_path = transcript_path
+        self.summary_path = base_path + ".json"
+        self.log_path = base_path + ".jsonl"
+        self.persist = persist
+        self.summary: Dict[str, Any] = _new_summary(0)
+
+    # ------------------------------ Queries -----------------------------
+
+    def token_offsets(self, token: str) -> Optional[Tuple[int, int]]:
+        span = self.summary["tokens"].get(token)
+        return (span[0], span[1]) if span else None
+
+    def stage_stats(self, token: str) -> Optional[Dict[str, int]]:
+        return self.summary["stages"].get(token)
+
+    def messages(self) -> Iterator[Tuple[int, str, List[str]]]:
+        """Stream (offset, role, tokens) entries from the append-only message log."""
+        try:
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        offset, role, tokens = json.loads(line)
+                    except ValueError:
+                        continue
+                    yield offset, role, tokens
+        except OSError:
+            return
+
+    # ------------------------------ Updates -----------------------------
+
+    def load(self) -> "TranscriptIndex":
+        if not self.persist:
+            return self
+        try:
+            with open(self.summary_path, "r", encoding="utf-8") as f:
+                summary = json.load(f)
+            if summary.get("version") == INDEX_VERSION:
+                self.summary = summary
+        except (OSError, ValueError):
+            pass
+        return self
+
+    def refresh(self, floor: int = 0) -> "TranscriptIndex":
+        """Index complete lines appended since the last refresh (locked, crash-safe).
+
+        A fresh index starts at the line containing floor instead of the top of the file.
+        """
+        try:
+            tst = os.stat(self.transcript_path)
+        except OSError:
+            return self.load()
+        if not self.persist:
+            self._update(tst, floor, None)
+            return self
+
+        with open(self.log_path, "ab") as log_fh:
+            _lock(log_fh)
+            try:
+                self.load()
+                if self._update(tst, floor, log_fh):
+                    _write_json(self.summary_path, self.summary)
+            finally:
+                _unlock(log_fh)
+        return self
+
+    def _update(self, tst: os.stat_result, floor: int, log_fh: Any) -> bool:
+        """Index the new lines into self.summary (and log_fh); True if any were added."""
+        summary = self.summary
+        if summary["inode"] != tst.st_ino or tst.st_size < summary["offset"]:
+            summary = self.summary = _new_summary(tst.st_ino)
+            if log_fh is not None:
+                log_fh.truncate(0)
+        if summary["offset"] == 0 and 0 < floor <= tst.st_size:
+            with TranscriptView(self.transcript_path) as view:
+                summary["offset"] = summary["stages"][PREAMBLE]["start"] = view.line_start(floor)
+        if tst.st_size == summary["offset"]:
+            return False
+
+        entries: List[bytes] = []
+        for offset, line in iter_jsonl_lines(self.transcript_path, summary["offset"]):
+            entries.append(self._index_line(offset, line))
+            summary["offset"] = offset + len(line) + 1
+        if entries and log_fh is not None:
+            log_fh.write(b"".join(entries))
+            log_fh.flush()
+        return bool(entries)
+
+    def _index_line(self, offset: int, line: bytes) -> bytes:
+        summary = self.summary
+        tokens = [t.decode("utf-8", "ignore") for t in TOKEN_RE.findall(line)]
+        for token in tokens:
+            span = summary["tokens"].setdefault(token, [offset, offset])
+            span[1] = offset
+            if token not in summary["stages"]:
+                summary["stages"][token] = _new_stage(offset)
+            summary["current_stage"] = token
+
+        size = len(line) + 1
+        stage = summary["stages"][summary["current_stage"]]
+        stage["bytes"] += size
+        stage["messages"] += 1
+        stage["est_tokens"] += size // BYTES_PER_TOKEN
+        stage["tool_calls"] += len(_TOOL_USE_RE.findall(line))
+        summary["messages"] += 1
+        if not self.persist:
+            return b""
+
+        role = line_role(line)
+        return (json.dumps([offset, role, tokens], separators=(",", ":")) + "\n").encode()
+
+    def remove(self) -> None:
+        self.summary = _new_summary(0)
+        if not self.persist:
+            return
+        for p in (self.summary_path, self.log_path):
+            try:
+                os.unlink(p)
+            except OSError:
+                pass
+
+
+def _write_json(path: str, obj: Any) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps(obj, separators=(",", ":")))  # dumps() uses the C encoder; dump() does not
+    os.replace(tmp, path)
+
+
+def _lock(fh: Any) -> None:
+    try:
+        import fcntl  # type: ignore
+
+        fcntl.flock(fh, fcntl.LOCK_EX)
+    except Exception:
+        pass
+
+
+def _unlock(fh: Any) -> None:
+    try:
+        import fcntl  # type: ignore
+
+        fcntl.flock(fh, fcntl.LOCK_UN)
+    except Exception:
+        pass
+
+
+# ------------------------------ CLI --------------------------------------
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    if not args or args[0] in ("-h", "--help"):
+        print("Usage: transcript_index.py <transcript.jsonl> [--index PATH_WITHOUT_SUFFIX | --acks [SESSION_ID]]")
+        sys.exit(0 if args else 1)
+    transcript = args[0]
+    if len(args) in (2, 3) and args[1] == "--acks":
+        with TranscriptView(transcript) as view:
+            for token, (first, last, n) in view.stage_acks(args[2] if len(args) == 3 else "").items():
+                print(f"{token}  first@{first:,}  last@{last:,}  x{n}")
+        return
+    base = transcript + ".index"
+    if len(args) == 3 and args[1] == "--index":
+        base = args[2]
+    index = TranscriptIndex(transcript, base).refresh()
+    s = index.summary
+    print(f"transcript: {transcript}")
+    print(f"indexed: {s['offset']:,} bytes, {s['messages']:,} messages")
+    for token, stats in s["stages"].items():
+        label = token or "(before first stage)"
+        span = s["tokens"].get(token)
+        ack = f"ack@{span[0]:,}" if span else "-"
+        print(
+            f"{label}  {ack}  {stats['bytes']:,} bytes  "
+            f"{stats['messages']:,} msgs  ~{stats['est_tokens']:,} tokens  "
+            f"{stats.get('tool_calls', 0):,} tool calls"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+workflow_events.py — push-based progress events for workflows
+
+multiworkflow.py (stage starts, reinjects, workflow ends) and the container sequence
+runners (status changes, stage and conversation boundaries) publish one JSON object per
+line instead of leaving operators to poll workflow_status.txt / workflow_log.txt or
+scrape stderr:
+- to CC_HOOK_EVENTS_SOCKET (default ~/.claude/multiworkflow_events.sock) when a
+  subscriber is there: a bound Unix datagram socket (one datagram per event) or a FIFO
+  opened for reading. Sends never block; with no subscriber, or a subscriber that has
+  fallen behind, the event is dropped from the stream but still logged;
+- to CC_HOOK_EVENTS_LOG (default ~/.claude/multiworkflow_events.jsonl) through a
+  buffered writer: lines are collected and appended with one O_APPEND write per flush
+  (per hook event; every FLUSH_SEC or FLUSH_BYTES in the runners). Past
+  CC_HOOK_EVENTS_MAX_MB (default 16) the log is rotated to .1 .. .CC_HOOK_EVENTS_KEEP
+  (default 3) under a lock.
+CC_HOOK_EVENTS=off disables both. ~/.claude is bind-mounted into every container, so one
+subscriber on a Linux host sees every container's events; "host" tells them apart.
+(Docker Desktop does not carry Unix sockets across bind mounts; use `follow` there.)
+
+Every record has v, ts, seq, host, pid, source ("hook" or "runner") and type, plus:
+    stage_start       workflow, workflow_name, stage, stage_index, stages, phase, context_bytes
+    reinject          workflow, stage, stage_index, attempt, since_last_sec, event
+    workflow_end      workflow, stage, stage_index, outcome
+    budget            workflow, stage, stage_index, action, reason, detail (stage_budget.py)
+    runner_status     workflow, status, stage, details    (STARTED/COMPLETED/FAILED for prompts)
+    runner_stage_end  workflow, stage, stage_num, seconds (a conversation, for prompts)
+and session_id / project_dir where known.
+
+CLI:
+    python3 workflow_events.py subscribe [--socket PATH] [--type T,...]   # bind and print
+    python3 workflow_events.py follow [--log PATH] [--type T,...] [--from-start]
+"""
+
+from __future__ import annotations
+
+import atexit
+import itertools
+import json
+import os
+import socket
+import stat
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+ENABLED = os.getenv("CC_HOOK_EVENTS", "on").strip().lower() not in ("0", "off", "false", "no")
+SOCKET_PATH = os.getenv("CC_HOOK_EVENTS_SOCKET") or os.path.join(
+    os.path.expanduser("~"), ".claude", "multiworkflow_events.sock"
+)
+LOG_PATH = os.getenv("CC_HOOK_EVENTS_LOG") or os.path.join(
+    os.path.expanduser("~"), ".claude", "multiworkflow_events.jsonl"
+)
+MAX_BYTES = int(float(os.getenv("CC_HOOK_EVENTS_MAX_MB", "16")) * 1024 * 1024)
+KEEP = max(1, int(os.getenv("CC_HOOK_EVENTS_KEEP", "3")))
+FLUSH_BYTES = 64 * 1024
+FLUSH_SEC = 1.0
+MAX_DATAGRAM = 60 * 1024  # larger events go to the log only
+PIPE_BUF = 4096  # FIFO writes up to this size are atomic
+VERSION = 1
+
+
+def _off(path: str) -> bool:
+    return path.strip().lower() in ("", "off", "0", "false")
+
+
+# ------------------------------ Log file ----------------------------------
+
+
+class RotatingLog:
+    """Append-only JSONL file written in batches and rotated by size.
+
+    The file is opened per flush, so any number of processes can share it; the rename
+    chain runs under <path>.lock and re-checks the size, so concurrent writers rotate once.
+    Threads of one process (the daemon's handlers) share the buffer under _lock.
+    """
+
+    def __init__(self, path: str, max_bytes: int = MAX_BYTES, keep: int = KEEP) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self._buf: List[bytes] = []
+        self._size = 0
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, line: bytes) -> None:
+        with self._lock:
+            self._buf.append(line)
+            self._size += len(line)
+
+    def due(self) -> bool:
+        return self._size >= FLUSH_BYTES or (bool(self._buf) and time.monotonic() - self._flushed >= FLUSH_SEC)
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flushed = time.monotonic()
+            if not self._buf:
+                return
+            payload, self._buf, self._size = b"".join(self._buf), [], 0
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, payload)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > self.max_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        lock = open(self.path + ".lock", "a+")
+        try:
+            try:
+                import fcntl  # type: ignore
+
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            except Exception:
+                pass
+            try:
+                if os.path.getsize(self.path) <= self.max_bytes:
+                    return  # another writer rotated first
+            except OSError:
+                return
+            for n in range(self.keep - 1, 0, -1):
+                try:
+                    os.replace(f"{self.path}.{n}", f"{self.path}.{n + 1}")
+                except FileNotFoundError:
+                    pass
+            os.replace(self.path, f"{self.path}.1")
+        finally:
+            lock.close()
+
+
+# ------------------------------ Publisher ---------------------------------
+
+
+class EventStream:
+    """Publishes events to the subscriber socket/FIFO and the rotating log."""
+
+    def __init__(
+        self, source: str, socket_path: str = SOCKET_PATH, log_path: str = LOG_PATH, **defaults: Any
+    ) -> None:
+        self.source = source
+        self.socket_path = "" if _off(socket_path) else socket_path
+        self.log = None if _off(log_path) else RotatingLog(log_path)
+        self.defaults = defaults
+        self.dropped = 0  # events a subscriber existed for but could not take
+        self._seq = itertools.count(1)
+        self._sock: Optional[socket.socket] = None
+        self._host = socket.gethostname()
+
+    def emit(self, type: str, **fields: Any) -> None:
+        record = {
+            "v": VERSION,
+            "ts": round(time.time(), 3),
+            "seq": next(self._seq),  # atomic, so threads never share a number
+            "host": self._host,
+            "pid": os.getpid(),
+            "source": self.source,
+            "type": type,
+            **self.defaults,
+            **fields,
+        }
+        line = (json.dumps(record, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+        try:
+            self._send(line)
+        except OSError:
+            pass
+        if self.log is not None:
+            self.log.write(line)
+            if self.log.due():
+                self.flush()
+
+    def flush(self) -> None:
+        if self.log is not None:
+            try:
+                self.log.flush()
+            except OSError as e:
+                print(f"workflow_events: cannot write {self.log.path}: {e}", file=sys.stderr)
+
+    def close(self) -> None:
+        self.flush()
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _send(self, line: bytes) -> None:
+        if not self.socket_path:
+            return
+        try:
+            mode = os.stat(self.socket_path).st_mode
+        except OSError:
+            return  # nobody subscribed
+        if stat.S_ISFIFO(mode):
+            self._send_fifo(line)
+        elif stat.S_ISSOCK(mode) and len(line) <= MAX_DATAGRAM:
+            if self._sock is None:
+                self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                self._sock.setblocking(False)
+            try:
+                self._sock.sendto(line, self.socket_path)
+            except (BlockingIOError, InterruptedError):
+                self.dropped += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                pass  # stale socket file left by a subscriber that exited
+
+    def _send_fifo(self, line: bytes) -> None:
+        if len(line) > PIPE_BUF:
+            return  # would not be atomic next to other writers
+        try:
+            fd = os.open(self.socket_path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError:
+            return  # ENXIO: no reader
+        try:
+            os.write(fd, line)
+        except BlockingIOError:
+            self.dropped += 1
+        finally:
+            os.close(fd)
+
+
+_streams: Dict[str, EventStream] = {}
+
+
+def stream(source: str = "hook") -> Optional[EventStream]:
+    """The process-wide stream for `source`, or None when events are disabled."""
+    if not ENABLED:
+        return None
+    if source not in _streams:
+        if not _streams:
+            atexit.register(flush)  # whatever a caller did not flush itself
+        _streams[source] = EventStream(source)
+    return _streams[source]
+
+
+def emit(type: str, source: str = "hook", **fields: Any) -> None:
+    s = stream(source)
+    if s is not None:
+        s.emit(type, **fields)
+
+
+def flush() -> None:
+    for s in _streams.values():
+        s.flush()
+
+
+# ------------------------------ Subscriber --------------------------------
+
+
+def _types(text: Optional[str]) -> Set[str]:
+    return {t.strip() for t in (text or "").split(",") if t.strip()}
+
+
+def _print(line: bytes, types: Set[str]) -> None:
+    if types:
+        try:
+            if json.loads(line).get("type") not in types:
+                return
+        except ValueError:
+            return
+    sys.stdout.buffer.write(line if line.endswith(b"\n") else line + b"\n")
+    sys.stdout.flush()
+
+
+def subscribe(path: str, types: Set[str]) -> None:
+    """Bind the datagram socket publishers send to and print each event as it arrives."""
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)  # stale socket from an earlier subscriber
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(path)
+    try:
+        while True:
+            _print(sock.recv(MAX_DATAGRAM), types)
+    finally:
+        sock.close()
+        os.unlink(path)
+
+
+def follow(path: str, types: Set[str], from_start: bool = False) -> None:
+    """Tail the log, reopening it when it is rotated."""
+    fh = None
+    inode = None
+    while True:
+        if fh is None:
+            try:
+                fh = open(path, "rb")
+            except FileNotFoundError:
+                from_start = True  # whatever gets created is new
+                time.sleep(0.5)
+                continue
+            inode = os.fstat(fh.fileno()).st_ino
+            if not from_start:
+                fh.seek(0, os.SEEK_END)
+            from_start = True  # files opened after a rotation are read from the top
+        line = fh.readline()
+        if line.endswith(b"\n"):
+            _print(line, types)
+            continue
+        fh.seek(-len(line), os.SEEK_CUR)
+        time.sleep(0.2)
+        try:
+            if os.stat(path).st_ino != inode:
+                for rest in fh:
+                    _print(rest, types)
+                fh.close()
+                fh = None
+        except FileNotFoundError:
+            pass
+
+
+USAGE = (
+    "Usage: workflow_events.py subscribe [--socket PATH] [--type T,...] | "
+    "follow [--log PATH] [--type T,...] [--from-start]"
+)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    cmd = args.pop(0) if args else ""
+    opts: Dict[str, Any] = {"--socket": SOCKET_PATH, "--log": LOG_PATH, "--type": None, "--from-start": False}
+    while args:
+        arg = args.pop(0)
+        if arg == "--from-start":
+            opts[arg] = True
+        elif arg in opts and args:
+            opts[arg] = args.pop(0)
+        else:
+            print(USAGE, file=sys.stderr)
+            return 1
+    try:
+        if cmd == "subscribe":
+            subscribe(opts["--socket"], _types(opts["--type"]))
+        elif cmd == "follow":
+            follow(opts["--log"], _types(opts["--type"]), opts["--from-start"])
+        else:
+            print(USAGE, file=sys.stderr)
+            return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
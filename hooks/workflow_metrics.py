@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+workflow_metrics.py — structured telemetry for multiworkflow.py
+
+Two record kinds are appended, one JSON object per line, to CC_HOOK_METRICS
+(default ~/.claude/multiworkflow_metrics.jsonl; set it to "off" to disable). The file
+is a workflow_events.RotatingLog: past CC_HOOK_METRICS_MAX_MB (default 16) it is
+rotated to .1 .. .CC_HOOK_METRICS_KEEP (default 3), so it stays bounded however many
+runs it records.
+- "event": one per hook event while a workflow is active. Handler latency in ms, split
+           into state_io / transcript_scan / emit, plus the outcome (start, advance,
+           complete, reinject, continue, race, wrap_up, handoff), the reinject reason
+           if any, and the stage_budget.py verdict of a stage over budget.
+- "stage": one per finished stage. Wall time, transcript bytes and tool calls added
+           during the stage (null when the transcript index has no record of the
+           stage), and how often it was reinjected.
+
+If CC_HOOK_METRICS_TEXTFILE is set, running totals are also written there in the
+OpenMetrics text format, for node_exporter's textfile collector. The totals live in
+<textfile>.state.json and the .prom file is replaced atomically.
+
+CLI:
+    python3 workflow_metrics.py [METRICS_JSONL]     # per-stage summary, rotated files included
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+from typing import Any, Dict, Iterable, List, Tuple
+
+METRICS_PATH = os.getenv("CC_HOOK_METRICS") or os.path.join(
+    os.path.expanduser("~"), ".claude", "multiworkflow_metrics.jsonl"
+)
+MAX_BYTES = int(float(os.getenv("CC_HOOK_METRICS_MAX_MB", "16")) * 1024 * 1024)
+KEEP = max(1, int(os.getenv("CC_HOOK_METRICS_KEEP", "3")))
+TEXTFILE_PATH = os.getenv("CC_HOOK_METRICS_TEXTFILE", "")
+
+
+def enabled() -> bool:
+    return METRICS_PATH.strip().lower() not in ("", "off", "0", "false")
+
+
+def append(records: List[Dict[str, Any]]) -> None:
+    """Append records with one O_APPEND write (rotating by size), then update the textfile totals."""
+    if not records:
+        return
+    if enabled():
+        from workflow_events import RotatingLog
+
+        log = RotatingLog(METRICS_PATH, MAX_BYTES, KEEP)
+        for r in records:
+            log.write((json.dumps(r, separators=(",", ":")) + "\n").encode("utf-8"))
+        log.flush()
+    if TEXTFILE_PATH:
+        _update_textfile(records)
+
+
+# ------------------------------ OpenMetrics -------------------------------
+
+_Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+_HELP = {
+    "multiworkflow_hook_events": ("counter", "Hook events handled while a workflow was active."),
+    "multiworkflow_hook_latency_seconds": ("counter", "Total hook handler latency."),
+    "multiworkflow_stage_completions": ("counter", "Stages finished."),
+    "multiworkflow_stage_seconds": ("counter", "Total wall time spent in stages."),
+    "multiworkflow_stage_transcript_bytes": ("counter", "Transcript bytes added during stages."),
+    "multiworkflow_reinjects": ("counter", "Stage prompts reinjected."),
+    "multiworkflow_reinjects_suppressed": ("counter", "Reinjects held back by reinject_policy."),
+    "multiworkflow_budget_actions": ("counter", "Wrap-ups, handoffs and forced advances of stages over budget."),
+}
+
+
+def _bump(totals: Dict[str, float], name: str, labels: Dict[str, Any], value: float) -> None:
+    key = json.dumps([name, sorted((k, str(v)) for k, v in labels.items())])
+    totals[key] = totals.get(key, 0.0) + value
+
+
+def _update_textfile(records: Iterable[Dict[str, Any]]) -> None:
+    state_path = TEXTFILE_PATH + ".state.json"
+    lock_fh = open(state_path + ".lock", "a+")
+    try:
+        try:
+            import fcntl  # type: ignore
+
+            fcntl.flock(lock_fh, fcntl.LOCK_EX)
+        except Exception:
+            pass
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                totals: Dict[str, float] = json.load(f)
+        except (OSError, ValueError):
+            totals = {}
+
+        for r in records:
+            wf = {"workflow": r.get("workflow") or ""}
+            if r["kind"] == "event":
+                labels = dict(wf, event=r["event"])
+                _bump(totals, "multiworkflow_hook_events", labels, 1)
+                _bump(totals, "multiworkflow_hook_latency_seconds", labels, r["latency_ms"]["total"] / 1000.0)
+                if r.get("outcome") == "reinject":
+                    _bump(
+                        totals,
+                        "multiworkflow_reinjects",
+                        dict(wf, stage=r.get("stage") or "", reason=r.get("reinject_reason") or ""),
+                        1,
+                    )
+                verdict = (r.get("reinject_decision") or {}).get("verdict")
+                if verdict and verdict != "reinject":
+                    _bump(
+                        totals,
+                        "multiworkflow_reinjects_suppressed",
+                        dict(wf, stage=r.get("stage") or "", reason=verdict),
+                        1,
+                    )
+                budget = r.get("budget_decision") or {}
+                if budget.get("action") in ("wrap_up", "handoff", "advance"):
+                    _bump(
+                        totals,
+                        "multiworkflow_budget_actions",
+                        dict(wf, stage=r.get("stage") or "", action=budget["action"], reason=budget.get("reason") or ""),
+                        1,
+                    )
+            elif r["kind"] == "stage":
+                labels = dict(wf, stage=r["stage"])
+                _bump(totals, "multiworkflow_stage_completions", labels, 1)
+                _bump(totals, "multiworkflow_stage_seconds", labels, r["wall_sec"])
+                if r.get("transcript_bytes") is not None:
+                    _bump(totals, "multiworkflow_stage_transcript_bytes", labels, r["transcript_bytes"])
+
+        tmp = state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(totals, f)
+        os.replace(tmp, state_path)
+        _write_prom(totals)
+    finally:
+        lock_fh.close()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _write_prom(totals: Dict[str, float]) -> None:
+    by_name: Dict[str, List[str]] = {}
+    for key, value in sorted(totals.items()):
+        name, labels = json.loads(key)
+        label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+        by_name.setdefault(name, []).append(f"{name}_total{{{label_text}}} {value:g}")
+    lines: List[str] = []
+    for name, samples in by_name.items():
+        kind, help_text = _HELP.get(name, ("counter", name))
+        lines += [f"# TYPE {name} {kind}", f"# HELP {name} {help_text}", *samples]
+    lines.append("# EOF")
+    tmp = TEXTFILE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp, TEXTFILE_PATH)
+
+
+# ------------------------------ CLI --------------------------------------
+
+
+def main() -> None:
+    path = sys.argv[1] if len(sys.argv) > 1 else METRICS_PATH
+    stages: Dict[Tuple[str, str], Dict[str, float]] = {}
+    events: Dict[str, List[float]] = {}
+    # Oldest rotation first; only the live file has to exist.
+    paths = [f"{path}.{n}" for n in range(KEEP, 0, -1) if os.path.exists(f"{path}.{n}")] + [path]
+    try:
+        for p in paths:
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        r = json.loads(line)
+                    except ValueError:
+                        continue
+                    if r.get("kind") == "stage":
+                        agg = stages.setdefault(
+                            (r.get("workflow", ""), r.get("stage", "")),
+                            {"n": 0, "wall": 0.0, "bytes": 0, "bytes_n": 0, "reinjects": 0},
+                        )
+                        agg["n"] += 1
+                        agg["wall"] += r.get("wall_sec", 0.0)
+                        if r.get("transcript_bytes") is not None:
+                            agg["bytes"] += r["transcript_bytes"]
+                            agg["bytes_n"] += 1
+                        agg["reinjects"] += r.get("reinjects", 0)
+                    elif r.get("kind") == "event":
+                        events.setdefault(r.get("event", ""), []).append(r["latency_ms"]["total"])
+    except OSError as e:
+        print(f"Cannot read {path}: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{'workflow':<12} {'stage':<14} {'runs':>5} {'avg wall s':>11} {'avg KB':>9} {'reinjects':>9}")
+    for (wf, stage), agg in sorted(stages.items(), key=lambda kv: -kv[1]["wall"]):
+        n = agg["n"]
+        kb = f"{agg['bytes'] / agg['bytes_n'] / 1024:.1f}" if agg["bytes_n"] else "-"
+        print(f"{wf:<12} {stage:<14} {n:>5} {agg['wall'] / n:>11.1f} {kb:>9} {int(agg['reinjects']):>9}")
+    for event, lat in sorted(events.items()):
+        lat.sort()
+        p50 = lat[len(lat) // 2]
+        p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+        print(f"{event}: {len(lat)} events, p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
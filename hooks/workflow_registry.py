@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+workflow_registry.py — declarative workflow definitions for multiworkflow.py
+
+Workflows are the built-ins from multiworkflow.py plus every *.json (and *.yaml/*.yml when
+PyYAML is installed) file in CC_HOOK_WORKFLOWS_DIR (default ~/.claude/workflows/). A file
+holds one definition or a list of them:
+
+    {
+      "trigger": "--review",
+      "name": "Code review",
+      "stages": ["read", "review"],
+      "prompts": {"read": "/plan ...", "review": "/plan ..."},
+      "phases": {"read": "🔍 Investigation", "review": "✅ Verification"},
+      "limits": {"max_reinjects": 4, "reinject_cooldown_sec": 2.0, "reinject_backoff": 2.0},
+      "stage_limits": {"review": {"max_reinjects": 2}},
+      "edges": {"read": [{"when": "no_tool_calls", "goto": "review"}]},
+      "branches": {"review": ["check tests", "check docs"]}
+    }
+
+"name" is optional and defaults to the trigger.
+
+"limits" and "stage_limits" take the reinject_policy.py keys: max_reinjects,
+reinject_cooldown_sec, reinject_backoff, reinject_max_cooldown_sec and
+reinject_min_growth_bytes; and the stage_budget.py keys: max_stage_sec,
+max_stage_bytes, max_stage_tool_calls, on_budget ("wrap_up", "handoff" or "advance")
+and budget_grace_sec. "limits" is the budget of every stage of the workflow.
+
+Stages form a forward-only graph (a DAG by construction). By default a stage advances to
+the next one; "edges" lists conditional jumps checked in order when the stage finishes:
+- "no_tool_calls": the stage produced no tool calls in the transcript;
+- "always": unconditional jump.
+A "goto" must name a later stage, so every workflow still terminates.
+
+"branches" turns a stage into a fan-out: its prompt asks Claude to run each branch as a
+parallel subagent and wait for all of them. SubagentStop never advances any stage; the
+main Stop event is the join.
+
+Definitions are compiled once per interpreter into a single trigger regex plus a
+per-stage table (prompt, phase, merged limits). The validated definitions are cached on
+disk in <dir>/.compiled.json, keyed by the (name, mtime_ns, size) of every definition
+file, so JSON/YAML parsing only reruns after an edit. Trigger matching is one regex
+search per prompt, regardless of how many workflows exist.
+
+CLI:
+    python3 workflow_registry.py            # list compiled workflows and their stages
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+WORKFLOWS_DIR = os.getenv("CC_HOOK_WORKFLOWS_DIR") or os.path.join(
+    os.path.expanduser("~"), ".claude", "workflows"
+)
+CACHE_NAME = ".compiled.json"
+CACHE_VERSION = 2
+DEFAULT_PROMPT = "/plan continue the current stage; maintain scope and do not regress."
+UNKNOWN_PHASE = "❓ Unknown"
+EDGE_CONDITIONS = ("always", "no_tool_calls")
+BUDGET_ACTIONS = ("wrap_up", "handoff", "advance")
+
+_DirKey = List[Tuple[str, int, int]]
+_REGISTRY_CACHE: Dict[str, Tuple[Any, "WorkflowRegistry"]] = {}
+
+
+class WorkflowRegistry:
+    """Compiled workflow set: one trigger matcher and a precomputed stage table."""
+
+    def __init__(
+        self,
+        workflows: Dict[str, Dict[str, Any]],
+        defaults: Dict[str, Any],
+    ) -> None:
+        # "name" is optional in a definition; the trigger stands in for it.
+        self.workflows = {t: wf if wf.get("name") else dict(wf, name=t) for t, wf in workflows.items()}
+        self.stage_table: Dict[str, List[Dict[str, Any]]] = {
+            trigger: _compile_stages(wf, defaults) for trigger, wf in workflows.items()
+        }
+        # Longest first so "--longrun-lite" wins over "--longrun" at the same position.
+        triggers = sorted(workflows, key=len, reverse=True)
+        self._matcher = re.compile("|".join(re.escape(t) for t in triggers)) if triggers else None
+
+    def match(self, content: str) -> Optional[str]:
+        """Return the trigger found earliest in content, if any."""
+        if self._matcher is None:
+            return None
+        m = self._matcher.search(content)
+        return m.group(0) if m else None
+
+    def stage(self, trigger: str, index: int) -> Dict[str, Any]:
+        return self.stage_table[trigger][index]
+
+
+def _compile_stages(wf: Dict[str, Any], defaults: Dict[str, Any]) -> List[Dict[str, Any]]:
+    prompts = wf.get("prompts", {})
+    phases = wf.get("phases", {})
+    base_limits = dict(defaults, **wf.get("limits", {}))
+    stage_limits = wf.get("stage_limits", {})
+    edges = wf.get("edges", {})
+    branches = wf.get("branches", {})
+    position = {name: i for i, name in enumerate(wf["stages"])}
+    return [
+        {
+            "name": name,
+            "prompt": prompts.get(name, DEFAULT_PROMPT),
+            "phase": phases.get(name, UNKNOWN_PHASE),
+            "limits": dict(base_limits, **stage_limits.get(name, {})),
+            "edges": [
+                {"when": e["when"], "goto": position[e["goto"]]} for e in edges.get(name, [])
+            ],
+            "branches": list(branches.get(name, [])),
+        }
+        for name in wf["stages"]
+    ]
+
+
+def _validate(defn: Any) -> Optional[str]:
+    if not isinstance(defn, dict):
+        return "definition must be an object"
+    if not isinstance(defn.get("trigger"), str) or not defn["trigger"].strip():
+        return "missing 'trigger'"
+    if "name" in defn and not isinstance(defn["name"], str):
+        return "'name' must be a string"
+    stages = defn.get("stages")
+    if not isinstance(stages, list) or not stages or not all(isinstance(s, str) for s in stages):
+        return "'stages' must be a non-empty list of names"
+    for key in ("prompts", "phases", "limits", "stage_limits", "edges", "branches"):
+        if key in defn and not isinstance(defn[key], dict):
+            return f"'{key}' must be an object"
+    if len(set(stages)) != len(stages):
+        return "stage names must be unique"
+    for limits in [defn.get("limits", {}), *defn.get("stage_limits", {}).values()]:
+        if not isinstance(limits, dict):
+            return "'stage_limits' values must be objects"
+        if "on_budget" in limits and limits["on_budget"] not in BUDGET_ACTIONS:
+            return f"'on_budget' must be one of {BUDGET_ACTIONS}"
+    position = {name: i for i, name in enumerate(stages)}
+    for src, rules in defn.get("edges", {}).items():
+        if src not in position or not isinstance(rules, list):
+            return f"edges for unknown stage {src!r}"
+        for rule in rules:
+            if not isinstance(rule, dict) or rule.get("when") not in EDGE_CONDITIONS:
+                return f"edge from {src!r} needs 'when' in {EDGE_CONDITIONS}"
+            if position.get(rule.get("goto"), -1) <= position[src]:
+                return f"edge from {src!r} must 'goto' a later stage"
+    for name, items in defn.get("branches", {}).items():
+        if name not in position or not isinstance(items, list) or not all(isinstance(b, str) for b in items):
+            return f"branches for {name!r} must be a list of prompts for a known stage"
+    return None
+
+
+def _dir_key(directory: str) -> _DirKey:
+    key: _DirKey = []
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.endswith((".json", ".yaml", ".yml")) and entry.name != CACHE_NAME:
+                    st = entry.stat()
+                    key.append((entry.name, st.st_mtime_ns, st.st_size))
+    except OSError:
+        return []
+    key.sort()
+    return key
+
+
+def _parse_file(path: str, log: Any) -> List[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if path.endswith(".json"):
+                raw = json.load(f)
+            else:
+                try:
+                    import yaml  # type: ignore
+                except ImportError:
+                    log(f"Skipping {path}: PyYAML is not installed")
+                    return []
+                raw = yaml.safe_load(f)
+    except Exception as e:
+        log(f"Skipping {path}: {e}")
+        return []
+    out = []
+    for defn in raw if isinstance(raw, list) else [raw]:
+        err = _validate(defn)
+        if err:
+            log(f"Skipping definition in {path}: {err}")
+            continue
+        out.append(defn)
+    return out
+
+
+def _load_definitions(directory: str, key: _DirKey, log: Any) -> Dict[str, Dict[str, Any]]:
+    """Parse definition files, reusing the on-disk compiled cache when the key matches."""
+    cache_path = os.path.join(directory, CACHE_NAME)
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("version") == CACHE_VERSION and cached.get("key") == [list(k) for k in key]:
+            return cached["workflows"]
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    workflows: Dict[str, Dict[str, Any]] = {}
+    for name, _, _ in key:
+        for defn in _parse_file(os.path.join(directory, name), log):
+            trigger = defn.pop("trigger")
+            workflows[trigger] = defn
+
+    tmp = cache_path + ".tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "key": key, "workflows": workflows}, f)
+        os.replace(tmp, cache_path)
+    except OSError:
+        pass  # read-only dir: still works, just without the cache
+    return workflows
+
+
+def load_registry(
+    builtins: Dict[str, Dict[str, Any]],
+    defaults: Dict[str, Any],
+    log: Any = lambda msg: None,
+    directory: str = WORKFLOWS_DIR,
+) -> WorkflowRegistry:
+    """Built-ins overlaid with definition files. Memoized per process on the dir key."""
+    key = _dir_key(directory)
+    memo = _REGISTRY_CACHE.get(directory)
+    if memo and memo[0] == key:
+        return memo[1]
+    workflows = dict(builtins)
+    if key:
+        workflows.update(_load_definitions(directory, key, log))
+    registry = WorkflowRegistry(workflows, defaults)
+    _REGISTRY_CACHE[directory] = (key, registry)
+    return registry
+
+
+def main() -> None:
+    import multiworkflow
+
+    registry = multiworkflow.load_workflows()
+    print(f"definitions dir: {WORKFLOWS_DIR}")
+    for trigger, table in registry.stage_table.items():
+        print(f"{trigger}  {registry.workflows[trigger]['name']}  ({len(table)} stages)")
+        for i, st in enumerate(table):
+            print(f"  {i + 1}. {st['name']}  {st['phase']}  {st['limits']}")
+            for edge in st["edges"]:
+                print(f"      -> {table[edge['goto']]['name']} when {edge['when']}")
+            if st["branches"]:
+                print(f"      fan-out: {len(st['branches'])} parallel branches")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,737 @@
+#!/usr/bin/env python3
+"""
+workflow_sim.py — offline replay and simulation for multiworkflow.py
+
+Drives MultiWorkflow in-process against a scratch transcript and a simulated clock, so a
+workflow definition can be exercised without a CLI session or any tokens. Each simulated
+session plays the CLI's part: it fires hook events, appends to the transcript, echoes the
+stage prompts the hook emits (or swallows them), and advances the clock.
+
+Three sources of sessions:
+- run:    scripted scenarios (JSON). Steps are events, transcript appends, clock moves,
+          races and expectations; see SCENARIO below. Exit 1 on a failed expectation.
+- fuzz:   synthetic sessions from a seeded RNG: random tool-call turns, swallowed
+          prompts, duplicate and racing Stops, SubagentStop bursts for fan-out stages.
+- replay: event sequences recorded in a workflow_metrics.py log (CC_HOOK_METRICS), with
+          the recorded outcome of each event as its expectation.
+
+Every session is checked for invariants: a stage never moves backwards, no stage is
+reinjected past its max_reinjects, racing events emit a stage prompt at most once, and a
+no_tool_calls edge is only taken by a stage whose echoed prompt was followed by no tool
+calls. A violation fails the run like a failed expectation.
+The report lists outcomes, stage transitions, reinject verdicts, races and the in-process
+hook latency per event (driver overhead, without interpreter start-up).
+
+State and the transcript index live in memory by default (the same compare-and-swap as
+the JSON backend and the same incremental index, minus the files); --state json uses the
+real state and index files in the scratch directory. One simulator reuses its hook
+instances across sessions (MultiWorkflow.begin), so a session costs its events only. Metrics,
+the watchdog and the daemon are off, and nothing is written outside the scratch dir.
+
+SCENARIO (a JSON object, or a list of them):
+    {
+      "name": "swallowed first prompt",
+      "workflows": [{"trigger": "--mine", "stages": ["a", "b"], ...}],   # optional
+      "steps": [
+        {"event": "UserPromptSubmit", "prompt": "--test do it"},
+        {"ack": true},                        # echo the last emitted prompt
+        {"append": "tool", "count": 3},       # or "text" with "bytes"
+        {"event": "PostToolUse"},
+        {"sleep": 2.5},                       # advance the clock (seconds)
+        {"race": [{"event": "Stop"}, {"event": "PostToolUse"}]},
+        {"expect": {"stage": "task_2", "outcome": "advance", "emitted": true,
+                    "reinjects": 0, "verdict": "pending"}}
+      ]
+    }
+
+CLI:
+    python3 workflow_sim.py run SCENARIO.json [...]
+    python3 workflow_sim.py fuzz [--workflow TRIGGER] [--count N] [--seed N] [--swallow P]
+                                 [--race P] [--duplicate P] [--jobs N] [--save-failures DIR]
+    python3 workflow_sim.py replay METRICS.jsonl [--session ID]
+    common: [--workflows DIR] [--state memory|json] [--json] [--verbose]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# The hook reads these at import. The simulator records its own results and never
+# starts a watchdog or talks to a daemon.
+os.environ.update(CC_HOOK_METRICS="off", CC_HOOK_EVENTS="off", CC_HOOK_WATCHDOG="0", CC_HOOK_STATE_BACKEND="json")
+
+import multiworkflow  # noqa: E402
+import session_index  # noqa: E402
+import workflow_registry  # noqa: E402
+from transcript_index import TOKEN_RE, TranscriptIndex  # noqa: E402
+
+SIM_EPOCH = 1_700_000_000.0  # fixed start so runs are reproducible
+EVENTS = ("UserPromptSubmit", "PostToolUse", "Stop", "SubagentStop")
+
+
+class SimClock:
+    def __init__(self, start: float = SIM_EPOCH) -> None:
+        self.t = start
+
+    def now(self) -> float:
+        return self.t
+
+    def sleep(self, sec: float) -> None:
+        self.t += max(0.0, float(sec))
+
+
+class EventResult(NamedTuple):
+    event: str
+    outcome: str  # hook outcome; "idle" without a workflow, "subagent" for SubagentStop
+    stage_before: Optional[int]
+    stage_after: Optional[int]
+    emitted: Optional[str]  # stage token of an emitted prompt
+    verdict: Optional[str]  # reinject_policy verdict, when one was asked
+    ms: float
+
+
+class MemorySessionState(multiworkflow.SessionState):
+    """SessionState kept as a JSON string in a dict: the same compare-and-swap, no files."""
+
+    def __init__(self, store: Dict[str, str], key: str) -> None:
+        super().__init__(Path(key), Path(key))
+        self.store = store
+        self.key = key
+        self._raw: Optional[str] = None
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        self._raw = self.store.get(self.key)
+        return json.loads(self._raw) if self._raw is not None else None
+
+    def _write_pending(self) -> bool:
+        raw = self.store.get(self.key)
+        if raw == self._raw:
+            new = self._resolve(self.data)  # unchanged since load
+        else:
+            new = self._resolve(json.loads(raw) if raw is not None else None)
+        if new is None:
+            self._raw = raw
+            return False
+        self._raw = self.store[self.key] = json.dumps(new, separators=(",", ":"))
+        self.data = new
+        return True
+
+    def delete(self) -> None:
+        self.store.pop(self.key, None)
+        self._loaded, self._raw, self.data = True, None, None
+        self._dirty, self._replaced = {}, False
+
+
+class SimWorkflow(multiworkflow.MultiWorkflow):
+    """The hook bound to a Simulator; reused across events through begin()."""
+
+    def __init__(self, sim: "Simulator", data: Dict[str, Any]) -> None:
+        self.sim = sim
+        super().__init__(data, "json")
+        self.registry = sim.registry
+        self.workflows = sim.registry.workflows
+
+    def transcript_index(self) -> TranscriptIndex:
+        if self.sim.store is None:
+            return super().transcript_index()
+        return self.sim.transcript_index(self.data.get("transcript_path") or "")
+
+    def new_session_state(self) -> multiworkflow.SessionState:
+        if self.sim.store is None:
+            return multiworkflow.SessionState(self.get_state_file(), self._lock_path())
+        return MemorySessionState(self.sim.store, self.session_id)
+
+    def _index_session(self, state: Dict[str, Any]) -> None:
+        pass  # simulated sessions stay out of the host-wide index
+
+
+def _emitted_prompt(output: str) -> Optional[str]:
+    if not output.strip():
+        return None
+    text = output
+    if output.lstrip().startswith("{"):
+        with contextlib.suppress(ValueError):
+            text = json.loads(output).get("reason") or ""
+    return text if TOKEN_RE.search(text.encode("utf-8")) else None
+
+
+def _line(record: Dict[str, Any]) -> bytes:
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def _tool_turn(n: int) -> bytes:
+    use = {"type": "tool_use", "id": f"toolu_{n:06d}", "name": "Bash", "input": {"command": f"ls src/{n}"}}
+    result = {"type": "tool_result", "tool_use_id": f"toolu_{n:06d}", "content": "file\n" * 40}
+    return _line({"type": "assistant", "message": {"role": "assistant", "content": [use]}}) + _line(
+        {"type": "user", "message": {"role": "user", "content": [result]}}
+    )
+
+
+def _text_line(size: int) -> bytes:
+    text = ("Working through the stage. " * (max(1, size) // 27 + 1))[: max(1, size)]
+    return _line({"type": "assistant", "message": {"role": "assistant", "content": [{"type": "text", "text": text}]}})
+
+
+class Session:
+    """One simulated CLI session: a transcript, the hook in-process, and a step script."""
+
+    def __init__(self, sim: "Simulator", name: str) -> None:
+        self.sim = sim
+        self.name = name
+        self.session_id = f"sim-{name}"
+        self.transcript = sim.workdir / f"{self.session_id}.jsonl"
+        self.transcript.write_bytes(_line({"type": "user", "message": {"role": "user", "content": "hello"}}))
+        self.data = {"session_id": self.session_id, "cwd": str(sim.project), "transcript_path": str(self.transcript)}
+        self.results: List[EventResult] = []
+        self.script: List[Dict[str, Any]] = []  # steps as executed, for --save-failures
+        self.failures: List[str] = []
+        self.violations: List[str] = []
+        self.last_prompt: Optional[str] = None
+        self.tool_n = 0
+        self.stage_token: Optional[str] = None  # token of the last prompt echoed
+        self.tool_calls: Counter = Counter()  # tool calls appended per stage token
+        self.max_stage: Dict[str, int] = {}
+        self._raw: Optional[str] = None
+        self._parsed: Optional[Dict[str, Any]] = None
+
+    # ----------------------------- Inspection -----------------------------
+
+    def state(self) -> Optional[Dict[str, Any]]:
+        if self.sim.store is not None:
+            raw = self.sim.store.get(self.session_id)
+            if raw is not self._raw:
+                self._raw, self._parsed = raw, json.loads(raw) if raw is not None else None
+            return self._parsed
+        return multiworkflow._read_state_file(self.sim.project / ".claude" / f"workflow_state_{self.session_id}.json")[1]
+
+    def active(self) -> bool:
+        return self.state() is not None
+
+    # ------------------------------- Steps --------------------------------
+
+    def fire(self, event: str, **extra: Any) -> EventResult:
+        self.script.append(dict({"event": event}, **extra))
+        return self._run([(event, extra)])[0]
+
+    def race(self, specs: List[Dict[str, Any]]) -> List[EventResult]:
+        """Events that all read the state before any of them writes, as concurrent hooks do."""
+        self.script.append({"race": specs})
+        return self._run([(s["event"], {k: v for k, v in s.items() if k != "event"}) for s in specs])
+
+    def append(self, kind: str = "tool", count: int = 1, size: int = 400) -> None:
+        self.script.append({"append": kind, "count": count, "bytes": size})
+        with open(self.transcript, "ab") as f:
+            for _ in range(count):
+                if kind == "tool":
+                    f.write(_tool_turn(self.tool_n))
+                    self.tool_n += 1
+                    self.tool_calls[self.stage_token] += 1
+                else:
+                    f.write(_text_line(size))
+
+    def ack(self) -> None:
+        """Echo the last emitted stage prompt into the transcript, as the CLI would."""
+        self.script.append({"ack": True})
+        if self.last_prompt is not None:
+            with open(self.transcript, "ab") as f:
+                f.write(_line({"type": "user", "message": {"role": "user", "content": self.last_prompt}}))
+            token = TOKEN_RE.search(self.last_prompt.encode("utf-8"))
+            self.stage_token = token.group(0).decode("utf-8") if token else self.stage_token
+            self.last_prompt = None
+
+    def sleep(self, sec: float) -> None:
+        self.script.append({"sleep": sec})
+        self.sim.clock.sleep(sec)
+
+    def expect(self, want: Dict[str, Any], where: str = "") -> None:
+        self.script.append({"expect": want})
+        last = self.results[-1] if self.results else None
+        state = self.state()
+        got: Dict[str, Any] = {
+            "stage": state.get("stage") if state else None,
+            "stage_index": state.get("stage_index") if state else None,
+            "outcome": last.outcome if last else None,
+            "emitted": bool(last and last.emitted),
+            "verdict": last.verdict if last else None,
+            "reinjects": int((state or {}).get("reinject_counts", {}).get(str((state or {}).get("stage_index")), 0)),
+            "active": state is not None,
+        }
+        for key, value in want.items():
+            if key not in got:
+                self.failures.append(f"{where}unknown expectation {key!r}")
+            elif got[key] != value:
+                self.failures.append(f"{where}expected {key}={value!r}, got {got[key]!r}")
+
+    def run_steps(self, steps: List[Dict[str, Any]]) -> None:
+        for n, step in enumerate(steps, 1):
+            where = f"step {n}: "
+            if "event" in step:
+                if step["event"] not in EVENTS:
+                    raise ValueError(f"{where}unknown event {step['event']!r}")
+                self.fire(step["event"], **{k: v for k, v in step.items() if k != "event"})
+            elif "race" in step:
+                self.race(step["race"])
+            elif "ack" in step:
+                self.ack()
+            elif "append" in step:
+                self.append(step["append"], int(step.get("count", 1)), int(step.get("bytes", 400)))
+            elif "sleep" in step:
+                self.sleep(float(step["sleep"]))
+            elif "expect" in step:
+                self.expect(step["expect"], where)
+            else:
+                raise ValueError(f"{where}unknown step {step!r}")
+
+    # ------------------------------ Dispatch ------------------------------
+
+    def _run(self, specs: List[Tuple[str, Dict[str, Any]]]) -> List[EventResult]:
+        flows: List[Tuple[str, Optional[SimWorkflow], float]] = []
+        for event, extra in specs:
+            if event == "SubagentStop":
+                flows.append((event, None, 0.0))
+                continue
+            t0 = time.perf_counter()
+            wf = self.sim.workflow(len(flows), dict(self.data, hook_event_name=event, **extra))
+            wf.get_state()  # every racer reads before the first one writes
+            flows.append((event, wf, time.perf_counter() - t0))
+
+        results = []
+        for event, wf, setup in flows:
+            seen = wf.state.data if wf is not None else None
+            out = io.StringIO()
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(out):
+                if wf is None:
+                    multiworkflow._subagent_stop("json")
+                else:
+                    if event == "UserPromptSubmit":
+                        wf.handle_user_prompt()
+                    elif event == "Stop":
+                        wf.handle_stop_like(event)
+                    else:
+                        wf.handle_post_tool_use()
+                    wf.state.commit()
+            ms = (setup + time.perf_counter() - t0) * 1000.0
+            prompt = _emitted_prompt(out.getvalue())
+            token = TOKEN_RE.search(prompt.encode("utf-8")) if prompt else None
+            if prompt is not None:
+                self.last_prompt = prompt
+            after = self.state()
+            if wf is None:
+                outcome = "subagent"
+            else:
+                outcome = wf.outcome or "idle"
+            results.append(
+                EventResult(
+                    event,
+                    outcome,
+                    seen.get("stage_index") if seen else None,
+                    after.get("stage_index") if after else None,
+                    token.group(0).decode("utf-8") if token else None,
+                    (wf.reinject_decision or {}).get("verdict") if wf is not None else None,
+                    ms,
+                )
+            )
+        self._check(results, after)
+        self.results.extend(results)
+        return results
+
+    def _check(self, results: List[EventResult], state: Optional[Dict[str, Any]]) -> None:
+        t = f"t+{self.sim.clock.now() - SIM_EPOCH:.1f}s"
+        for r in results:
+            if r.outcome == "start":
+                self.max_stage.clear()
+        if state is not None:
+            run = f"{state['workflow_type']}@{state.get('workflow_start_ts')}"
+            idx = int(state["stage_index"])
+            if idx < self.max_stage.get(run, -1):
+                self.violations.append(f"{t}: stage moved back to {idx + 1} in {state['workflow_type']}")
+            self.max_stage[run] = max(idx, self.max_stage.get(run, -1))
+            limits = self.sim.registry.stage(state["workflow_type"], idx)["limits"]
+            spent = int(state.get("reinject_counts", {}).get(str(idx), 0))
+            if spent > int(limits["max_reinjects"]):
+                self.violations.append(f"{t}: stage {idx + 1} reinjected {spent} times (max {limits['max_reinjects']})")
+            for r in results:
+                if r.outcome == "advance" and r.stage_before is not None:
+                    self._check_edge(t, state["workflow_type"], r.stage_before, r.stage_after)
+        emitted = Counter(r.emitted for r in results if r.emitted)
+        for token, n in emitted.items():
+            if n > 1:
+                self.violations.append(f"{t}: {n} racing events emitted {token}")
+
+    def _check_edge(self, t: str, wf_type: str, before: int, after: Optional[int]) -> None:
+        """A no_tool_calls edge is only taken by a stage that made no tool calls."""
+        if after is None or after == before + 1:
+            return  # the default next stage; an edge to it looks the same
+        for edge in self.sim.registry.stage(wf_type, before)["edges"]:
+            if edge["when"] == "always":
+                return  # reached first, so no later no_tool_calls edge was consulted
+            if edge["goto"] == after:
+                calls = self.tool_calls[f"[WF:{wf_type}:{before}:{self.session_id}]"]
+                if calls:
+                    self.violations.append(
+                        f"{t}: stage {before + 1} took its no_tool_calls edge to {after + 1} after {calls} tool calls"
+                    )
+                return
+
+
+class Simulator:
+    def __init__(self, registry: workflow_registry.WorkflowRegistry, workdir: Path, state: str = "memory") -> None:
+        self.registry = registry
+        self.workdir = workdir
+        self.project = workdir / "project"
+        self.project.mkdir(parents=True, exist_ok=True)
+        self.store: Optional[Dict[str, str]] = {} if state == "memory" else None
+        self.indexes: Dict[str, TranscriptIndex] = {}  # memory state: per transcript, no sidecar files
+        self.flows: List[SimWorkflow] = []  # one per racing event, reused for every event
+        self.clock = SimClock()
+        self.sessions = 0
+
+    def new_session(self, name: Optional[str] = None) -> Session:
+        self.sessions += 1
+        return Session(self, name or str(self.sessions))
+
+    def workflow(self, slot: int, data: Dict[str, Any]) -> SimWorkflow:
+        """The hook for one event; racing events in one step get separate slots."""
+        if slot < len(self.flows):
+            self.flows[slot].begin(data)
+        else:
+            self.flows.append(SimWorkflow(self, data))
+        return self.flows[slot]
+
+    def transcript_index(self, transcript_path: str) -> TranscriptIndex:
+        index = self.indexes.get(transcript_path)
+        if index is None:
+            index = self.indexes[transcript_path] = TranscriptIndex(transcript_path, "", persist=False)
+        return index
+
+    def finish(self, session: Session) -> None:
+        """Drop what a session left behind so the scratch dir stays small."""
+        session.transcript.unlink(missing_ok=True)
+        self.indexes.pop(str(session.transcript), None)
+        if self.store is not None:
+            self.store.pop(session.session_id, None)
+        for p in (self.project / ".claude").glob(f"*_{session.session_id}.*"):
+            p.unlink(missing_ok=True)
+
+    @contextlib.contextmanager
+    def patched(self, verbose: bool = False):
+        """Point the hook at the simulated clock and keep it quiet and off the host."""
+        saved = (time.time, multiworkflow.log, session_index.INDEX_DIR)
+        time.time = self.clock.now
+        if not verbose:
+            multiworkflow.log = lambda message: None
+        session_index.INDEX_DIR = self.workdir / "sessions"
+        try:
+            yield self
+        finally:
+            time.time, multiworkflow.log, session_index.INDEX_DIR = saved
+
+
+# ------------------------------ Sources ----------------------------------
+
+
+def fuzz_session(session: Session, trigger: str, rng: random.Random, opts: argparse.Namespace) -> None:
+    """Play a plausible CLI session with the usual ways things go wrong."""
+    session.fire("UserPromptSubmit", prompt=f"{trigger} synthetic task {session.name}")
+    for _ in range(opts.max_turns):
+        state = session.state()
+        if state is None:
+            return
+        if rng.random() >= opts.swallow:
+            session.ack()
+        session.sleep(rng.uniform(0.5, 20.0))
+        for _ in range(rng.randint(0, opts.tools)):
+            session.append("tool")
+            session.fire("PostToolUse")
+        for _ in session.sim.registry.stage(state["workflow_type"], state["stage_index"])["branches"]:
+            session.append("text", size=rng.randint(200, 2000))
+            session.fire("SubagentStop")
+        session.append("text", size=rng.randint(50, 600))
+        if rng.random() < opts.race:
+            session.race([{"event": "Stop"}, {"event": "PostToolUse"}])
+        else:
+            session.fire("Stop")
+        if rng.random() < opts.duplicate:
+            session.fire("Stop")
+
+
+def scenario_from_metrics(path: str, session_id: Optional[str] = None) -> Dict[str, Any]:
+    """Rebuild a scenario from a metrics log; each recorded outcome becomes an expectation."""
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            with contextlib.suppress(ValueError):
+                r = json.loads(line)
+                if r.get("kind") == "event" and r.get("event") in EVENTS:
+                    events.append(r)
+    session_id = session_id or (events[-1]["session_id"] if events else None)
+    events = [r for r in events if r.get("session_id") == session_id]
+    starts = [i for i, r in enumerate(events) if r.get("outcome") == "start"]
+    events = events[starts[-1]:] if starts else events  # the latest workflow run
+    steps: List[Dict[str, Any]] = []
+    prev_ts = events[0]["ts"] if events else 0.0
+    for i, r in enumerate(events):
+        steps.append({"sleep": round(max(0.0, r["ts"] - prev_ts), 3)})
+        prev_ts = r["ts"]
+        if r["event"] == "UserPromptSubmit":
+            steps.append({"event": "UserPromptSubmit", "prompt": f"{r.get('workflow') or ''} replayed task"})
+        else:
+            steps.append({"append": "tool" if r["event"] == "PostToolUse" else "text", "count": 1, "bytes": 400})
+            steps.append({"event": r["event"]})
+        steps.append({"expect": {"outcome": r["outcome"]}})
+        # A prompt that was followed by a reinject of the same stage was swallowed.
+        if r["outcome"] in ("start", "advance", "reinject"):
+            later = next((e for e in events[i + 1:] if e.get("outcome") not in ("continue", "duplicate")), None)
+            if not (later and later.get("outcome") == "reinject" and later.get("stage") == r.get("stage")):
+                steps.append({"ack": True})
+    return {"name": f"replay of {session_id}", "steps": steps}
+
+
+def load_scenarios(paths: List[str]) -> List[Dict[str, Any]]:
+    scenarios = []
+    for p in paths:
+        with open(p, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        for sc in raw if isinstance(raw, list) else [raw]:
+            sc.setdefault("name", os.path.basename(p))
+            scenarios.append(sc)
+    return scenarios
+
+
+def build_registry(workflows_dir: Optional[str], extra: List[Dict[str, Any]]) -> workflow_registry.WorkflowRegistry:
+    if workflows_dir:
+        base = workflow_registry.load_registry(
+            multiworkflow.WORKFLOWS, multiworkflow.DEFAULT_STAGE_LIMITS, multiworkflow.log, workflows_dir
+        )
+    else:
+        base = multiworkflow.load_workflows()
+    if not extra:
+        return base
+    workflows = dict(base.workflows)
+    for defn in extra:
+        err = workflow_registry._validate(defn)
+        if err:
+            raise ValueError(f"invalid workflow definition: {err}")
+        defn = dict(defn)
+        workflows[defn.pop("trigger")] = defn
+    return workflow_registry.WorkflowRegistry(workflows, multiworkflow.DEFAULT_STAGE_LIMITS)
+
+
+def _workdir() -> Path:
+    shm = "/dev/shm" if os.path.isdir("/dev/shm") else None  # transcripts churn; keep them in RAM
+    return Path(tempfile.mkdtemp(prefix="mw-sim-", dir=shm))
+
+
+def run_fuzz(registry: workflow_registry.WorkflowRegistry, args: argparse.Namespace, indices: range) -> "Report":
+    """Synthetic sessions for the given indices; session n always plays out the same way."""
+    report = Report()
+    workdir = _workdir()
+    sim = Simulator(registry, workdir, args.state)
+    try:
+        with sim.patched(args.verbose):
+            for n in indices:
+                rng = random.Random(args.seed * 1_000_003 + n)
+                session = sim.new_session(str(n))
+                fuzz_session(session, args.workflow[n % len(args.workflow)], rng, args)
+                report.add(session)
+                if session.violations and args.save_failures:
+                    os.makedirs(args.save_failures, exist_ok=True)
+                    out = Path(args.save_failures) / f"fuzz_seed{args.seed}_{n}.json"
+                    out.write_text(json.dumps({"name": out.stem, "steps": session.script}, indent=1))
+                sim.finish(session)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def run_scenarios(
+    registry: workflow_registry.WorkflowRegistry, scenarios: List[Dict[str, Any]], args: argparse.Namespace
+) -> "Report":
+    report = Report()
+    workdir = _workdir()
+    sim = Simulator(registry, workdir, args.state)
+    try:
+        with sim.patched(args.verbose):
+            for sc in scenarios:
+                session = sim.new_session()
+                try:
+                    session.run_steps(sc.get("steps", []))
+                except (ValueError, KeyError, TypeError) as e:
+                    session.failures.append(f"bad scenario: {e}")
+                session.name = sc.get("name", session.name)
+                report.add(session)
+                sim.finish(session)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+# ------------------------------ Report -----------------------------------
+
+
+class Report:
+    def __init__(self) -> None:
+        self.sessions = 0
+        self.events = 0
+        self.latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.verdicts: Counter = Counter()
+        self.transitions: Counter = Counter()
+        self.races = 0
+        self.completed = 0
+        self.stalled = 0
+        self.failures: List[str] = []
+        self.violations: List[str] = []
+        self.wall_sec = 0.0
+
+    def add(self, session: Session) -> None:
+        self.sessions += 1
+        for r in session.results:
+            self.events += 1
+            self.latencies.append(r.ms)
+            self.outcomes[f"{r.event}:{r.outcome}"] += 1
+            if r.verdict:
+                self.verdicts[r.verdict] += 1
+            if r.outcome == "advance":
+                self.transitions[f"{r.stage_before + 1}->{r.stage_after + 1}"] += 1
+        self.races += sum(1 for s in session.script if "race" in s)
+        if any(r.outcome == "complete" for r in session.results):
+            self.completed += 1
+        elif session.active():
+            self.stalled += 1
+        self.failures += [f"{session.name}: {m}" for m in session.failures]
+        self.violations += [f"{session.name}: {m}" for m in session.violations]
+
+    def merge(self, other: "Report") -> None:
+        for key in ("sessions", "events", "races", "completed", "stalled"):
+            setattr(self, key, getattr(self, key) + getattr(other, key))
+        for key in ("latencies", "failures", "violations"):
+            getattr(self, key).extend(getattr(other, key))
+        for key in ("outcomes", "verdicts", "transitions"):
+            getattr(self, key).update(getattr(other, key))
+
+    def ok(self) -> bool:
+        return not self.failures and not self.violations
+
+    def as_dict(self) -> Dict[str, Any]:
+        lat = sorted(self.latencies) or [0.0]
+        pick = lambda q: round(lat[min(len(lat) - 1, int(len(lat) * q))], 3)  # noqa: E731
+        return {
+            "sessions": self.sessions,
+            "events": self.events,
+            "wall_sec": round(self.wall_sec, 3),
+            "sessions_per_sec": round(self.sessions / max(self.wall_sec, 1e-9), 1),
+            "events_per_sec": round(self.events / max(self.wall_sec, 1e-9), 1),
+            "hook_ms": {"p50": pick(0.5), "p99": pick(0.99), "max": round(lat[-1], 3)},
+            "completed": self.completed,
+            "stalled": self.stalled,
+            "races": self.races,
+            "outcomes": dict(sorted(self.outcomes.items())),
+            "reinject_verdicts": dict(sorted(self.verdicts.items())),
+            "transitions": dict(sorted(self.transitions.items())),
+            "failures": self.failures,
+            "violations": self.violations,
+        }
+
+    def print(self) -> None:
+        d = self.as_dict()
+        print(
+            f"{d['sessions']} sessions, {d['events']} events in {d['wall_sec']:.2f}s "
+            f"({d['sessions_per_sec']:.0f} sessions/s, {d['events_per_sec']:.0f} events/s)"
+        )
+        print(f"hook latency per event: p50 {d['hook_ms']['p50']} ms, p99 {d['hook_ms']['p99']} ms, max {d['hook_ms']['max']} ms")
+        print(f"completed {d['completed']}, still active {d['stalled']}, races {d['races']}")
+        for title, key in (("outcomes", "outcomes"), ("reinject verdicts", "reinject_verdicts"), ("stage transitions", "transitions")):
+            if d[key]:
+                print(f"{title}: " + ", ".join(f"{k} {v}" for k, v in d[key].items()))
+        for title, key in (("FAILED", "failures"), ("VIOLATION", "violations")):
+            for msg in d[key][:50]:
+                print(f"{title} {msg}")
+            if len(d[key]) > 50:
+                print(f"... and {len(d[key]) - 50} more")
+
+
+# ------------------------------ CLI --------------------------------------
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Simulate multiworkflow.py sessions offline.")
+    parser.add_argument("--workflows", help="definition directory (default: CC_HOOK_WORKFLOWS_DIR)")
+    parser.add_argument("--state", choices=("memory", "json"), default="memory", help="state backend")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the hook's log lines")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_run = sub.add_parser("run", help="run scripted scenarios")
+    p_run.add_argument("scenarios", nargs="+")
+    p_fuzz = sub.add_parser("fuzz", help="run synthetic sessions")
+    p_fuzz.add_argument("--workflow", action="append", help="trigger to exercise (default: all)")
+    p_fuzz.add_argument("--count", type=int, default=1000)
+    p_fuzz.add_argument("--seed", type=int, default=0)
+    p_fuzz.add_argument("--swallow", type=float, default=0.1, help="chance a stage prompt is lost")
+    p_fuzz.add_argument("--race", type=float, default=0.05, help="chance Stop races a PostToolUse")
+    p_fuzz.add_argument("--duplicate", type=float, default=0.05, help="chance of a second Stop")
+    p_fuzz.add_argument("--tools", type=int, default=3, help="max tool calls per turn")
+    p_fuzz.add_argument("--max-turns", type=int, default=60)
+    p_fuzz.add_argument("--save-failures", help="write failing sessions here as scenarios")
+    p_fuzz.add_argument("--jobs", type=int, default=1, help="worker processes")
+    p_replay = sub.add_parser("replay", help="replay a metrics log")
+    p_replay.add_argument("metrics")
+    p_replay.add_argument("--session", help="session id (default: the last one logged)")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "run":
+        scenarios = load_scenarios(args.scenarios)
+    elif args.cmd == "replay":
+        scenarios = [scenario_from_metrics(args.metrics, args.session)]
+    else:
+        scenarios = []
+    extra = [d for sc in scenarios for d in sc.get("workflows", [])]
+    registry = build_registry(args.workflows, extra)
+
+    if args.cmd == "fuzz":
+        triggers = []
+        for t in args.workflow or list(registry.workflows):
+            t = t if t in registry.workflows or f"--{t}" not in registry.workflows else f"--{t}"
+            if t not in registry.workflows:
+                parser.error(f"unknown workflow trigger {t!r}")
+            triggers.append(t)
+        args.workflow = triggers
+
+    t0 = time.perf_counter()
+    if args.cmd != "fuzz":
+        report = run_scenarios(registry, scenarios, args)
+    elif args.jobs <= 1:
+        report = run_fuzz(registry, args, range(args.count))
+    else:
+        import multiprocessing
+
+        chunks = [range(j, args.count, args.jobs) for j in range(args.jobs)]
+        with multiprocessing.Pool(args.jobs) as pool:
+            parts = pool.starmap(run_fuzz, [(registry, args, c) for c in chunks])
+        report = Report()
+        for part in parts:
+            report.merge(part)
+    report.wall_sec = time.perf_counter() - t0
+
+    if args.json:
+        print(json.dumps(report.as_dict(), indent=2))
+    else:
+        report.print()
+    return 0 if report.ok() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
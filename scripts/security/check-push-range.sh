@@ -27,11 +27,16 @@ fi
 tmp_dir="$(mktemp -d)"
 trap 'rm -rf "${tmp_dir}"' EXIT
 
-commit_msg_file="${tmp_dir}/commit_messages.txt"
-patch_file="${tmp_dir}/patches.diff"
-
-git log --format='%H%n%s%n%b%n' "${commits[@]}" > "${commit_msg_file}"
-git show --format= --patch --no-color "${commits[@]}" > "${patch_file}"
-
-bash scripts/security/check-sensitive-text.sh --context=push-commit-message "${commit_msg_file}"
-bash scripts/security/check-sensitive-text.sh --context=push-diff "${patch_file}"
+# One file per commit: a commit that already passed in an earlier push has the same
+# content, so the scanner's cache skips it and only new commits are read.
+msg_files=()
+patch_files=()
+for commit in "${commits[@]}"; do
+  git log -1 --format='%H%n%s%n%b%n' "${commit}" > "${tmp_dir}/${commit}.msg"
+  git show --format= --patch --no-color "${commit}" > "${tmp_dir}/${commit}.diff"
+  msg_files+=("${tmp_dir}/${commit}.msg")
+  patch_files+=("${tmp_dir}/${commit}.diff")
+done
+
+bash scripts/security/check-sensitive-text.sh --context=push-commit-message "${msg_files[@]}"
+bash scripts/security/check-sensitive-text.sh --context=push-diff "${patch_files[@]}"
@@ -1,6 +1,12 @@
 #!/usr/bin/env bash
 set -euo pipefail
 
+# sensitive_text.py applies the same policy in one pass per file, in parallel, and skips
+# content that already passed. CC_SENSITIVE_TEXT_ENGINE=shell keeps the rg/grep loop below.
+if [[ "${CC_SENSITIVE_TEXT_ENGINE:-python}" != "shell" ]] && command -v python3 >/dev/null 2>&1; then
+  exec python3 "$(dirname "${BASH_SOURCE[0]}")/sensitive_text.py" "$@"
+fi
+
 context="text"
 if [[ "${1:-}" == --context=* ]]; then
   context="${1#--context=}"
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+sensitive_text.py — single-pass sensitive-text policy scanner
+
+Python engine behind check-sensitive-text.sh; same arguments, output and exit codes:
+    policy violation in <context>: <file>      (stderr, per failing file)
+    <line>:<text>                              (each matching line, sorted, unique)
+followed by the policy reminder; exit 1 on any violation, 2 on usage errors. Files that
+do not exist are skipped.
+
+Instead of one rg/grep run per pattern per file:
+- the three policy patterns (local paths, secret assignments, known tokens) share one
+  table of literal anchors ("/home/", "token", "AKIA", ...). Each file (memory-mapped
+  when large) is read once: a case-folded copy is searched for the anchors at memchr
+  speed, and a pattern is only tried, anchored, where its anchor occurs. A local-path
+  hit on a line holding a documented placeholder (/Users/YOU, /home/user, ...) is
+  skipped, as the shell's exclude_pattern did;
+- files, and large files split at line boundaries into CHUNK_BYTES pieces, are scanned
+  across a process pool once there is more than POOL_MIN_BYTES of work;
+- a file whose content hash already passed under the same policy is not scanned again.
+  Digests live in CC_SENSITIVE_TEXT_CACHE (default ~/.cache/claude_code/sensitive_text;
+  "off" disables it), one file per policy version. Only passing content is cached.
+
+CC_SENSITIVE_TEXT_JOBS caps the pool (default: CPU count; 1 scans in-process).
+
+CLI:
+    python3 sensitive_text.py [--context=<label>] <file> [file...]
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+# Same expressions as check-sensitive-text.sh; [[:space:]] never spans a line there.
+LOCAL_PATH = rb"/Users/[A-Za-z0-9._-]+|/home/[A-Za-z0-9._-]+|[A-Za-z]:\\+Users\\+[A-Za-z0-9._-]+"
+ALLOWED_PATH_PLACEHOLDER = (
+    rb"/Users/(YOU|USER|username)|/home/(user|USER|username)|[A-Za-z]:\\+Users\\+(YOU|USER|USERNAME|username)"
+)
+SECRET_ASSIGNMENT = (
+    rb"([Aa][Pp][Ii][_-]?[Kk][Ee][Yy]|[Tt][Oo][Kk][Ee][Nn]|[Pp][Aa][Ss][Ss][Ww][Oo][Rr][Dd]|[Ss][Ee][Cc][Rr][Ee][Tt])"
+    rb"[ \t\r\f\v]*[:=][ \t\r\f\v]*[\"']?[A-Za-z0-9_./+=-]{12,}"
+)
+KNOWN_TOKEN = (
+    rb"(ghp|gho|ghu|ghs|ghr)_[A-Za-z0-9]{20,}|github_pat_[A-Za-z0-9_]{20,}|AKIA[0-9A-Z]{16}|sk-[A-Za-z0-9]{20,}"
+)
+
+PATH_RE = re.compile(LOCAL_PATH)
+SECRET_RE = re.compile(SECRET_ASSIGNMENT)
+TOKEN_RE = re.compile(KNOWN_TOKEN)
+ALLOWED_RE = re.compile(ALLOWED_PATH_PLACEHOLDER, re.IGNORECASE)
+POLICY_VERSION = hashlib.sha256(b"\0".join([LOCAL_PATH, ALLOWED_PATH_PLACEHOLDER, SECRET_ASSIGNMENT, KNOWN_TOKEN])).hexdigest()[:16]
+
+MMAP_MIN_BYTES = 1 << 20
+CHUNK_BYTES = 8 << 20
+POOL_MIN_BYTES = 4 << 20
+CACHE_MAX_BYTES = 4 << 20  # ~100k digests; past this the older half is dropped
+_CACHE_SETTING = os.environ.get("CC_SENSITIVE_TEXT_CACHE", "").strip()
+JOBS = int(os.environ.get("CC_SENSITIVE_TEXT_JOBS", "0") or 0) or (os.cpu_count() or 1)
+
+REMINDER = """Blocked by sensitive-text policy.
+- Remove or redact secrets and credential-like values.
+- Replace local absolute paths with repo-relative paths or placeholders like /path/to/project.
+"""
+
+Finding = Tuple[int, bytes]  # (line number within the scanned range, line text)
+
+
+# Every policy match starts at (or, for a drive letter, one byte before) one of these
+# anchors, case-folded. They are found with bytes.find() over a lowered copy, which runs
+# at memchr speed, and the pattern is only tried, anchored, where one occurs.
+ANCHORS: Tuple[Tuple[bytes, "re.Pattern[bytes]", int], ...] = (
+    (b"/users/", PATH_RE, 0),
+    (b"/home/", PATH_RE, 0),
+    (b":\\", PATH_RE, -1),
+    *((kw, SECRET_RE, 0) for kw in (b"apikey", b"api_key", b"api-key", b"token", b"password", b"secret")),
+    *((p, TOKEN_RE, 0) for p in (b"ghp_", b"gho_", b"ghu_", b"ghs_", b"ghr_", b"github_pat_", b"akia", b"sk-")),
+)
+
+
+def scan_buffer(buf: Sequence[int], start: int = 0, end: Optional[int] = None) -> List[Finding]:
+    """Every policy-violating line in buf[start:end], numbered from 1 at `start`."""
+    end = len(buf) if end is None else end
+    raw = buf if isinstance(buf, bytes) and (start, end) == (0, len(buf)) else bytes(buf[start:end])
+    low = raw.lower()
+    flagged: Set[int] = set()  # line starts with a secret or token
+    paths: Set[int] = set()  # line starts with a local path (unless a placeholder excuses it)
+    for anchor, pattern, shift in ANCHORS:
+        pos = low.find(anchor)
+        while pos >= 0:
+            if pos + shift >= 0 and pattern.match(raw, pos + shift):
+                (paths if pattern is PATH_RE else flagged).add(low.rfind(b"\n", 0, pos) + 1)
+            pos = low.find(anchor, pos + 1)
+
+    found: List[Finding] = []
+    line_no, counted_to = 1, 0
+    for line_start in sorted(flagged | paths):
+        line_end = raw.find(b"\n", line_start)
+        line = raw[line_start:line_end if line_end >= 0 else len(raw)]
+        if line_start not in flagged and ALLOWED_RE.search(line):
+            continue  # the shell's exclude_pattern drops such lines from the path results
+        line_no += raw.count(b"\n", counted_to, line_start)
+        counted_to = line_start
+        found.append((line_no, line))
+    return found
+
+
+def _open(path: str) -> Tuple[Optional[mmap.mmap], bytes]:
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_MIN_BYTES:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ), b""
+        return None, f.read()
+
+
+def scan_range(path: str, start: int, end: int) -> Tuple[List[Finding], int]:
+    """Findings in one piece of a file plus its newline count (to renumber later pieces)."""
+    mm, data = _open(path)
+    buf = mm if mm is not None else data
+    try:
+        end = min(end, len(buf))
+        return scan_buffer(buf, start, end), buf[start:end].count(b"\n")
+    finally:
+        if mm is not None:
+            mm.close()
+
+
+def split_points(path: str, size: int) -> List[Tuple[int, int]]:
+    """Cut a file into CHUNK_BYTES ranges that each start at a line boundary."""
+    if size <= CHUNK_BYTES:
+        return [(0, size)]
+    cuts = [0]
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        while cuts[-1] + CHUNK_BYTES < size:
+            nl = mm.find(b"\n", cuts[-1] + CHUNK_BYTES)
+            if nl < 0:
+                break
+            cuts.append(nl + 1)
+    return [(a, b) for a, b in zip(cuts, cuts[1:] + [size]) if a < b]
+
+
+def file_digest(path: str) -> str:
+    mm, data = _open(path)
+    try:
+        return hashlib.blake2b(mm if mm is not None else data, digest_size=20).hexdigest()
+    finally:
+        if mm is not None:
+            mm.close()
+
+
+# ------------------------------ Cache ------------------------------------
+
+
+def cache_file() -> Optional[Path]:
+    if _CACHE_SETTING.lower() in ("0", "off", "false"):
+        return None
+    root = Path(os.path.expanduser(_CACHE_SETTING)) if _CACHE_SETTING else Path.home() / ".cache" / "claude_code" / "sensitive_text"
+    return root / f"passed-{POLICY_VERSION}.txt"
+
+
+def load_passed(path: Optional[Path]) -> Set[str]:
+    if path is None:
+        return set()
+    try:
+        return set(path.read_text(encoding="ascii").split())
+    except (OSError, ValueError):
+        return set()
+
+
+def record_passed(path: Optional[Path], digests: List[str]) -> None:
+    if path is None or not digests:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # One O_APPEND write per run, so concurrent hooks never interleave lines.
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        try:
+            os.write(fd, "".join(d + "\n" for d in digests).encode("ascii"))
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > CACHE_MAX_BYTES:
+            lines = path.read_text(encoding="ascii").split()
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            tmp.write_text("".join(d + "\n" for d in lines[len(lines) // 2:]), encoding="ascii")
+            os.replace(tmp, path)
+    except (OSError, ValueError):
+        pass
+
+
+# ------------------------------ Scan -------------------------------------
+
+
+def _work(targets: List[Tuple[str, int]]) -> Iterator[Tuple[str, int, int]]:
+    for path, size in targets:
+        for start, end in split_points(path, size):
+            yield path, start, end
+
+
+def scan_files(targets: List[Tuple[str, int]], jobs: int = JOBS) -> Dict[str, List[bytes]]:
+    """Map each path to its sorted, unique violation lines ("<n>:<text>")."""
+    units = list(_work(targets))
+    total = sum(size for _, size in targets)
+    if jobs > 1 and len(units) > 1 and total >= POOL_MIN_BYTES:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(units))) as pool:
+            parts = list(pool.map(scan_range, *zip(*units)))
+    else:
+        parts = [scan_range(*u) for u in units]
+
+    results: Dict[str, List[bytes]] = {path: [] for path, _ in targets}
+    lines_before: Dict[str, int] = {}
+    for (path, _, _), (found, newlines) in zip(units, parts):
+        base = lines_before.get(path, 0)
+        results[path].extend(b"%d:%s" % (base + n, text) for n, text in found)
+        lines_before[path] = base + newlines
+    return {path: sorted(set(lines)) for path, lines in results.items()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = list(sys.argv[1:] if argv is None else argv)
+    context = "text"
+    if args and args[0].startswith("--context="):
+        context = args.pop(0)[len("--context="):]
+    if not args:
+        print("usage: check-sensitive-text.sh [--context=<label>] <file> [file...]", file=sys.stderr)
+        return 2
+
+    cache = cache_file()
+    passed = load_passed(cache)
+    targets: List[Tuple[str, int]] = []
+    digests: Dict[str, str] = {}
+    for target in dict.fromkeys(args):  # a repeated argument is reported again, scanned once
+        if not os.path.isfile(target):
+            continue
+        size = os.path.getsize(target)
+        if cache is not None and size:
+            digests[target] = file_digest(target)
+            if digests[target] in passed:
+                continue
+        targets.append((target, size))
+
+    results = scan_files([t for t in targets if t[1]])
+    err = sys.stderr.buffer
+    failed = False
+    for target in args:
+        lines = results.get(target)
+        if not lines:
+            continue
+        err.write(f"policy violation in {context}: {target}\n".encode("utf-8", "surrogateescape"))
+        err.write(b"".join(line + b"\n" for line in lines))
+        failed = True
+    record_passed(cache, sorted({digests[p] for p, _ in targets if p in digests and not results.get(p)} - passed))
+
+    if failed:
+        err.flush()
+        sys.stderr.write(REMINDER)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())